@@ -0,0 +1,52 @@
+"""Replace rate_limit_logs with rate_limit_windows counters
+
+Revision ID: 0c6d4e8a9b71
+Revises: f2a7c9e31b64
+Create Date: 2026-10-18 19:41:26.583310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0c6d4e8a9b71'
+down_revision: Union[str, Sequence[str], None] = 'f2a7c9e31b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+    if 'rate_limit_windows' not in tables:
+        op.create_table(
+            'rate_limit_windows',
+            sa.Column('key', sa.String(), nullable=False),
+            sa.Column('window_start', sa.Integer(), nullable=False),
+            sa.Column('count', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('key', 'window_start')
+        )
+    # The send-mail log is superseded by the rate limiter (backend/rate_limit.py)
+    if 'rate_limit_logs' in tables:
+        op.drop_index('ix_rate_limit_logs_user_action_time', table_name='rate_limit_logs', if_exists=True)
+        op.drop_index('ix_rate_limit_logs_id', table_name='rate_limit_logs', if_exists=True)
+        op.drop_table('rate_limit_logs')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_table(
+        'rate_limit_logs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('action', sa.String(), nullable=False),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users_auth.user_id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_rate_limit_logs_id', 'rate_limit_logs', ['id'], unique=False)
+    op.create_index('ix_rate_limit_logs_user_action_time', 'rate_limit_logs', ['user_id', 'action', 'timestamp'], unique=False)
+    op.drop_table('rate_limit_windows')
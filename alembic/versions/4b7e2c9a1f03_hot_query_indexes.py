@@ -0,0 +1,61 @@
+"""Composite indexes for hot query predicates
+
+Revision ID: 4b7e2c9a1f03
+Revises: d075d28e9ef9
+Create Date: 2026-10-17 10:12:41.218305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7e2c9a1f03'
+down_revision: Union[str, Sequence[str], None] = 'd075d28e9ef9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, table, columns, unique)
+INDEXES = [
+    ('ix_agniveers_company', 'agniveers', ['company'], False),
+    ('ix_agniveers_batch_no', 'agniveers', ['batch_no'], False),
+    ('ix_technical_assessments_agniveer_date', 'technical_assessments', ['agniveer_id', 'assessment_date'], False),
+    ('ix_behavioral_assessments_agniveer_quarter', 'behavioral_assessments', ['agniveer_id', 'quarter'], False),
+    ('ix_retention_readiness_agniveer_date', 'retention_readiness', ['agniveer_id', 'calculation_date'], False),
+    ('ix_email_recipients_recipient_folder_read', 'email_recipients', ['recipient_id', 'folder', 'is_read'], False),
+    ('ix_rate_limit_logs_user_action_time', 'rate_limit_logs', ['user_id', 'action', 'timestamp'], False),
+    ('uq_test_results_test_agniveer', 'test_results', ['test_id', 'agniveer_id'], True),
+]
+
+
+def _existing_tables():
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    tables = _existing_tables()
+
+    # Keep only the newest result per (test_id, agniveer_id) so the unique index can be built
+    if 'test_results' in tables:
+        op.execute(
+            "DELETE FROM test_results WHERE id NOT IN ("
+            "SELECT MAX(id) FROM test_results GROUP BY test_id, agniveer_id)"
+        )
+
+    for name, table, columns, unique in INDEXES:
+        # Tables created outside migrations (create_all at app startup) may be missing
+        # here or may already carry the index from the model definition.
+        if table in tables:
+            op.create_index(name, table, columns, unique=unique, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    tables = _existing_tables()
+    for name, table, columns, unique in reversed(INDEXES):
+        if table in tables:
+            op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,57 @@
+"""Denormalized recipient count/summary on internal_emails
+
+Revision ID: 7c1d9e4b2a55
+Revises: 4b7e2c9a1f03
+Create Date: 2026-10-17 16:40:12.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1d9e4b2a55'
+down_revision: Union[str, Sequence[str], None] = '4b7e2c9a1f03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if 'internal_emails' not in inspector.get_table_names():
+        return
+    columns = {c['name'] for c in inspector.get_columns('internal_emails')}
+
+    with op.batch_alter_table('internal_emails') as batch_op:
+        if 'recipient_count' not in columns:
+            batch_op.add_column(sa.Column('recipient_count', sa.Integer(), nullable=True))
+        if 'recipient_summary' not in columns:
+            batch_op.add_column(sa.Column('recipient_summary', sa.String(), nullable=True))
+
+    # Backfill existing mail: count plus the first recipient's name ("Name +N others")
+    op.execute(
+        "UPDATE internal_emails SET recipient_count = ("
+        "SELECT COUNT(*) FROM email_recipients r WHERE r.email_id = internal_emails.id)"
+    )
+    op.execute(
+        "UPDATE internal_emails SET recipient_summary = ("
+        "SELECT COALESCE(u.full_name, u.username, 'Unknown') FROM email_recipients r "
+        "LEFT JOIN users_auth u ON u.user_id = r.recipient_id "
+        "WHERE r.id = (SELECT MIN(r2.id) FROM email_recipients r2 WHERE r2.email_id = internal_emails.id))"
+    )
+    op.execute("UPDATE internal_emails SET recipient_summary = 'Unknown' WHERE recipient_count = 0")
+    op.execute(
+        "UPDATE internal_emails SET recipient_summary = "
+        "recipient_summary || ' +' || CAST(recipient_count - 1 AS VARCHAR) || ' others' "
+        "WHERE recipient_count > 1"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('internal_emails') as batch_op:
+        batch_op.drop_column('recipient_summary')
+        batch_op.drop_column('recipient_count')
@@ -0,0 +1,49 @@
+"""Add owner and heartbeat_at to jobs
+
+Revision ID: 8e3b5f1a7d20
+Revises: 0c6d4e8a9b71
+Create Date: 2026-10-18 21:05:12.417930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e3b5f1a7d20'
+down_revision: Union[str, Sequence[str], None] = '0c6d4e8a9b71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if 'jobs' not in inspector.get_table_names():
+        # Fresh database: the app's create_all builds jobs with these columns
+        return
+    columns = {c['name'] for c in inspector.get_columns('jobs')}
+
+    with op.batch_alter_table('jobs') as batch_op:
+        if 'owner' not in columns:
+            batch_op.add_column(sa.Column('owner', sa.String(), nullable=True))
+        if 'heartbeat_at' not in columns:
+            batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+    # Existing QUEUED/RUNNING rows keep a NULL heartbeat, so the next startup
+    # reclaims them exactly as before
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if 'jobs' not in inspector.get_table_names():
+        return
+    columns = {c['name'] for c in inspector.get_columns('jobs')}
+
+    with op.batch_alter_table('jobs') as batch_op:
+        if 'heartbeat_at' in columns:
+            batch_op.drop_column('heartbeat_at')
+        if 'owner' in columns:
+            batch_op.drop_column('owner')
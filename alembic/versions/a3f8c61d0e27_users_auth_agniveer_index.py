@@ -0,0 +1,29 @@
+"""Index users_auth.agniveer_id for broadcast recipient resolution
+
+Revision ID: a3f8c61d0e27
+Revises: 7c1d9e4b2a55
+Create Date: 2026-10-18 09:05:37.114502
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f8c61d0e27'
+down_revision: Union[str, Sequence[str], None] = '7c1d9e4b2a55'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if 'users_auth' in sa.inspect(op.get_bind()).get_table_names():
+        op.create_index('ix_users_auth_agniveer_id', 'users_auth', ['agniveer_id'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_auth_agniveer_id', table_name='users_auth', if_exists=True)
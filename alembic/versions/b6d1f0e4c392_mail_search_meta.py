@@ -0,0 +1,34 @@
+"""Search key fingerprint table for the mail search index
+
+Revision ID: b6d1f0e4c392
+Revises: 8e3b5f1a7d20
+Create Date: 2026-10-18 23:12:40.118264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from backend import mail_search
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d1f0e4c392'
+down_revision: Union[str, Sequence[str], None] = '8e3b5f1a7d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+    if 'internal_emails' in tables:
+        # Creates mail_search_meta (the index itself already exists). The key
+        # fingerprint is recorded at the next startup.
+        mail_search.create_search_index(op.get_bind())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(f"DROP TABLE IF EXISTS {mail_search.SEARCH_META_TABLE}")
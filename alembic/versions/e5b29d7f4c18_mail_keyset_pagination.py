@@ -0,0 +1,50 @@
+"""Keyset pagination for mail folders
+
+Revision ID: e5b29d7f4c18
+Revises: a3f8c61d0e27
+Create Date: 2026-10-18 14:22:09.640217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b29d7f4c18'
+down_revision: Union[str, Sequence[str], None] = 'a3f8c61d0e27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'email_recipients' in tables:
+        columns = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('email_recipients')}
+        if 'email_timestamp' not in columns:
+            with op.batch_alter_table('email_recipients') as batch_op:
+                batch_op.add_column(sa.Column('email_timestamp', sa.DateTime(), nullable=True))
+
+        # Copy each email's timestamp onto its recipient rows
+        op.execute(
+            "UPDATE email_recipients SET email_timestamp = ("
+            "SELECT e.timestamp FROM internal_emails e WHERE e.id = email_recipients.email_id) "
+            "WHERE email_timestamp IS NULL"
+        )
+        op.create_index('ix_email_recipients_folder_page', 'email_recipients',
+                        ['recipient_id', 'folder', 'email_timestamp', 'email_id'], unique=False, if_not_exists=True)
+
+    if 'internal_emails' in tables:
+        op.create_index('ix_internal_emails_sender_page', 'internal_emails',
+                        ['sender_id', 'is_deleted_by_sender', 'timestamp', 'id'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_internal_emails_sender_page', table_name='internal_emails', if_exists=True)
+    op.drop_index('ix_email_recipients_folder_page', table_name='email_recipients', if_exists=True)
+    with op.batch_alter_table('email_recipients') as batch_op:
+        batch_op.drop_column('email_timestamp')
@@ -0,0 +1,39 @@
+"""Full-text search index for internal mail
+
+Revision ID: f2a7c9e31b64
+Revises: e5b29d7f4c18
+Create Date: 2026-10-18 17:03:51.027719
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from backend import mail_search
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a7c9e31b64'
+down_revision: Union[str, Sequence[str], None] = 'e5b29d7f4c18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+    if 'email_recipients' in tables:
+        op.create_index('ix_email_recipients_email_recipient', 'email_recipients',
+                        ['email_id', 'recipient_id'], unique=False, if_not_exists=True)
+    if 'internal_emails' in tables:
+        # FTS5 table (SQLite) or tsvector table + GIN index (PostgreSQL). Existing
+        # mail is indexed by the mail_search_rebuild job submitted at startup, or
+        # with: python -m backend.rebuild_mail_search
+        mail_search.create_search_index(op.get_bind())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(f"DROP TABLE IF EXISTS {mail_search.SEARCH_TABLE}")
+    op.drop_index('ix_email_recipients_email_recipient', table_name='email_recipients', if_exists=True)
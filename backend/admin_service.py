@@ -1,4 +1,7 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import insert
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from . import models, schemas, database
 from .auth_utils import get_password_hash
 import csv
@@ -22,26 +25,137 @@ def create_audit_log(db: Session, user_id: int, action: str, details: str = None
     db.add(log)
     db.commit()
 
-def process_bulk_upload_agniveers(db: Session, file_contents: str, admin_id: int) -> schemas.BulkUploadResult:
+# Bulk upload tuning
+# bcrypt is deliberately slow (~0.25s per hash), so passwords are hashed across
+# a process pool; inserts are batched per chunk of rows.
+BULK_UPLOAD_CHUNK_SIZE = 500
+BULK_HASH_WORKERS = int(os.getenv("BULK_HASH_WORKERS", "0")) or None  # None = os.cpu_count()
+BULK_HASH_MIN_PARALLEL = 8  # below this, pool start-up costs more than it saves
+
+DATE_FORMATS = ('%d-%m-%Y', '%Y-%m-%d', '%d/%m/%Y')
+
+def _cell(row, index):
+    return row[index].strip() if len(row) > index else None
+
+def _parse_agniveer_row(row) -> dict:
+    """
+    Maps one CSV row to Agniveer column values. Raises ValueError for rows that
+    cannot be imported.
+    Column order: 0: Batch, 1: ServiceNo, 2: Name, 3: Photo, 4: Reporting Date, 5: DoB,
+    6: NOK Name, 7: NOK Phone, 8: Address, 9: Bank Name, 10: Bank Branch, 11: Bank Acc,
+    12: PAN, 13: Adhaar, 14: Qual, 15: Coy
+    """
+    service_id = _cell(row, 1)
+    name = _cell(row, 2)
+    if not service_id:
+        raise ValueError("Missing Service ID")
+    if not name:
+        raise ValueError("Missing Name")
+
+    # Parse Date (Try standard formats)
+    r_date = None
+    date_str = _cell(row, 4)
+    if date_str:
+        for fmt in DATE_FORMATS:
+            try:
+                r_date = datetime.strptime(date_str, fmt)
+                break
+            except ValueError:
+                pass
+
+    dob_str = _cell(row, 5)
+
+    return dict(
+        service_id=service_id,
+        name=name,
+        batch_no=_cell(row, 0),
+        photo_url=_cell(row, 3),
+        reporting_date=r_date,
+        dob=datetime.strptime(dob_str, '%d-%m-%Y') if dob_str else None,
+        nok_name=_cell(row, 6),
+        nok_phone=_cell(row, 7),
+        hometown_address=_cell(row, 8),
+        bank_name=_cell(row, 9),
+        bank_branch=_cell(row, 10),
+        bank_account=_cell(row, 11),
+        pan_card=_cell(row, 12),
+        adhaar_card=_cell(row, 13),
+        higher_qualification=_cell(row, 14),
+        company=_cell(row, 15),
+        joining_date=datetime.utcnow() # System timestamp for record creation
+    )
+
+def _hash_passwords(passwords, on_hashed=None):
+    """
+    Hashes passwords in parallel across processes (bcrypt is CPU bound).
+    on_hashed(done_count) is called periodically as results arrive.
+    """
+    hashes = []
+
+    def collect(results):
+        for h in results:
+            hashes.append(h)
+            if on_hashed and len(hashes) % 50 == 0:
+                on_hashed(len(hashes))
+
+    if len(passwords) >= BULK_HASH_MIN_PARALLEL:
+        try:
+            with ProcessPoolExecutor(max_workers=BULK_HASH_WORKERS) as pool:
+                collect(pool.map(get_password_hash, passwords, chunksize=16))
+            return hashes
+        except (OSError, BrokenProcessPool):
+            # No process support (restricted host) or a worker died: hash the
+            # rest inline, keeping the results that already arrived
+            pass
+    collect(map(get_password_hash, passwords[len(hashes):]))
+    return hashes
+
+def _insert_agniveers_with_users(db: Session, pending):
+    """
+    Inserts Agniveers and their User accounts for (line_no, values, password_hash)
+    tuples in two bulk statements. Returns the Agniveer ids keyed by service_id.
+    """
+    inserted = db.execute(
+        insert(models.Agniveer).returning(models.Agniveer.service_id, models.Agniveer.id),
+        [values for _, values, _ in pending]
+    ).all()
+    agniveer_ids = {service_id: aid for service_id, aid in inserted}
+
+    # Create User Account (Service ID / Service ID pattern), linked to the profile
+    db.execute(insert(models.User), [dict(
+        username=values["service_id"],
+        password_hash=password_hash,
+        role=models.UserRole.AGNIVEER,
+        agniveer_id=agniveer_ids[values["service_id"]]
+    ) for _, values, password_hash in pending])
+    return agniveer_ids
+
+def process_bulk_upload_agniveers(db: Session, file_contents: str, admin_id: int, progress_callback=None) -> schemas.BulkUploadResult:
     """
     Parses CSV and creates Agniveer + User records.
     CSV Columns expected: 
-    CSV Columns expected: 
     Batch No, Service No, Name, Photo URL, Reporting Date, DoB, NOK Name, NOK Phone, 
     Address, Bank Name, Bank Branch, Bank Account, PAN, Adhaar, Qualification, Coy
+
+    Pipeline:
+    1. Parse and validate every row up front (per-row errors collected).
+    2. One set-based lookup per chunk for existing service IDs / usernames.
+    3. Hash the default passwords in parallel (process pool).
+    4. Insert Agniveers + Users with bulk inserts, one commit per chunk. If a chunk
+       fails, its rows are retried one by one so errors stay per row.
+
+    progress_callback(percent, message) is optional (used by background jobs).
     """
+    def report(percent, message):
+        if progress_callback:
+            progress_callback(percent, message)
+
     stream = io.StringIO(file_contents)
     csv_reader = csv.reader(stream)
     
-    # Skip header if present (Assuming first row is header based on user description not explicitly saying no header, but let's try to detect or assume standard)
-    # User listed 1.1, 1.2 etc. Let's assume the CSV *has* headers matching those or just ordered values.
-    # We will assume ORDER based on the list provided in the prompt.
-    # 0: Batch, 1: ServiceNo, 2: Name, 3: Photo, 4: Date, 5: NOK Name, 6: NOK Phone, 7: Address, 
-    # 8: Bank Name, 9: Bank Branch, 10: Bank Acc, 11: PAN, 12: Adhaar, 13: Qual, 14: Coy
-    
     success_count = 0
     failure_count = 0
-    errors = []
+    errors = [] # (line_no, message)
     
     rows = list(csv_reader)
     if not rows:
@@ -49,98 +163,94 @@ def process_bulk_upload_agniveers(db: Session, file_contents: str, admin_id: int
 
     # Basic heuristic to skip header if first col is "Batch No" or similar
     start_index = 0
-    if "batch" in rows[0][0].lower():
+    if rows[0] and "batch" in rows[0][0].lower():
         start_index = 1
-        
+
+    # 1. Pre-validate
+    parsed = [] # (line_no, values)
+    seen_service_ids = set()
     for i in range(start_index, len(rows)):
         row = rows[i]
+        # Flexible length check
+        if len(row) < 3:
+            continue # Skip empty lines
         try:
-            # Flexible length check
-            if len(row) < 3: 
-                continue # Skip empty lines
-                
-            # Extract basic mandatory fields
-            batch_no = row[0].strip()
-            service_id = row[1].strip()
-            name = row[2].strip()
-            
-            # Check for existing
-            if db.query(models.Agniveer).filter(models.Agniveer.service_id == service_id).first():
-                errors.append(f"Row {i+1}: Duplicate Service ID {service_id}")
+            values = _parse_agniveer_row(row)
+        except Exception as e:
+            errors.append((i + 1, str(e)))
+            failure_count += 1
+            continue
+        if values["service_id"] in seen_service_ids:
+            errors.append((i + 1, f"Duplicate Service ID {values['service_id']}"))
+            failure_count += 1
+            continue
+        seen_service_ids.add(values["service_id"])
+        parsed.append((i + 1, values))
+
+    # 2. Duplicate check against the database (set-based, per chunk)
+    accepted = []
+    for start in range(0, len(parsed), BULK_UPLOAD_CHUNK_SIZE):
+        chunk = parsed[start:start + BULK_UPLOAD_CHUNK_SIZE]
+        service_ids = [values["service_id"] for _, values in chunk]
+
+        existing_agniveers = {r[0] for r in db.query(models.Agniveer.service_id).filter(
+            models.Agniveer.service_id.in_(service_ids)
+        ).all()}
+        existing_users = dict(db.query(models.User.username, models.User.agniveer_id).filter(
+            models.User.username.in_(service_ids)
+        ).all())
+
+        orphaned = []
+        for line_no, values in chunk:
+            service_id = values["service_id"]
+            if service_id in existing_agniveers:
+                errors.append((line_no, f"Duplicate Service ID {service_id}"))
                 failure_count += 1
-                continue
-            
-            # Check if User exists
-            existing_user = db.query(models.User).filter(models.User.username == service_id).first()
-            if existing_user:
-                 # Check if this user is orphaned (no agniveer profile) or if we should overwrite
-                 if existing_user.agniveer_id is None:
-                      # Orphaned user from bad delete - clean it up
-                      db.delete(existing_user)
-                      db.flush()
-                 else:
-                      errors.append(f"Row {i+1}: User {service_id} already exists")
-                      failure_count += 1
-                      continue
-
-            # Create User Account (Service ID / Service ID pattern)
-            hashed_pw = get_password_hash(service_id)
-            new_user = models.User(
-                username=service_id,
-                password_hash=hashed_pw,
-                role=models.UserRole.AGNIVEER
-            )
-            db.add(new_user)
-            db.flush() # Get ID
-            
-            # Parse Date (Try standard formats)
-            r_date = None
-            date_str = row[4].strip()
-            if date_str:
-                for fmt in ('%d-%m-%Y', '%Y-%m-%d', '%d/%m/%Y'):
-                    try:
-                        r_date = datetime.strptime(date_str, fmt)
-                        break
-                    except:
-                        pass
-            
-            # Create Agniveer Profile
-            new_agniveer = models.Agniveer(
-                service_id=service_id,
-                name=name,
-                batch_no=batch_no,
-                photo_url=row[3].strip() if len(row) > 3 else None,
-                reporting_date=r_date,
-                dob=datetime.strptime(row[5].strip(), '%d-%m-%Y') if len(row) > 5 and row[5].strip() else None, # Attempt fixed format for now or reuse date logic
-                nok_name=row[6].strip() if len(row) > 6 else None,
-                nok_phone=row[7].strip() if len(row) > 7 else None,
-                hometown_address=row[8].strip() if len(row) > 8 else None,
-                bank_name=row[9].strip() if len(row) > 9 else None,
-                bank_branch=row[10].strip() if len(row) > 10 else None,
-                bank_account=row[11].strip() if len(row) > 11 else None,
-                pan_card=row[12].strip() if len(row) > 12 else None,
-                adhaar_card=row[13].strip() if len(row) > 13 else None,
-                higher_qualification=row[14].strip() if len(row) > 14 else None,
-                company=row[15].strip() if len(row) > 15 else None,
-                joining_date=datetime.utcnow() # System timestamp for record creation
-            )
-            
-            # Link User
-            new_agniveer.user_account = new_user # This might work if relationship is set, or manually link
-            # User has agniveer_id, Agniveer has user_account... relationship 'back_populates' handles it 
-            # BUT we need to commit Agniveer first to get ID for User.agniveer_id OR let SQLAlchemy handle it.
-            # Safe way:
-            db.add(new_agniveer)
-            db.flush()
-            new_user.agniveer_id = new_agniveer.id
-            
+            elif service_id in existing_users and existing_users[service_id] is not None:
+                errors.append((line_no, f"User {service_id} already exists"))
+                failure_count += 1
+            else:
+                if service_id in existing_users:
+                    # Orphaned user from bad delete (no agniveer profile) - clean it up
+                    orphaned.append(service_id)
+                accepted.append((line_no, values))
+
+        if orphaned:
+            db.query(models.User).filter(models.User.username.in_(orphaned)).delete(synchronize_session=False)
             db.commit()
-            success_count += 1
-            
-        except Exception as e:
+
+    # 3. Hash passwords in parallel (the slow stage: 10% -> 70%)
+    report(10, f"Validated {len(parsed)} rows, hashing {len(accepted)} passwords")
+    hashes = _hash_passwords(
+        [values["service_id"] for _, values in accepted],
+        on_hashed=lambda done: report(10 + 60 * done / len(accepted), f"Hashed {done}/{len(accepted)} passwords")
+    )
+    pending_rows = [(line_no, values, h) for (line_no, values), h in zip(accepted, hashes)]
+
+    # 4. Chunked bulk inserts
+    for start in range(0, len(pending_rows), BULK_UPLOAD_CHUNK_SIZE):
+        chunk = pending_rows[start:start + BULK_UPLOAD_CHUNK_SIZE]
+        try:
+            _insert_agniveers_with_users(db, chunk)
+            db.commit()
+            success_count += len(chunk)
+        except Exception:
             db.rollback()
-            failure_count += 1
-            errors.append(f"Row {i+1}: {str(e)}")
+            # Retry row by row to report exactly which rows fail
+            for item in chunk:
+                try:
+                    _insert_agniveers_with_users(db, [item])
+                    db.commit()
+                    success_count += 1
+                except Exception as e:
+                    db.rollback()
+                    failure_count += 1
+                    errors.append((item[0], str(e)))
+        done = start + len(chunk)
+        report(70 + 30 * done / len(pending_rows), f"Inserted {done}/{len(pending_rows)} rows")
+
+    # Report errors in file order
+    errors.sort(key=lambda error: error[0])
             
     create_audit_log(db, admin_id, "BULK_UPLOAD", f"Processed {len(rows)-start_index} rows. Success: {success_count}")
     
@@ -148,5 +258,5 @@ def process_bulk_upload_agniveers(db: Session, file_contents: str, admin_id: int
         total_processed=len(rows)-start_index,
         successful=success_count,
         failed=failure_count,
-        errors=errors
+        errors=[f"Row {line_no}: {message}" for line_no, message in errors]
     )
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+
+# AI report cache
+# A briefing depends only on the generation request (prompt built from the
+# Agniveer name + latest RRI row, model name and options), so it is stored under
+# a sha256 of that request. Repeat views are served from the table; a new
+# generation only happens when the inputs change. The table is bounded to
+# AI_REPORT_CACHE_MAX_ENTRIES rows, evicting the least recently used.
+AI_REPORT_CACHE_MAX_ENTRIES = int(os.getenv("AI_REPORT_CACHE_MAX_ENTRIES", "1000"))
+# Hits are reads: an entry's last_accessed_at (its LRU position) is only written
+# once it is older than this, and hit_count then gains the hits tallied in this
+# process since the last write (a restart loses at most that tally)
+AI_REPORT_CACHE_TOUCH_SECONDS = int(os.getenv("AI_REPORT_CACHE_TOUCH_SECONDS", "300"))
+
+_lock = threading.Lock()
+_metrics = {"hits": 0, "misses": 0, "refreshes": 0, "stores": 0, "evictions": 0}
+# cache_key -> hits not yet added to hit_count
+_pending_hits: Dict[str, int] = {}
+
+def _count(metric: str, amount: int = 1):
+    with _lock:
+        _metrics[metric] += amount
+
+def cache_key(payload: Dict[str, Any]) -> str:
+    """Content address of a generation request; 'stream' does not change the output."""
+    material = {k: v for k, v in payload.items() if k != "stream"}
+    return hashlib.sha256(json.dumps(material, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def get_cached_report(db: Session, key: str) -> Optional[models.AIReportCache]:
+    entry = db.query(models.AIReportCache).filter(models.AIReportCache.cache_key == key).first()
+    if entry is None:
+        _count("misses")
+        return None
+
+    _count("hits")
+    now = datetime.utcnow()
+    with _lock:
+        _pending_hits[key] = _pending_hits.get(key, 0) + 1
+        stale = entry.last_accessed_at is None or \
+            now - entry.last_accessed_at >= timedelta(seconds=AI_REPORT_CACHE_TOUCH_SECONDS)
+        pending = _pending_hits.pop(key) if stale else 0
+    if stale:
+        entry.last_accessed_at = now
+        entry.hit_count = (entry.hit_count or 0) + pending
+        db.commit()
+    return entry
+
+def store_report(db: Session, key: str, agniveer_id: Optional[int], model_name: str, report: str):
+    """Inserts or replaces the cached report for key, then enforces the size bound."""
+    now = datetime.utcnow()
+    entry = db.query(models.AIReportCache).filter(models.AIReportCache.cache_key == key).first()
+    if entry is None:
+        db.add(models.AIReportCache(
+            cache_key=key, agniveer_id=agniveer_id, model_name=model_name,
+            report=report, created_at=now, last_accessed_at=now, hit_count=0
+        ))
+    else:
+        entry.report = report
+        entry.created_at = now
+        entry.last_accessed_at = now
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request stored the same key first; its report is equivalent
+        db.rollback()
+        return
+    _count("stores")
+    evict(db)
+
+def evict(db: Session, max_entries: int = None) -> int:
+    """Deletes least recently used rows beyond max_entries."""
+    max_entries = AI_REPORT_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+    total = db.query(models.AIReportCache).count()
+    if total <= max_entries:
+        return 0
+
+    stale = (db.query(models.AIReportCache.id, models.AIReportCache.cache_key)
+             .order_by(models.AIReportCache.last_accessed_at.asc(), models.AIReportCache.id.asc())
+             .limit(total - max_entries).all())
+    stale_ids = [r[0] for r in stale]
+    db.query(models.AIReportCache).filter(models.AIReportCache.id.in_(stale_ids)).delete(synchronize_session=False)
+    db.commit()
+    with _lock:
+        for _, key in stale:
+            _pending_hits.pop(key, None)
+    _count("evictions", len(stale_ids))
+    return len(stale_ids)
+
+def record_refresh():
+    _count("refreshes")
+
+def stats(db: Session) -> dict:
+    with _lock:
+        metrics = dict(_metrics)
+    lookups = metrics["hits"] + metrics["misses"]
+    metrics["hit_rate"] = round(metrics["hits"] / lookups, 4) if lookups else 0.0
+    metrics["entries"] = db.query(models.AIReportCache).count()
+    metrics["max_entries"] = AI_REPORT_CACHE_MAX_ENTRIES
+    return metrics
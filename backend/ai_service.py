@@ -1,21 +1,205 @@
+import asyncio
 import json
-import urllib.request
-import urllib.error
-from typing import Dict, Any
+import math
+import os
+import threading
+import time
+from typing import Dict, Any, AsyncIterator, Optional, Tuple
+import httpx
 
-OLLAMA_URL = "http://127.0.0.1:11434/api/generate"
-MODEL_NAME = "llama3.2:3b"
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434/api/generate")
+MODEL_NAME = os.getenv("OLLAMA_MODEL", "llama3.2:3b")
 
-def generate_rri_report(agniveer_name: str, rri_data: Dict[str, Any]) -> str:
+# Client limits
+# A local model can only generate a couple of reports at a time; extra requests
+# wait in a bounded queue and anything beyond that is rejected with 429 so the
+# API threadpool is never tied up waiting on the model.
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "120"))
+OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "2"))
+OLLAMA_MAX_QUEUE = int(os.getenv("OLLAMA_MAX_QUEUE", "8"))
+# Initial estimate of one generation, refined from observed durations (for Retry-After)
+OLLAMA_EXPECTED_SECONDS = float(os.getenv("OLLAMA_EXPECTED_SECONDS", "15"))
+
+# Generation slots shared by every client in the process: the API's client and
+# the warm-up job's, which runs its own event loop on a job worker thread.
+# Together they never have more than OLLAMA_MAX_CONCURRENCY generations running.
+MODEL_SLOTS = threading.BoundedSemaphore(OLLAMA_MAX_CONCURRENCY)
+# The slots span event loops, so waiters poll instead of awaiting them
+MODEL_SLOT_POLL_SECONDS = 0.05
+
+
+class AIQueueFull(Exception):
+    """Raised when the generation queue is full; retry_after is a hint in seconds."""
+    def __init__(self, retry_after: int):
+        super().__init__(f"AI generation queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class OllamaClient:
     """
-    Generates a performance summary and retention report using Ollama.
+    Async Ollama client with a pooled HTTP connection, timeouts, a concurrency
+    semaphore and a bounded wait queue. Each generation also holds one of the
+    process-wide model_slots (MODEL_SLOTS by default). The semaphore and HTTP
+    client are created lazily inside the running event loop.
     """
-    
-    # Construct Prompt
-    prompt = f"""
+
+    def __init__(self, url: str = OLLAMA_URL, max_concurrency: int = OLLAMA_MAX_CONCURRENCY,
+                 max_queue: int = OLLAMA_MAX_QUEUE, connect_timeout: float = OLLAMA_CONNECT_TIMEOUT,
+                 read_timeout: float = OLLAMA_READ_TIMEOUT, model_slots: threading.BoundedSemaphore = None):
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.model_slots = model_slots if model_slots is not None else MODEL_SLOTS
+        self.max_queue = max_queue
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._avg_seconds = OLLAMA_EXPECTED_SECONDS
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.cancelled = 0
+
+    def _ensure_started(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def retry_after(self) -> int:
+        # Time until a queue slot is likely to free up
+        backlog = self.waiting + 1
+        return max(1, math.ceil(self._avg_seconds * backlog / self.max_concurrency))
+
+    async def generate(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POSTs a non-streaming generate request. Raises AIQueueFull or httpx errors."""
+        self._ensure_started()
+        await self._acquire()
+
+        started = time.monotonic()
+        try:
+            response = await self._client.post(self.url, json=payload)
+            response.raise_for_status()
+            self.completed += 1
+            # Exponential moving average of successful generation time
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.monotonic() - started)
+            return response.json()
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._release()
+
+    def ensure_capacity(self):
+        """Raises AIQueueFull if a new request would be rejected right now."""
+        # Waiters may be queued behind another client's generations, so the
+        # queue bound applies whatever this client has in flight
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise AIQueueFull(self.retry_after())
+
+    async def _acquire(self):
+        # This client's semaphore first (its queue order), then a model slot
+        self.ensure_capacity()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+            try:
+                while not self.model_slots.acquire(blocking=False):
+                    await asyncio.sleep(MODEL_SLOT_POLL_SECONDS)
+            except BaseException:
+                self._semaphore.release()
+                raise
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+
+    def _release(self):
+        self.in_flight -= 1
+        self.model_slots.release()
+        self._semaphore.release()
+
+    async def stream(self, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        Streams response tokens for a generate request ("stream": true).
+        Leaving the iteration early (client disconnect / cancellation) closes the
+        HTTP response, which makes Ollama stop generating.
+        """
+        self._ensure_started()
+        await self._acquire()
+
+        started = time.monotonic()
+        try:
+            async with self._client.stream("POST", self.url, json={**payload, "stream": True}) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        break
+            self.completed += 1
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.monotonic() - started)
+        except (asyncio.CancelledError, GeneratorExit):
+            # Consumer went away (browser closed the stream)
+            self.cancelled += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "avg_generation_seconds": round(self._avg_seconds, 2)
+        }
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._semaphore = None
+
+ollama_client = OllamaClient()
+
+
+def build_rri_context(rri) -> Dict[str, Any]:
+    """Prompt context from a RetentionReadiness row."""
+    # Technical breakdown is not stored in RRI table directly as JSON (it's in the TechnicalAssessment)
+    # We just use the RRI aggregate scores to keep it fast.
+    return {
+        "rri_score": rri.rri_score,
+        "retention_band": rri.retention_band.value,
+        "technical_component": rri.technical_component,
+        "technical_breakdown": f"Completeness: {rri.technical_completeness*100}%", # Simplified for now
+        "behavioral_component": rri.behavioral_component,
+        "behavioral_status": f"Completeness: {rri.behavioral_completeness*100}%",
+        "behavioral_trend": "N/A", # Not stored in DB model yet, need to re-calc or add col
+        "achievement_component": rri.achievement_component,
+        "achievement_count": "N/A"
+    }
+
+def build_rri_prompt(agniveer_name: str, rri_data: Dict[str, Any]) -> str:
+    return f"""
     Role: You are the Company Commander's Second-in-Command (2IC).
     Task: specific patterns in the provided data.
-    
+
     STRICT CONSTRAINTS:
     1. ONLY use the data provided below. Do NOT invent personal details (e.g., marriage, leave, family issues) unless explicitly stated.
     2. If a data point is missing, state "No data available".
@@ -34,36 +218,51 @@ def generate_rri_report(agniveer_name: str, rri_data: Dict[str, Any]) -> str:
        - [Insight 1]: (Cited Data Point)
        - [Insight 2]: (Cited Data Point)
     3. COMMAND CONSIDERATIONS: One logical inference based ONLY on the scores (e.g., "High technical but low behavioral suggests need for mentorship").
-    
+
     Tone: Objective, factual, concise.
     """
 
-    payload = {
+def build_payload(prompt: str, stream: bool = False) -> Dict[str, Any]:
+    return {
         "model": MODEL_NAME,
         "prompt": prompt,
-        "stream": False,
+        "stream": stream,
         "options": {
             "temperature": 0.3, # Lower temperature for more deterministic/factual output
             "num_predict": 400
         }
     }
 
+def describe_error(e: Exception, client: OllamaClient = None) -> str:
+    """Readable message for a failed generation (same wording as the non-streaming path)."""
+    client = client or ollama_client
+    if isinstance(e, httpx.HTTPStatusError):
+        return f"Error: Ollama returned status {e.response.status_code}"
+    if isinstance(e, httpx.TimeoutException):
+        return f"AI Generation Failed: Ollama did not respond within {client.timeout.read:.0f}s"
+    if isinstance(e, httpx.TransportError):
+        return f"Connection Failed: Ensure Ollama is running at {client.url}. details: {str(e)}"
+    return f"AI Generation Failed: {str(e)}"
+
+async def generate_from_payload(payload: Dict[str, Any], client: OllamaClient = None) -> Tuple[str, bool]:
+    """
+    Runs one generation. Returns (text, succeeded); on failure the text is a
+    readable message. Raises AIQueueFull when too many generations are queued.
+    """
+    client = client or ollama_client
     try:
-        data = json.dumps(payload).encode("utf-8")
-        req = urllib.request.Request(
-            OLLAMA_URL, 
-            data=data, 
-            headers={"Content-Type": "application/json"}
-        )
-        
-        with urllib.request.urlopen(req) as response:
-            if response.status == 200:
-                result = json.loads(response.read().decode("utf-8"))
-                return result.get("response", "No response generated by AI.")
-            else:
-                return f"Error: Ollama returned status {response.status}"
-                
-    except urllib.error.URLError as e:
-        return f"Connection Failed: Ensure Ollama is running at {OLLAMA_URL}. details: {str(e)}"
+        result = await client.generate(payload)
+        return result.get("response", "No response generated by AI."), "response" in result
+    except AIQueueFull:
+        raise
     except Exception as e:
-        return f"AI Generation Failed: {str(e)}"
+        return describe_error(e, client), False
+
+async def generate_rri_report(agniveer_name: str, rri_data: Dict[str, Any], client: OllamaClient = None) -> str:
+    """
+    Generates a performance summary and retention report using Ollama.
+    Raises AIQueueFull when too many generations are already queued; other
+    failures are returned as a readable message, as before.
+    """
+    report, _ = await generate_from_payload(build_payload(build_rri_prompt(agniveer_name, rri_data)), client)
+    return report
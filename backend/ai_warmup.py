@@ -0,0 +1,210 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from datetime import time as dtime
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+
+from . import models, analytics, ai_service, ai_report_cache
+
+# AI briefing warm-up
+# The action center sends commanders straight to "AI Analysis" for the top
+# Red-band soldier, which used to mean a cold generation on click. After RRI is
+# recalculated (and optionally once a night) this walks each company's watchlist
+# and generates the missing briefings ahead of time, so the click is a cache hit.
+AI_WARMUP_BANDS = [b.strip().upper() for b in os.getenv("AI_WARMUP_BANDS", "RED,AMBER").split(",") if b.strip()]
+AI_WARMUP_MAX_PER_COMPANY = int(os.getenv("AI_WARMUP_MAX_PER_COMPANY", "10"))
+# Warm-up generations share ai_service.MODEL_SLOTS with interactive requests
+# and are capped at OLLAMA_MAX_CONCURRENCY - 1 (at least 1), so interactive
+# requests still get a slot
+AI_WARMUP_CONCURRENCY = int(os.getenv("AI_WARMUP_CONCURRENCY", "1"))
+# Nightly window in server local time, e.g. "01:00-05:00"; empty disables the schedule
+AI_WARMUP_WINDOW = os.getenv("AI_WARMUP_WINDOW", "")
+AI_WARMUP_AFTER_RRI = os.getenv("AI_WARMUP_AFTER_RRI", "true").lower() == "true"
+
+JOB_TYPE = "ai_briefing_warmup"
+
+_scheduler_task: Optional[asyncio.Task] = None
+
+def parse_window(text: str) -> Optional[Tuple[dtime, dtime]]:
+    """'HH:MM-HH:MM' -> (start, end); windows may wrap past midnight."""
+    if not text:
+        return None
+    start, end = (datetime.strptime(part.strip(), "%H:%M").time() for part in text.split("-"))
+    return start, end
+
+def in_window(now: datetime, window: Tuple[dtime, dtime]) -> bool:
+    start, end = window
+    if start <= end:
+        return start <= now.time() < end
+    return now.time() >= start or now.time() < end
+
+def window_end(now: datetime, window: Tuple[dtime, dtime]) -> datetime:
+    """End of the window that contains now."""
+    end = datetime.combine(now.date(), window[1])
+    return end if end > now else end + timedelta(days=1)
+
+def seconds_until_window(now: datetime, window: Tuple[dtime, dtime]) -> float:
+    if in_window(now, window):
+        return 0.0
+    start = datetime.combine(now.date(), window[0])
+    if start <= now:
+        start += timedelta(days=1)
+    return (start - now).total_seconds()
+
+def select_candidates(db: Session, bands: List[str], max_per_company: int, companies: List[str] = None):
+    """
+    Watchlist per company: Red-band soldiers in get_retention_risk order (its first
+    entry is the action center's AI Analysis target), then other requested bands
+    from lowest RRI up. Returns [(company, agniveer_id, name, rri_record_id)].
+    """
+    if companies is None:
+        companies = [r[0] for r in db.query(models.Agniveer.company).filter(models.Agniveer.company.isnot(None)).distinct().all()]
+
+    selected = []
+    for company in companies:
+        company_analytics = analytics.CompanyAnalytics(db, company)
+        record_ids = {r.agniveer_id: r.rri_record_id for r, _ in company_analytics.latest_rri}
+
+        watchlist = []
+        if "RED" in bands:
+            watchlist += [(row["agniveer_id"], row["name"]) for row in company_analytics.retention_risk()]
+        others = sorted(
+            ((r, name) for r, name in company_analytics.latest_rri
+             if r.retention_band.value != "RED" and r.retention_band.value in bands),
+            key=lambda pair: pair[0].rri_score
+        )
+        watchlist += [(r.agniveer_id, name) for r, name in others]
+
+        for agniveer_id, name in watchlist[:max_per_company]:
+            if record_ids.get(agniveer_id):
+                selected.append((company, agniveer_id, name, record_ids[agniveer_id]))
+    return selected
+
+async def _generate_missing(db: Session, todo, client: ai_service.OllamaClient, deadline: Optional[float],
+                            counts: dict, progress: Optional[Callable]):
+    slots = asyncio.Semaphore(client.max_concurrency)
+
+    async def warm(agniveer_id, key, payload):
+        async with slots:
+            # Nothing new is started once the nightly window has closed
+            if deadline is not None and time.monotonic() >= deadline:
+                counts["deferred"] += 1
+                report, succeeded = None, None
+            else:
+                report, succeeded = await ai_service.generate_from_payload(payload, client)
+        if succeeded:
+            ai_report_cache.store_report(db, key, agniveer_id, payload["model"], report)
+            counts["generated"] += 1
+        elif succeeded is False:
+            counts["failed"] += 1
+        if progress:
+            done = counts["generated"] + counts["failed"] + counts["deferred"]
+            progress(100 * done / len(todo), f"{done}/{len(todo)} briefings processed")
+
+    # At most max_concurrency generations at a time; the rest wait their turn
+    await asyncio.gather(*[warm(*item) for item in todo])
+
+def warm_briefings(db: Session, bands: List[str] = None, max_per_company: int = None,
+                   companies: List[str] = None, concurrency: int = None,
+                   deadline: Optional[datetime] = None, progress_callback: Optional[Callable] = None) -> dict:
+    """
+    Generates and caches briefings for the watchlists that are not cached yet.
+    Runs on a job worker thread with its own event loop and Ollama client,
+    which shares the process-wide model slots with the API's client.
+    """
+    started = time.monotonic()
+    bands = [b.upper() for b in (bands or AI_WARMUP_BANDS)]
+    max_per_company = max_per_company or AI_WARMUP_MAX_PER_COMPANY
+    concurrency = min(concurrency or AI_WARMUP_CONCURRENCY, max(1, ai_service.OLLAMA_MAX_CONCURRENCY - 1))
+
+    candidates = select_candidates(db, bands, max_per_company, companies)
+
+    # Same context/prompt as the report endpoint, so the cache keys line up
+    records = {}
+    record_ids = [c[3] for c in candidates]
+    for i in range(0, len(record_ids), 500):
+        for rri in db.query(models.RetentionReadiness).filter(models.RetentionReadiness.id.in_(record_ids[i:i + 500])).all():
+            records[rri.id] = rri
+
+    todo = []
+    for _, agniveer_id, name, record_id in candidates:
+        payload = ai_service.build_payload(ai_service.build_rri_prompt(name, ai_service.build_rri_context(records[record_id])))
+        todo.append((agniveer_id, ai_report_cache.cache_key(payload), payload))
+
+    # Existence check only; warm-up lookups should not count as cache hits
+    keys = [t[1] for t in todo]
+    cached = set()
+    for i in range(0, len(keys), 500):
+        cached.update(r[0] for r in db.query(models.AIReportCache.cache_key)
+                      .filter(models.AIReportCache.cache_key.in_(keys[i:i + 500])).all())
+    todo = [t for t in todo if t[1] not in cached]
+
+    counts = {"generated": 0, "failed": 0, "deferred": 0}
+    if todo:
+        deadline_monotonic = None
+        if deadline is not None:
+            deadline_monotonic = time.monotonic() + (deadline - datetime.now()).total_seconds()
+
+        async def run():
+            client = ai_service.OllamaClient(url=ai_service.OLLAMA_URL, max_concurrency=concurrency, max_queue=len(todo))
+            try:
+                await _generate_missing(db, todo, client, deadline_monotonic, counts, progress_callback)
+            finally:
+                await client.aclose()
+        asyncio.run(run())
+
+    per_company = {}
+    for company, *_ in candidates:
+        per_company[company] = per_company.get(company, 0) + 1
+
+    return {
+        "bands": bands,
+        "candidates": len(candidates),
+        "per_company": per_company,
+        "already_cached": len(cached),
+        **counts,
+        "duration_seconds": round(time.monotonic() - started, 2)
+    }
+
+def schedule_warmup(db: Session, payload: dict = None, created_by: int = None) -> Optional[models.Job]:
+    """Submits a warm-up job unless one is already queued or running."""
+    from . import jobs
+    pending = db.query(models.Job.id).filter(
+        models.Job.job_type == JOB_TYPE,
+        models.Job.status.in_([models.JobStatus.QUEUED, models.JobStatus.RUNNING])
+    ).first()
+    if pending:
+        return None
+    return jobs.submit_job(db, JOB_TYPE, payload or {}, created_by=created_by)
+
+def after_rri_recalculation(db: Session, companies: List[str] = None):
+    """Hook for RRI recalculation: warm the affected companies' briefings."""
+    if not AI_WARMUP_AFTER_RRI:
+        return None
+    return schedule_warmup(db, {"companies": companies} if companies else {})
+
+async def _nightly_scheduler(window: Tuple[dtime, dtime]):
+    from . import database
+    while True:
+        await asyncio.sleep(seconds_until_window(datetime.now(), window))
+        db = database.SessionLocal()
+        try:
+            schedule_warmup(db, {"respect_window": True})
+        finally:
+            db.close()
+        # Sleep past the end of this window before arming the next one
+        await asyncio.sleep((window_end(datetime.now(), window) - datetime.now()).total_seconds() + 1)
+
+def start_scheduler():
+    global _scheduler_task
+    window = parse_window(AI_WARMUP_WINDOW)
+    if window is not None and _scheduler_task is None:
+        _scheduler_task = asyncio.get_running_loop().create_task(_nightly_scheduler(window))
+
+def stop_scheduler():
+    global _scheduler_task
+    if _scheduler_task is not None:
+        _scheduler_task.cancel()
+        _scheduler_task = None
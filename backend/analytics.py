@@ -1,267 +1,471 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, desc, extract
+from datetime import datetime
+from functools import cached_property
 from . import models
 
-def get_company_overview(db: Session, unit: str):
-    # 1. Total Agniveers in Company (note: 'unit' param is actually company name)
-    total_agniveers = db.query(models.Agniveer).filter(models.Agniveer.company == unit).count()
-    
-    # 2. RRI Band Distribution
-    # Identify the LATEST retention_readiness record for each Agniveer.
-    # This prevents counting historical/stale scores in current stats.
-    
-    # Subquery: Get (agniveer_id, max_calculation_date) for all records
-    subquery = db.query(
-        models.RetentionReadiness.agniveer_id,
-        func.max(models.RetentionReadiness.calculation_date).label('max_date')
-    ).group_by(models.RetentionReadiness.agniveer_id).subquery()
-    
-    # Main Query: Join RetentionReadiness with the Subquery to filter only the latest records.
-    # Also Join with Agniveer table to filter by Unit.
-    rri_data = db.query(models.RetentionReadiness).join(
-        subquery,
-        (models.RetentionReadiness.agniveer_id == subquery.c.agniveer_id) &
-        (models.RetentionReadiness.calculation_date == subquery.c.max_date)
-    ).join(models.Agniveer).filter(models.Agniveer.company == unit).all()
-    
-    green_count = sum(1 for r in rri_data if r.retention_band == models.RRIBand.GREEN)
-    amber_count = sum(1 for r in rri_data if r.retention_band == models.RRIBand.AMBER)
-    red_count = sum(1 for r in rri_data if r.retention_band == models.RRIBand.RED)
-    
-    avg_rri = 0
-    if rri_data:
-        avg_rri = sum(r.rri_score for r in rri_data) / len(rri_data)
-        
-    return {
-        "unit": unit,
-        "total_agniveers": total_agniveers,
-        "assessed_count": len(rri_data),
-        "average_rri": round(avg_rri, 2),
-        "band_distribution": {
-            "green": green_count,
-            "amber": amber_count,
-            "red": red_count
+
+class CompanyAnalytics:
+    """
+    Per-request analytics context for one company.
+    Each dataset (roster, latest RRI, latest technical, current-quarter
+    behavioral, recent achievements) is loaded at most once, on first use;
+    overview, risk list, pending counts, honor board, command hub and action
+    center are all derived from them in memory. The Company dashboard uses one
+    instance for every panel instead of re-running the same queries per panel.
+    """
+
+    def __init__(self, db: Session, unit: str):
+        # note: 'unit' is actually the company name
+        self.db = db
+        self.unit = unit
+        self.current_quarter = f"Q{(datetime.now().month - 1) // 3 + 1} {datetime.now().year}"
+
+    # --- Datasets (one query each) ---
+
+    @cached_property
+    def roster(self):
+        # (id, name) of every Agniveer in the company
+        return self.db.query(models.Agniveer.id, models.Agniveer.name)\
+            .filter(models.Agniveer.company == self.unit).all()
+
+    @cached_property
+    def latest_rri(self):
+        # Latest RRI per Agniveer from the current_rri snapshot, with the name
+        return self.db.query(models.CurrentRRI, models.Agniveer.name).join(models.Agniveer)\
+            .filter(models.Agniveer.company == self.unit).all()
+
+    @cached_property
+    def latest_technical(self):
+        # Latest technical assessment for each Agniveer in the company
+        subquery = self.db.query(
+            models.TechnicalAssessment.agniveer_id,
+            func.max(models.TechnicalAssessment.assessment_date).label('max_date')
+        ).group_by(models.TechnicalAssessment.agniveer_id).subquery()
+
+        return self.db.query(models.TechnicalAssessment).join(
+            subquery,
+            (models.TechnicalAssessment.agniveer_id == subquery.c.agniveer_id) &
+            (models.TechnicalAssessment.assessment_date == subquery.c.max_date)
+        ).join(models.Agniveer).filter(models.Agniveer.company == self.unit).all()
+
+    @cached_property
+    def current_quarter_behavioral_ids(self):
+        # Agniveers WITH a behavioral assessment for the current quarter
+        rows = self.db.query(models.BehavioralAssessment.agniveer_id).join(models.Agniveer)\
+            .filter(models.Agniveer.company == self.unit)\
+            .filter(models.BehavioralAssessment.quarter == self.current_quarter)\
+            .distinct().all()
+        return {r[0] for r in rows}
+
+    @cached_property
+    def recent_achievements(self):
+        return self.db.query(models.Achievement, models.Agniveer.name).join(models.Agniveer)\
+            .filter(models.Agniveer.company == self.unit)\
+            .order_by(desc(models.Achievement.date_earned)).limit(5).all()
+
+    # --- Derived views ---
+
+    def overview(self):
+        # 1. Total Agniveers in Company
+        total_agniveers = len(self.roster)
+
+        # 2. RRI Band Distribution
+        # Only the LATEST retention_readiness record per Agniveer counts towards
+        # current stats. current_rri holds exactly that row for each Agniveer
+        # (maintained by rri_engine), so no max(calculation_date) subquery is needed.
+        rri_data = [r for r, _ in self.latest_rri]
+
+        green_count = sum(1 for r in rri_data if r.retention_band == models.RRIBand.GREEN)
+        amber_count = sum(1 for r in rri_data if r.retention_band == models.RRIBand.AMBER)
+        red_count = sum(1 for r in rri_data if r.retention_band == models.RRIBand.RED)
+
+        avg_rri = 0
+        if rri_data:
+            avg_rri = sum(r.rri_score for r in rri_data) / len(rri_data)
+
+        return {
+            "unit": self.unit,
+            "total_agniveers": total_agniveers,
+            "assessed_count": len(rri_data),
+            "average_rri": round(avg_rri, 2),
+            "band_distribution": {
+                "green": green_count,
+                "amber": amber_count,
+                "red": red_count
+            }
         }
-    }
 
-def get_technical_gaps(db: Session, unit: str):
-    # Analyze Technical Assessments to find weak areas
-    # Get latest tech assessment for each agniveer in unit
-    
-    # Fetch all latest tech assessments
-    subquery = db.query(
-        models.TechnicalAssessment.agniveer_id,
-        func.max(models.TechnicalAssessment.assessment_date).label('max_date')
-    ).group_by(models.TechnicalAssessment.agniveer_id).subquery()
-    
-    tech_data = db.query(models.TechnicalAssessment).join(
-        subquery,
-        (models.TechnicalAssessment.agniveer_id == subquery.c.agniveer_id) &
-        (models.TechnicalAssessment.assessment_date == subquery.c.max_date)
-    ).join(models.Agniveer).filter(models.Agniveer.company == unit).all()
-    
-    if not tech_data:
-        return {"firing": 0, "weapon": 0, "tactical": 0, "cognitive": 0}
-
-    # Calculate average scores
-    avg_firing = sum(t.firing_score or 0 for t in tech_data) / len(tech_data)
-    avg_weapon = sum(t.weapon_handling_score or 0 for t in tech_data) / len(tech_data)
-    avg_tactical = sum(t.tactical_score or 0 for t in tech_data) / len(tech_data)
-    avg_cognitive = sum(t.cognitive_score or 0 for t in tech_data) / len(tech_data)
-    
-    return {
-        "firing": round(avg_firing, 2),
-        "weapon": round(avg_weapon, 2),
-        "tactical": round(avg_tactical, 2),
-        "cognitive": round(avg_cognitive, 2)
-    }
+    def technical_gaps(self):
+        # Analyze latest Technical Assessments to find weak areas
+        tech_data = self.latest_technical
 
-def get_retention_risk(db: Session, unit: str):
-    # Retrieve a list of Agniveers currently in the 'RED' (Low Retention) band.
-    # Uses the same "Latest Record" subquery pattern to ensure current status.
-    
-    # Subquery: Find latest assessment date for each person
-    subquery = db.query(
-        models.RetentionReadiness.agniveer_id,
-        func.max(models.RetentionReadiness.calculation_date).label('max_date')
-    ).group_by(models.RetentionReadiness.agniveer_id).subquery()
-    
-    # Main Query:
-    # 1. Join with Subquery (Latest only)
-    # 2. Join with Agniveer (Filter by Unit)
-    # 3. Filter by Band == RED
-    risk_data = db.query(models.RetentionReadiness).join(
-        subquery,
-        (models.RetentionReadiness.agniveer_id == subquery.c.agniveer_id) &
-        (models.RetentionReadiness.calculation_date == subquery.c.max_date)
-    ).join(models.Agniveer).filter(models.Agniveer.company == unit)\
-    .filter(models.RetentionReadiness.retention_band == models.RRIBand.RED).all()
-    
-    result = []
-    for r in risk_data:
-        result.append({
+        if not tech_data:
+            return {"firing": 0, "weapon": 0, "tactical": 0, "cognitive": 0}
+
+        # Calculate average scores
+        avg_firing = sum(t.firing_score or 0 for t in tech_data) / len(tech_data)
+        avg_weapon = sum(t.weapon_handling_score or 0 for t in tech_data) / len(tech_data)
+        avg_tactical = sum(t.tactical_score or 0 for t in tech_data) / len(tech_data)
+        avg_cognitive = sum(t.cognitive_score or 0 for t in tech_data) / len(tech_data)
+
+        return {
+            "firing": round(avg_firing, 2),
+            "weapon": round(avg_weapon, 2),
+            "tactical": round(avg_tactical, 2),
+            "cognitive": round(avg_cognitive, 2)
+        }
+
+    def retention_risk(self):
+        # Agniveers whose current band is 'RED' (Low Retention)
+        return [{
             "agniveer_id": r.agniveer_id,
-            "name": r.agniveer.name,
+            "name": name,
             "rri_score": r.rri_score,
             "technical": r.technical_component,
             "behavioral": r.behavioral_component
-        })
-        
-    return result
+        } for r, name in self.latest_rri if r.retention_band == models.RRIBand.RED]
+
+    def pending(self):
+        """
+        Count Agniveers missing assessments.
+        - 'pending_technical': No TechnicalAssessment record at all.
+        - 'pending_behavioral': No BehavioralAssessment for current quarter.
+        """
+        agniveer_ids = {a.id for a in self.roster}
+        # Anyone with a latest technical assessment has at least one
+        assessed_tech_ids = {t.agniveer_id for t in self.latest_technical}
+
+        return {
+            "pending_technical": len(agniveer_ids - assessed_tech_ids),
+            "pending_behavioral": len(agniveer_ids - self.current_quarter_behavioral_ids),
+            "current_quarter": self.current_quarter
+        }
+
+    def honor_board(self):
+        """
+        Returns lists for:
+        1. Top Performers (Green Band, Highest RRI).
+        2. Improvement Champions (Current RRI > Last RRI).
+        3. Recent Achievements.
+        """
+        # 1. Top Performers
+        top_performers = sorted(self.latest_rri, key=lambda row: row[0].rri_score, reverse=True)[:5]
+        top_list = [{
+            "name": name,
+            "score": r.rri_score,
+            "agniveer_id": r.agniveer_id
+        } for r, name in top_performers]
+
+        # 2. Recent Achievements
+        ach_list = [{
+            "name": name,
+            "title": a.title,
+            "type": a.type,
+            "date": a.date_earned.strftime("%d %b")
+        } for a, name in self.recent_achievements]
+
+        return {
+            "top_performers": top_list,
+            "recent_achievements": ach_list,
+            "champions": []
+        }
+
+    def command_hub(self):
+        """
+        Returns high-level 'Command at a Glance' metrics:
+        1. Company Readiness Score (0-100).
+        2. Status Badges (Manning, Training, Admin).
+        3. Benchmarks (vs Battalion Avg).
+        """
+        # 1. Calculate Readiness Score (Composite of RRI + Training Completion)
+        overview = self.overview()
+        avg_rri = overview["average_rri"] or 0
+        pending = self.pending()
+
+        # Mock Calculation:
+        # Base is Average RRI.
+        # Penalty for pending assessments (0.5 per pending).
+        total_pending = pending["pending_technical"] + pending["pending_behavioral"]
+        penalty = min(total_pending * 0.5, 20) # Max 20 point penalty
+        readiness_score = round(max(avg_rri - penalty, 0), 1)
+
+        # 2. Benchmarks (Mocked for now)
+        battalion_avg = 76.5
+        prev_month_score = 71.2 # Mock
+
+        # 3. Status Badges
+        manning_status = "Good" if overview["total_agniveers"] > 10 else "Low" # Arbitrary threshold
+        training_status = "Needs Attention" if total_pending > 5 else "On Track"
+
+        return {
+            "readiness_score": readiness_score,
+            "battalion_avg": battalion_avg,
+            "score_delta": round(readiness_score - prev_month_score, 1),
+            "status": {
+                "manning": manning_status,
+                "training": training_status,
+                "critical_actions": total_pending
+            },
+            "overview": overview, # Re-return overview data for convenience
+            "pending": pending
+        }
+
+    def action_center(self):
+        """
+        Returns a prioritized list of actionable items for the 'Action Center'.
+        """
+        items = []
+
+        # Check Pending Assessments
+        pending = self.pending()
+        if pending["pending_technical"] > 0:
+            items.append({
+                "id": "pending_tech",
+                "type": "URGENT",
+                "message": f"{pending['pending_technical']} Technical Assessments overdue",
+                "action": "Schedule Now",
+                "target": "process_assessments"
+            })
+
+        if pending["pending_behavioral"] > 0:
+            items.append({
+                "id": "pending_behav",
+                "type": "WARNING",
+                "message": f"{pending['pending_behavioral']} Behavioral Reports pending (Q1)",
+                "action": "Complete Reports",
+                "target": "process_assessments"
+            })
+
+        # Check Risks (Red Band)
+        risk_data = self.retention_risk()
+        if risk_data:
+            # Create an individual item for the most critical risk, or a group item
+            # For AI demo, let's pick the highest risk individual
+            top_risk = risk_data[0]
+            items.append({
+                "id": f"risk_alert_{top_risk['agniveer_id']}",
+                "type": "CRITICAL",
+                "message": f"High Retention Risk: {top_risk['name']} (RRI: {top_risk['rri_score']})",
+                "action": "🧠 AI Analysis", # Changed action label
+                "target": "ai_report",     # Changed target type
+                "data": { "agniveer_id": top_risk['agniveer_id'] } # Added data payload
+            })
+
+            if len(risk_data) > 1:
+                items.append({
+                    "id": "risk_group",
+                    "type": "CRITICAL",
+                    "message": f"{len(risk_data)-1} other Agniveers in Red Band",
+                    "action": "View Watchlist",
+                    "target": "view_risks"
+                })
+
+        # Check Achievements (Mock logic: "No awards in last 30 days")
+        # In a real app, we'd query dates.
+        if not self.recent_achievements:
+            items.append({
+                "id": "morale_alert",
+                "type": "INFO",
+                "message": "No achievements recorded recently. Boost morale!",
+                "action": "Award Badge",
+                "target": "award_achievement"
+            })
+
+        return items
+
+    def dashboard(self):
+        # Every Company dashboard panel from the same loaded datasets
+        return {
+            "unit": self.unit,
+            "overview": self.overview(),
+            "technical_gaps": self.technical_gaps(),
+            "retention_risk": self.retention_risk(),
+            "pending": self.pending(),
+            "honor_board": self.honor_board(),
+            "command_hub": self.command_hub(),
+            "action_center": self.action_center()
+        }
 
 
+def get_company_overview(db: Session, unit: str):
+    return CompanyAnalytics(db, unit).overview()
+
+def get_technical_gaps(db: Session, unit: str):
+    return CompanyAnalytics(db, unit).technical_gaps()
+
+def get_retention_risk(db: Session, unit: str):
+    return CompanyAnalytics(db, unit).retention_risk()
+
 def get_pending_assessments(db: Session, unit: str):
+    return CompanyAnalytics(db, unit).pending()
+
+
+TREND_GRANULARITIES = ("month", "quarter")
+
+def _quarter_label(year: int, month: int) -> str:
+    return f"Q{(month - 1) // 3 + 1} {year}"
+
+def _trend_buckets(months: int, granularity: str):
     """
-    Count Agniveers missing assessments.
-    - 'pending_technical': No TechnicalAssessment record at all.
-    - 'pending_behavioral': No BehavioralAssessment for current quarter.
+    Bucket labels (chronological) covering the last N calendar months up to and
+    including the current one, plus the [start, end) date range they span.
     """
-    from datetime import datetime
-    current_quarter = f"Q{(datetime.now().month - 1) // 3 + 1} {datetime.now().year}"
-    
-    # Get all Agniveers in unit
-    agniveers = db.query(models.Agniveer).filter(models.Agniveer.company == unit).all()
-    agniveer_ids = [a.id for a in agniveers]
-    
-    # Find those WITH technical assessments
-    assessed_tech_ids = db.query(models.TechnicalAssessment.agniveer_id).filter(
-        models.TechnicalAssessment.agniveer_id.in_(agniveer_ids)
-    ).distinct().all()
-    assessed_tech_ids = {r[0] for r in assessed_tech_ids}
-    
-    # Find those WITH behavioral for current quarter
-    assessed_behav_ids = db.query(models.BehavioralAssessment.agniveer_id).filter(
-        models.BehavioralAssessment.agniveer_id.in_(agniveer_ids),
-        models.BehavioralAssessment.quarter == current_quarter
-    ).distinct().all()
-    assessed_behav_ids = {r[0] for r in assessed_behav_ids}
-    
-    pending_tech = len(set(agniveer_ids) - assessed_tech_ids)
-    pending_behav = len(set(agniveer_ids) - assessed_behav_ids)
-    
-    return {
-        "pending_technical": pending_tech,
-        "pending_behavioral": pending_behav,
-        "current_quarter": current_quarter
+    today = datetime.now()
+    year, month = today.year, today.month
+    month_keys = []
+    for _ in range(months):
+        month_keys.append((year, month))
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+    month_keys.reverse()
+
+    if granularity == "quarter":
+        # Widen the window to whole quarters
+        first_year, first_month = month_keys[0]
+        start = datetime(first_year, first_month - (first_month - 1) % 3, 1)
+        labels = []
+        for y, m in month_keys:
+            label = _quarter_label(y, m)
+            if label not in labels:
+                labels.append(label)
+    else:
+        start = datetime(month_keys[0][0], month_keys[0][1], 1)
+        labels = [f"{y}-{str(m).zfill(2)}" for y, m in month_keys]
+
+    end = datetime(today.year + 1, 1, 1) if today.month == 12 else datetime(today.year, today.month + 1, 1)
+    return labels, start, end
+
+def _time_series(db: Session, unit: str, date_col, value_cols, months: int, granularity: str):
+    """
+    Per-bucket averages of value_cols for one company in a single GROUP BY query.
+    Rows are selected with a plain date-range predicate (index friendly) and grouped
+    by calendar month; months are then folded into the requested granularity using
+    SUM/COUNT so averages stay exact across months.
+    Returns (labels, {label: [avg or None per value column]}).
+    """
+    labels, start, end = _trend_buckets(months, granularity)
+
+    year_key = extract('year', date_col)
+    month_key = extract('month', date_col)
+    aggregates = []
+    for col in value_cols:
+        aggregates += [func.sum(col), func.count(col)]
+
+    rows = db.query(year_key, month_key, *aggregates)\
+        .join(models.Agniveer, models.Agniveer.id == date_col.class_.agniveer_id)\
+        .filter(models.Agniveer.company == unit)\
+        .filter(date_col >= start, date_col < end)\
+        .group_by(year_key, month_key).all()
+
+    totals = {label: [[0, 0] for _ in value_cols] for label in labels}
+    for row in rows:
+        year, month = int(row[0]), int(row[1])
+        label = _quarter_label(year, month) if granularity == "quarter" else f"{year}-{str(month).zfill(2)}"
+        if label not in totals:
+            continue
+        for i in range(len(value_cols)):
+            totals[label][i][0] += row[2 + 2 * i] or 0
+            totals[label][i][1] += row[3 + 2 * i] or 0
+
+    averages = {
+        label: [total / count if count else None for total, count in buckets]
+        for label, buckets in totals.items()
     }
+    return labels, averages
 
 
-def get_rri_trend(db: Session, unit: str, months: int = 6):
+def get_rri_trend(db: Session, unit: str, months: int = 6, granularity: str = "month"):
     """
-    Returns monthly average RRI for the unit over the last N months.
+    Returns average RRI for the unit per month (or quarter) over the last N months.
     """
-    from datetime import datetime, timedelta
-    from sqlalchemy import extract
-    
-    # Get Agniveer IDs for unit
-    agniveer_ids = [a.id for a in db.query(models.Agniveer.id).filter(models.Agniveer.company == unit).all()]
-    
-    results = []
-    today = datetime.now()
-    
-    for i in range(months - 1, -1, -1):
-        # Calculate month boundaries
-        target_date = today - timedelta(days=30 * i)
-        year = target_date.year
-        month = target_date.month
-        
-        # Query RRI scores for that month
-        month_data = db.query(func.avg(models.RetentionReadiness.rri_score)).filter(
-            models.RetentionReadiness.agniveer_id.in_(agniveer_ids),
-            extract('year', models.RetentionReadiness.calculation_date) == year,
-            extract('month', models.RetentionReadiness.calculation_date) == month
-        ).scalar()
-        
-        results.append({
-            "month": f"{year}-{str(month).zfill(2)}",
-            "avg_rri": round(month_data, 2) if month_data else 0
-        })
-    
-    return results
+    labels, averages = _time_series(
+        db, unit, models.RetentionReadiness.calculation_date,
+        [models.RetentionReadiness.rri_score], months, granularity
+    )
+
+    key = "quarter" if granularity == "quarter" else "month"
+    return [{
+        key: label,
+        "avg_rri": round(averages[label][0], 2) if averages[label][0] else 0
+    } for label in labels]
 
 
-def get_technical_trend(db: Session, unit: str, months: int = 6):
+def get_technical_trend(db: Session, unit: str, months: int = 6, granularity: str = "month"):
     """
-    Returns monthly averages for each technical competency.
+    Returns monthly (or quarterly) averages for each technical competency.
     """
-    from datetime import datetime, timedelta
-    from sqlalchemy import extract
-    
-    agniveer_ids = [a.id for a in db.query(models.Agniveer.id).filter(models.Agniveer.company == unit).all()]
-    
+    labels, averages = _time_series(
+        db, unit, models.TechnicalAssessment.assessment_date,
+        [
+            models.TechnicalAssessment.firing_score,
+            models.TechnicalAssessment.weapon_handling_score,
+            models.TechnicalAssessment.tactical_score,
+            models.TechnicalAssessment.cognitive_score
+        ], months, granularity
+    )
+
+    key = "quarter" if granularity == "quarter" else "month"
     results = []
-    today = datetime.now()
-    
-    for i in range(months - 1, -1, -1):
-        target_date = today - timedelta(days=30 * i)
-        year = target_date.year
-        month = target_date.month
-        
-        data = db.query(
-            func.avg(models.TechnicalAssessment.firing_score),
-            func.avg(models.TechnicalAssessment.weapon_handling_score),
-            func.avg(models.TechnicalAssessment.tactical_score),
-            func.avg(models.TechnicalAssessment.cognitive_score)
-        ).filter(
-            models.TechnicalAssessment.agniveer_id.in_(agniveer_ids),
-            extract('year', models.TechnicalAssessment.assessment_date) == year,
-            extract('month', models.TechnicalAssessment.assessment_date) == month
-        ).first()
-        
+    for label in labels:
+        data = averages[label]
         results.append({
-            "month": f"{year}-{str(month).zfill(2)}",
+            key: label,
             "firing": round(data[0], 2) if data[0] else 0,
             "weapon": round(data[1], 2) if data[1] else 0,
             "tactical": round(data[2], 2) if data[2] else 0,
             "cognitive": round(data[3], 2) if data[3] else 0
         })
-    
+
     return results
 
 
-def get_behavioral_trend(db: Session, unit: str):
+def get_behavioral_trend(db: Session, unit: str, quarters: int = 4):
     """
-    Returns quarterly averages for behavioral competencies (last 4 quarters).
+    Returns quarterly averages for behavioral competencies (last N quarters).
+    Behavioral assessments are keyed by their 'Qn YYYY' label, so all quarters
+    are aggregated in one query grouped on that column.
     """
-    from datetime import datetime
-    
-    agniveer_ids = [a.id for a in db.query(models.Agniveer.id).filter(models.Agniveer.company == unit).all()]
-    
-    # Generate last 4 quarters
+    # Generate last N quarters
     today = datetime.now()
     current_q = (today.month - 1) // 3 + 1
     current_y = today.year
-    
-    quarters = []
-    for i in range(4):
+
+    quarter_labels = []
+    for i in range(quarters):
         q = current_q - i
         y = current_y
-        if q <= 0:
+        while q <= 0:
             q += 4
             y -= 1
-        quarters.append(f"Q{q} {y}")
-    
-    quarters = quarters[::-1]  # Chronological order
-    
+        quarter_labels.append(f"Q{q} {y}")
+
+    quarter_labels = quarter_labels[::-1]  # Chronological order
+
+    rows = db.query(
+        models.BehavioralAssessment.quarter,
+        func.avg(models.BehavioralAssessment.initiative),
+        func.avg(models.BehavioralAssessment.dedication),
+        func.avg(models.BehavioralAssessment.team_spirit),
+        func.avg(models.BehavioralAssessment.courage),
+        func.avg(models.BehavioralAssessment.motivation),
+        func.avg(models.BehavioralAssessment.adaptability),
+        func.avg(models.BehavioralAssessment.communication)
+    ).join(models.Agniveer).filter(
+        models.Agniveer.company == unit,
+        models.BehavioralAssessment.quarter.in_(quarter_labels)
+    ).group_by(models.BehavioralAssessment.quarter).all()
+    by_quarter = {row[0]: row[1:] for row in rows}
+
     results = []
-    for quarter in quarters:
-        data = db.query(
-            func.avg(models.BehavioralAssessment.initiative),
-            func.avg(models.BehavioralAssessment.dedication),
-            func.avg(models.BehavioralAssessment.team_spirit),
-            func.avg(models.BehavioralAssessment.courage),
-            func.avg(models.BehavioralAssessment.motivation),
-            func.avg(models.BehavioralAssessment.adaptability),
-            func.avg(models.BehavioralAssessment.communication)
-        ).filter(
-            models.BehavioralAssessment.agniveer_id.in_(agniveer_ids),
-            models.BehavioralAssessment.quarter == quarter
-        ).first()
-        
+    for quarter in quarter_labels:
+        data = by_quarter.get(quarter, (None,) * 7)
+
         # Calculate overall average
         scores = [s for s in data if s is not None]
         avg_score = sum(scores) / len(scores) if scores else 0
-        
+
         results.append({
             "quarter": quarter,
             "initiative": round(data[0], 1) if data[0] else 0,
@@ -273,7 +477,7 @@ def get_behavioral_trend(db: Session, unit: str):
             "communication": round(data[6], 1) if data[6] else 0,
             "average": round(avg_score, 1)
         })
-    
+
     return results
 
 
@@ -315,155 +519,13 @@ def get_competency_insights(db: Session, unit: str):
 
 
 def get_honor_board(db: Session, unit: str):
-    """
-    Returns lists for:
-    1. Top Performers (Green Band, Highest RRI).
-    2. Improvement Champions (Current RRI > Last RRI).
-    3. Recent Achievements.
-    """
-    from sqlalchemy import desc
-    
-    # 1. Top Performers
-    # Re-use company overview logic to find latest RRI
-    rri_sub = db.query(
-        models.RetentionReadiness.agniveer_id,
-        func.max(models.RetentionReadiness.calculation_date).label('max_date')
-    ).group_by(models.RetentionReadiness.agniveer_id).subquery()
-    
-    top_performers = db.query(models.RetentionReadiness).join(
-        rri_sub,
-        (models.RetentionReadiness.agniveer_id == rri_sub.c.agniveer_id) &
-        (models.RetentionReadiness.calculation_date == rri_sub.c.max_date)
-    ).join(models.Agniveer).filter(models.Agniveer.company == unit)\
-    .order_by(desc(models.RetentionReadiness.rri_score)).limit(5).all()
-    
-    top_list = [{
-        "name": r.agniveer.name,
-        "score": r.rri_score,
-        "agniveer_id": r.agniveer_id
-    } for r in top_performers]
-    
-    # 2. Recent Achievements
-    achievements = db.query(models.Achievement).join(models.Agniveer)\
-        .filter(models.Agniveer.company == unit)\
-        .order_by(desc(models.Achievement.date_earned)).limit(5).all()
-        
-    ach_list = [{
-        "name": a.agniveer.name,
-        "title": a.title,
-        "type": a.type,
-        "date": a.date_earned.strftime("%d %b")
-    } for a in achievements]
-    
-    return {
-        "top_performers": top_list,
-        "recent_achievements": ach_list,
-        "champions": [] 
-    }
-
+    return CompanyAnalytics(db, unit).honor_board()
 
 def get_command_hub_data(db: Session, unit: str):
-    """
-    Returns high-level 'Command at a Glance' metrics:
-    1. Company Readiness Score (0-100).
-    2. Status Badges (Manning, Training, Admin).
-    3. Benchmarks (vs Battalion Avg).
-    """
-    # 1. Calculate Readiness Score (Composite of RRI + Training Completion)
-    overview = get_company_overview(db, unit)
-    avg_rri = overview["average_rri"] or 0
-    pending = get_pending_assessments(db, unit)
-    
-    # Mock Calculation: 
-    # Base is Average RRI. 
-    # Penalty for pending assessments (0.5 per pending).
-    total_pending = pending["pending_technical"] + pending["pending_behavioral"]
-    penalty = min(total_pending * 0.5, 20) # Max 20 point penalty
-    readiness_score = round(max(avg_rri - penalty, 0), 1)
-    
-    # 2. Benchmarks (Mocked for now)
-    battalion_avg = 76.5
-    prev_month_score = 71.2 # Mock
-    
-    # 3. Status Badges
-    manning_status = "Good" if overview["total_agniveers"] > 10 else "Low" # Arbitrary threshold
-    training_status = "Needs Attention" if total_pending > 5 else "On Track"
-    
-    return {
-        "readiness_score": readiness_score,
-        "battalion_avg": battalion_avg,
-        "score_delta": round(readiness_score - prev_month_score, 1),
-        "status": {
-            "manning": manning_status,
-            "training": training_status,
-            "critical_actions": total_pending
-        },
-        "overview": overview, # Re-return overview data for convenience
-        "pending": pending
-    }
-
+    return CompanyAnalytics(db, unit).command_hub()
 
 def get_action_center_items(db: Session, unit: str):
-    """
-    Returns a prioritized list of actionable items for the 'Action Center'.
-    """
-    items = []
-    
-    # Check Pending Assessments
-    pending = get_pending_assessments(db, unit)
-    if pending["pending_technical"] > 0:
-        items.append({
-            "id": "pending_tech",
-            "type": "URGENT",
-            "message": f"{pending['pending_technical']} Technical Assessments overdue",
-            "action": "Schedule Now",
-            "target": "process_assessments"
-        })
-        
-    if pending["pending_behavioral"] > 0:
-        items.append({
-            "id": "pending_behav",
-            "type": "WARNING",
-            "message": f"{pending['pending_behavioral']} Behavioral Reports pending (Q1)",
-            "action": "Complete Reports",
-            "target": "process_assessments"
-        })
-        
-    # Check Risks (Red Band)
-    risk_data = get_retention_risk(db, unit)
-    if risk_data:
-        # Create an individual item for the most critical risk, or a group item
-        # For AI demo, let's pick the highest risk individual
-        top_risk = risk_data[0]
-        items.append({
-            "id": f"risk_alert_{top_risk['agniveer_id']}",
-            "type": "CRITICAL",
-            "message": f"High Retention Risk: {top_risk['name']} (RRI: {top_risk['rri_score']})",
-            "action": "🧠 AI Analysis", # Changed action label
-            "target": "ai_report",     # Changed target type
-            "data": { "agniveer_id": top_risk['agniveer_id'] } # Added data payload
-        })
-        
-        if len(risk_data) > 1:
-             items.append({
-                "id": "risk_group",
-                "type": "CRITICAL",
-                "message": f"{len(risk_data)-1} other Agniveers in Red Band",
-                "action": "View Watchlist",
-                "target": "view_risks"
-            })
-        
-    # Check Achievements (Mock logic: "No awards in last 30 days")
-    # In a real app, we'd query dates.
-    honor_board = get_honor_board(db, unit)
-    if not honor_board["recent_achievements"]:
-         items.append({
-            "id": "morale_alert",
-            "type": "INFO",
-            "message": "No achievements recorded recently. Boost morale!",
-            "action": "Award Badge",
-            "target": "award_achievement"
-        })
-        
-    return items
+    return CompanyAnalytics(db, unit).action_center()
 
+def get_company_dashboard(db: Session, unit: str):
+    return CompanyAnalytics(db, unit).dashboard()
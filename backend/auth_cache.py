@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from pydantic import BaseModel
+
+from . import models
+
+# Authenticated principal cache
+# get_current_user runs on every authenticated request (the mail client polls
+# unread-count/stats constantly). Caching the decoded token -> user snapshot
+# avoids a users_auth lookup per request. Entries expire after a short TTL
+# (never later than the token itself) and are dropped by the admin endpoints
+# that change credentials, roles or delete users.
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "1024"))
+
+class AuthenticatedUser(BaseModel):
+    """Detached snapshot of the users_auth row needed by request handlers."""
+    user_id: int
+    username: str
+    role: models.UserRole
+    agniveer_id: Optional[int] = None
+    full_name: Optional[str] = None
+    rank: Optional[str] = None
+    assigned_company: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+        frozen = True
+
+class PrincipalCache:
+    """Bounded LRU of token -> (expires_at, AuthenticatedUser) with a per-entry TTL."""
+
+    def __init__(self, ttl_seconds: int = AUTH_CACHE_TTL_SECONDS, max_entries: int = AUTH_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> Optional[AuthenticatedUser]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, token: str, user: AuthenticatedUser, token_exp: Optional[float] = None):
+        # Never keep an entry past the token's own 'exp' (unix timestamp)
+        ttl = self.ttl_seconds
+        if token_exp is not None:
+            ttl = min(ttl, token_exp - time.time())
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (time.monotonic() + ttl, user)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_user(self, username: str = None, user_id: int = None):
+        """Drops every cached token belonging to the user (password reset, role change, deletion)."""
+        with self._lock:
+            stale = [
+                token for token, (_, user) in self._entries.items()
+                if (username is not None and user.username == username) or
+                   (user_id is not None and user.user_id == user_id)
+            ]
+            for token in stale:
+                del self._entries[token]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+principal_cache = PrincipalCache()
@@ -0,0 +1,19 @@
+from backend.database import SessionLocal, engine
+from backend import models, rri_engine
+
+# Ensure tables exist (creates current_rri on databases that predate it)
+models.Base.metadata.create_all(bind=engine)
+
+def backfill_current_rri():
+    db = SessionLocal()
+    try:
+        print("Rebuilding current_rri snapshot from retention_readiness history...")
+        count = rri_engine.backfill_current_rri(db)
+        print(f"current_rri rebuilt: {count} Agniveers.")
+    except Exception as e:
+        print(f"Error rebuilding current_rri: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    backfill_current_rri()
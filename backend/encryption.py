@@ -1,5 +1,5 @@
 import os
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -28,9 +28,29 @@ def get_encryption_key():
         f.write(key)
     return key
 
-# Initialize cipher
-_key = get_encryption_key()
-_cipher = Fernet(_key)
+def get_old_encryption_keys():
+    """Retired keys (MAIL_ENCRYPTION_OLD_KEYS, comma-separated, newest first), accepted for decryption only"""
+    return [k.strip().encode() for k in os.getenv("MAIL_ENCRYPTION_OLD_KEYS", "").split(",") if k.strip()]
+
+# Key rotation
+# Bodies are encrypted with the primary key and decrypted with whichever
+# configured key matches (MultiFernet). To rotate: generate a key, make it
+# MAIL_ENCRYPTION_KEY, move the previous key to MAIL_ENCRYPTION_OLD_KEYS,
+# restart, then run the mail_reencrypt job (python -m backend.reencrypt_mail).
+# Once it reports nothing left on old keys, the old keys can be removed.
+# Without MAIL_SEARCH_KEY that changes the search key (see get_search_key);
+# the next startup notices and rebuilds the search index in the background.
+def set_keys(keys: list):
+    """Installs [primary, *old] keys; used at import and by tests."""
+    global _key, _keys, _primary, _cipher, _search_key
+    _keys = list(keys)
+    _key = _keys[0]
+    _primary = Fernet(_key)
+    _cipher = MultiFernet([_primary] + [Fernet(k) for k in _keys[1:]])
+    _search_key = None
+
+_search_key = None
+set_keys([get_encryption_key()] + get_old_encryption_keys())
 
 def encrypt_message(plaintext: str) -> str:
     """Encrypt a message and return base64-encoded ciphertext"""
@@ -47,3 +67,49 @@ def decrypt_message(ciphertext: str) -> str:
     except Exception:
         # If decryption fails (e.g., legacy unencrypted message), return as-is
         return ciphertext
+
+def is_current(ciphertext: str) -> bool:
+    """True when the ciphertext is signed by the primary key (checks the HMAC only, no decryption)"""
+    try:
+        _primary.extract_timestamp(ciphertext.encode())
+        return True
+    except InvalidToken:
+        return False
+
+def rotate_message(ciphertext: str) -> str:
+    """Re-encrypts with the primary key, keeping the original timestamp; InvalidToken if no key matches"""
+    return _cipher.rotate(ciphertext.encode()).decode()
+
+def decrypt_messages(ciphertexts: list) -> list:
+    """decrypt_message over a batch, in order; identical ciphertexts are decrypted once"""
+    plaintexts = {}
+    for ciphertext in ciphertexts:
+        if ciphertext not in plaintexts:
+            plaintexts[ciphertext] = decrypt_message(ciphertext)
+    return [plaintexts[ciphertext] for ciphertext in ciphertexts]
+
+# Key for the mail search index, which stores keyed hashes of body words
+# (never the words). Set MAIL_SEARCH_KEY to keep it independent of the mail
+# keys; otherwise it is derived from the oldest configured mail key (the last
+# MAIL_ENCRYPTION_OLD_KEYS entry, else MAIL_ENCRYPTION_KEY), so rotating the
+# primary key leaves the index valid. Changing it, including by removing the
+# last old key without MAIL_SEARCH_KEY, requires a full search index rebuild:
+# the index records search_key_fingerprint() and startup submits the rebuild
+# when it no longer matches (or run python -m backend.rebuild_mail_search --full).
+def get_search_key() -> bytes:
+    global _search_key
+    if _search_key is None:
+        env_key = os.getenv("MAIL_SEARCH_KEY")
+        if env_key:
+            _search_key = env_key.encode()
+        else:
+            import hashlib
+            import hmac
+            _search_key = hmac.new(_keys[-1], b"kaushal-setu mail search index", hashlib.sha256).digest()
+    return _search_key
+
+def search_key_fingerprint() -> str:
+    """Identifies the search key without revealing it"""
+    import hashlib
+    import hmac
+    return hmac.new(get_search_key(), b"kaushal-setu mail search key fingerprint", hashlib.sha256).hexdigest()[:16]
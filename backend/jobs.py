@@ -0,0 +1,270 @@
+import json
+import os
+import socket
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, FrozenSet, Optional
+from sqlalchemy.orm import Session
+
+from . import models, database
+
+# Background job runner
+# Long admin operations (bulk upload, RRI recompute) run on a small in-process
+# worker pool instead of inside the HTTP request. State lives in the jobs table,
+# so clients can poll progress and fetch results from any request, and jobs that
+# were in flight when their server process stopped are marked INTERRUPTED.
+# Several uvicorn workers share the jobs table, so every job records the
+# process that owns it and that process refreshes heartbeat_at while the job is
+# queued or running. A job is only reclaimed once its heartbeat is stale, never
+# because another worker started.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "15"))
+# A job whose owner has not refreshed it for this long is considered dead
+JOB_HEARTBEAT_TIMEOUT_SECONDS = float(os.getenv("JOB_HEARTBEAT_TIMEOUT_SECONDS", str(4 * JOB_HEARTBEAT_SECONDS)))
+
+# Identifies this process as the owner of the jobs it runs
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# job_type -> handler(db, payload, progress) returning a JSON-serialisable result
+JOB_HANDLERS: Dict[str, Callable] = {}
+# job_type -> roles allowed to submit it through POST /api/jobs (None: any user)
+JOB_ROLES: Dict[str, Optional[FrozenSet[models.UserRole]]] = {}
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job-worker")
+
+def register_job(job_type: str, roles=None):
+    """Decorator registering a handler for a job type, optionally limited to some user roles."""
+    def decorator(func):
+        JOB_HANDLERS[job_type] = func
+        JOB_ROLES[job_type] = frozenset(roles) if roles is not None else None
+        return func
+    return decorator
+
+def can_submit(job_type: str, role: models.UserRole) -> bool:
+    """Whether a user with this role may submit the job type."""
+    roles = JOB_ROLES.get(job_type)
+    return roles is None or role in roles
+
+def _update_job(job_id: int, expected: models.JobStatus = models.JobStatus.RUNNING, **values) -> bool:
+    # Job state is written in its own short transaction so it is visible to
+    # pollers immediately, independent of the handler's transaction. Only the
+    # owning process writes, and only while the job is still in the `expected`
+    # state (so a job that was reclaimed as INTERRUPTED is never overwritten).
+    db = database.SessionLocal()
+    try:
+        updated = db.query(models.Job).filter(
+            models.Job.id == job_id,
+            models.Job.owner == WORKER_ID,
+            models.Job.status == expected
+        ).update({**values, "heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+        return updated > 0
+    finally:
+        db.close()
+
+def _progress_reporter(job_id: int):
+    def report(percent: float, message: str = None):
+        values = {"progress": max(0, min(100, int(percent)))}
+        if message is not None:
+            values["message"] = message
+        _update_job(job_id, **values)
+    return report
+
+def _run_job(job_id: int):
+    db = database.SessionLocal()
+    try:
+        job = db.query(models.Job).filter(models.Job.id == job_id).first()
+        if job is None:
+            return
+        handler = JOB_HANDLERS[job.job_type]
+        payload = json.loads(job.payload) if job.payload else {}
+        if not _update_job(job_id, models.JobStatus.QUEUED, status=models.JobStatus.RUNNING, started_at=datetime.utcnow()):
+            return
+
+        try:
+            result = handler(db, payload, _progress_reporter(job_id))
+        except Exception as e:
+            db.rollback()
+            traceback.print_exc()
+            _update_job(
+                job_id, status=models.JobStatus.FAILED, error=str(e),
+                finished_at=datetime.utcnow()
+            )
+            return
+
+        _update_job(
+            job_id, status=models.JobStatus.COMPLETED, progress=100,
+            result=json.dumps(result, default=str), finished_at=datetime.utcnow()
+        )
+    finally:
+        db.close()
+
+def submit_job(db: Session, job_type: str, payload: dict, created_by: int = None) -> models.Job:
+    """Persists a QUEUED job and hands it to the worker pool."""
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job type: {job_type}")
+
+    job = models.Job(
+        job_type=job_type,
+        status=models.JobStatus.QUEUED,
+        progress=0,
+        payload=json.dumps(payload),
+        created_by=created_by,
+        owner=WORKER_ID,
+        heartbeat_at=datetime.utcnow()
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    start_heartbeat()
+    _executor.submit(_run_job, job.id)
+    return job
+
+def get_job_result(job: models.Job):
+    return json.loads(job.result) if job.result else None
+
+def mark_interrupted_jobs(db: Session = None, now: datetime = None) -> int:
+    """
+    Jobs still QUEUED/RUNNING whose owner stopped refreshing them (or that
+    predate job ownership) belonged to a process that died and will never
+    finish; flag them for the client to resubmit. Jobs of live workers,
+    including other processes sharing this database, are left alone.
+    """
+    now = now or datetime.utcnow()
+    stale_before = now - timedelta(seconds=JOB_HEARTBEAT_TIMEOUT_SECONDS)
+    own_session = db is None
+    db = db or database.SessionLocal()
+    try:
+        count = db.query(models.Job).filter(
+            models.Job.status.in_([models.JobStatus.QUEUED, models.JobStatus.RUNNING]),
+            (models.Job.owner == None) | (models.Job.owner != WORKER_ID),
+            (models.Job.heartbeat_at == None) | (models.Job.heartbeat_at < stale_before)
+        ).update({
+            "status": models.JobStatus.INTERRUPTED,
+            "error": "Server restarted before the job finished",
+            "finished_at": now
+        }, synchronize_session=False)
+        db.commit()
+        return count
+    finally:
+        if own_session:
+            db.close()
+
+def _heartbeat_once():
+    """Refreshes this process's active jobs, then reclaims other processes' dead ones."""
+    db = database.SessionLocal()
+    try:
+        db.query(models.Job).filter(
+            models.Job.owner == WORKER_ID,
+            models.Job.status.in_([models.JobStatus.QUEUED, models.JobStatus.RUNNING])
+        ).update({"heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+        mark_interrupted_jobs(db)
+    finally:
+        db.close()
+
+_heartbeat_stop = threading.Event()
+_heartbeat_thread = None
+_heartbeat_lock = threading.Lock()
+
+def _heartbeat_loop():
+    while not _heartbeat_stop.wait(JOB_HEARTBEAT_SECONDS):
+        try:
+            _heartbeat_once()
+        except Exception:
+            traceback.print_exc()
+
+def start_heartbeat():
+    """Starts this process's heartbeat thread (idempotent)."""
+    global _heartbeat_thread
+    with _heartbeat_lock:
+        if _heartbeat_thread is None or not _heartbeat_thread.is_alive():
+            _heartbeat_stop.clear()
+            _heartbeat_thread = threading.Thread(target=_heartbeat_loop, name="job-heartbeat", daemon=True)
+            _heartbeat_thread.start()
+
+def stop_heartbeat():
+    _heartbeat_stop.set()
+
+
+# --- Job handlers ---
+
+@register_job("bulk_upload_agniveers")
+def _bulk_upload_agniveers_job(db: Session, payload: dict, progress):
+    from . import admin_service
+    result = admin_service.process_bulk_upload_agniveers(
+        db, payload["csv"], payload.get("admin_id", 1), progress_callback=progress
+    )
+    return result.model_dump()
+
+@register_job("rri_recalculate", roles=[models.UserRole.ADMIN])
+def _rri_recalculate_job(db: Session, payload: dict, progress):
+    """payload: {"company": ...} or {"batch_no": ...}; empty payload recalculates everyone."""
+    from . import rri_engine
+    query = db.query(models.Agniveer.id)
+    if payload.get("company"):
+        query = query.filter(models.Agniveer.company == payload["company"])
+    if payload.get("batch_no"):
+        query = query.filter(models.Agniveer.batch_no == payload["batch_no"])
+    agniveer_ids = [r[0] for r in query.all()]
+    result = rri_engine.calculate_rri_bulk(db, agniveer_ids, progress_callback=progress)
+
+    # Bands may have changed: pre-generate briefings for the new watchlists
+    from . import ai_warmup
+    ai_warmup.after_rri_recalculation(db, [payload["company"]] if payload.get("company") else None)
+    return result
+
+@register_job("ai_briefing_warmup", roles=[models.UserRole.ADMIN])
+def _ai_briefing_warmup_job(db: Session, payload: dict, progress):
+    """
+    payload (all optional): {"bands": ["RED", "AMBER"], "max_per_company": 10,
+    "companies": [...], "concurrency": 1, "respect_window": false}
+    With respect_window, no new generation starts after AI_WARMUP_WINDOW closes.
+    """
+    from . import ai_warmup
+    deadline = None
+    window = ai_warmup.parse_window(ai_warmup.AI_WARMUP_WINDOW)
+    if payload.get("respect_window") and window is not None:
+        now = datetime.now()
+        deadline = ai_warmup.window_end(now, window) if ai_warmup.in_window(now, window) else now
+    return ai_warmup.warm_briefings(
+        db,
+        bands=payload.get("bands"),
+        max_per_company=payload.get("max_per_company"),
+        companies=payload.get("companies"),
+        concurrency=payload.get("concurrency"),
+        deadline=deadline,
+        progress_callback=progress
+    )
+
+@register_job("mailbox_reconcile", roles=[models.UserRole.ADMIN])
+def _mailbox_reconcile_job(db: Session, payload: dict, progress):
+    """payload: {"user_ids": [...]} to limit the check; empty payload checks every counter row."""
+    from .mail_service import MailService
+    return MailService.reconcile_counters(db, payload.get("user_ids"))
+
+@register_job("mail_search_rebuild", roles=[models.UserRole.ADMIN])
+def _mail_search_rebuild_job(db: Session, payload: dict, progress):
+    """payload: {"full": true} re-indexes every email; by default only emails missing from the index."""
+    from . import mail_search
+    return mail_search.rebuild_index(db, full=bool(payload.get("full")), progress_callback=progress)
+
+@register_job("mail_reencrypt", roles=[models.UserRole.ADMIN])
+def _mail_reencrypt_job(db: Session, payload: dict, progress):
+    """
+    payload (all optional): {"after_id": 0, "batch_size": 500, "max_rows_per_second": 2000}
+    Moves mail bodies onto the primary key after a rotation; resubmit with the
+    reported last_id (or from scratch, already-current rows are skipped) to resume.
+    """
+    from . import key_rotation
+    return key_rotation.reencrypt_bodies(
+        db,
+        batch_size=payload.get("batch_size"),
+        after_id=payload.get("after_id", 0),
+        max_rows_per_second=payload.get("max_rows_per_second"),
+        progress_callback=progress
+    )
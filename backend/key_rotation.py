@@ -0,0 +1,107 @@
+import os
+import time
+from typing import Callable, Optional
+
+from cryptography.fernet import InvalidToken
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from . import models
+from .encryption import is_current, rotate_message
+
+# Mail body re-encryption
+# After a key rotation (see encryption.py) existing bodies still decrypt with
+# the old key; this walks internal_emails in primary-key order and rewrites
+# every body that is not yet on the primary key, one committed chunk at a time.
+# It never holds a transaction across chunks, so live mail keeps flowing, and
+# it can be stopped and resumed at any point: bodies already on the primary key
+# are recognised from their signature alone (no decryption) and skipped, and
+# after_id resumes from the last_id a previous run reported.
+#   MAIL_REENCRYPT_BATCH_SIZE     rows per chunk/commit
+#   MAIL_REENCRYPT_MAX_ROWS_PER_SECOND  throttle, 0 = unthrottled
+MAIL_REENCRYPT_BATCH_SIZE = int(os.getenv("MAIL_REENCRYPT_BATCH_SIZE", "500"))
+MAIL_REENCRYPT_MAX_ROWS_PER_SECOND = float(os.getenv("MAIL_REENCRYPT_MAX_ROWS_PER_SECOND", "2000"))
+
+
+def reencrypt_bodies(
+    db: Session,
+    batch_size: int = None,
+    after_id: int = 0,
+    max_rows_per_second: float = None,
+    progress_callback: Optional[Callable] = None,
+    sleep: Callable[[float], None] = time.sleep,
+    clock: Callable[[], float] = time.monotonic
+) -> dict:
+    """
+    Re-encrypts every encrypted body with id > after_id onto the primary key.
+    Returns counts, the last id visited and the achieved throughput.
+    """
+    batch_size = batch_size or MAIL_REENCRYPT_BATCH_SIZE
+    rate = MAIL_REENCRYPT_MAX_ROWS_PER_SECOND if max_rows_per_second is None else max_rows_per_second
+    emails = models.InternalEmail
+
+    # 1. Size of the walk, for progress reporting
+    total = db.query(emails.id).filter(emails.id > after_id, emails.is_encrypted == True).count()
+    stats = {"scanned": 0, "reencrypted": 0, "already_current": 0, "undecryptable": 0, "changed_concurrently": 0}
+    last_id = after_id
+    started = clock()
+
+    while True:
+        # 2. Next chunk by primary key (keyset, so each chunk is an index range scan)
+        rows = (
+            db.query(emails.id, emails.body)
+            .filter(emails.id > last_id, emails.is_encrypted == True)
+            .order_by(emails.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+
+        # 3. Rewrite stale bodies; the body predicate skips a row whose body
+        # changed since it was read instead of overwriting it
+        for email_id, body in rows:
+            stats["scanned"] += 1
+            if not body or is_current(body):
+                stats["already_current"] += 1
+                continue
+            try:
+                rotated = rotate_message(body)
+            except InvalidToken:
+                # Not readable with any configured key (e.g. a key was removed too early)
+                stats["undecryptable"] += 1
+                continue
+            result = db.execute(
+                update(emails).where(emails.id == email_id, emails.body == body).values(body=rotated)
+            )
+            if result.rowcount:
+                stats["reencrypted"] += 1
+            else:
+                stats["changed_concurrently"] += 1
+        db.commit()
+        last_id = rows[-1][0]
+
+        # 4. Throttle: stay under max_rows_per_second on average
+        elapsed = clock() - started
+        if rate:
+            ahead = stats["scanned"] / rate - elapsed
+            if ahead > 0:
+                sleep(ahead)
+                elapsed = clock() - started
+
+        if progress_callback:
+            throughput = stats["scanned"] / elapsed if elapsed > 0 else 0.0
+            progress_callback(
+                100 * stats["scanned"] / total if total else 100,
+                f"{stats['scanned']}/{total} bodies checked, {stats['reencrypted']} re-encrypted, "
+                f"{throughput:.0f} rows/s, last id {last_id}"
+            )
+
+    elapsed = clock() - started
+    return {
+        **stats,
+        "total": total,
+        "last_id": last_id,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(stats["scanned"] / elapsed, 1) if elapsed > 0 else None,
+    }
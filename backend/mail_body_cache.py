@@ -0,0 +1,174 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from .encryption import decrypt_messages
+
+# Decrypted mail body cache
+# A broadcast is one internal_emails row opened by every recipient, and each
+# open used to pay Fernet's HMAC check + AES decryption again. Decrypted bodies
+# are kept in a bounded in-process LRU keyed by email id; it lives in memory
+# only (never written to disk, Redis or the database) and is limited by total
+# size rather than entry count, since bodies range from one line to pages.
+# Each entry remembers a fingerprint of the ciphertext it was decrypted from,
+# so a re-encrypted or replaced body (or a reused id) is a miss, not stale data.
+#   MAIL_BODY_CACHE_MAX_BYTES=0 disables the cache
+MAIL_BODY_CACHE_MAX_BYTES = int(os.getenv("MAIL_BODY_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+MAIL_BODY_CACHE_TTL_SECONDS = int(os.getenv("MAIL_BODY_CACHE_TTL_SECONDS", "600"))
+
+# List previews: first characters of the body, whitespace collapsed
+PREVIEW_LENGTH = 120
+
+
+class MailBodyCache:
+    """Bounded LRU of email_id -> (expires_at, fingerprint, body, size), limited by total bytes."""
+
+    def __init__(self, max_bytes: int = MAIL_BODY_CACHE_MAX_BYTES, ttl_seconds: int = MAIL_BODY_CACHE_TTL_SECONDS,
+                 clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.decrypted = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.ttl_seconds > 0
+
+    def _lookup(self, email_id: int, ciphertext: str, now: float) -> Optional[str]:
+        # Caller holds the lock
+        entry = self._entries.get(email_id)
+        if entry is None or entry[0] <= now or entry[1] != hash(ciphertext):
+            if entry is not None:
+                self._remove(email_id)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(email_id)
+        self.hits += 1
+        return entry[2]
+
+    def _store(self, email_id: int, ciphertext: str, body: str, now: float):
+        # Caller holds the lock
+        size = sys.getsizeof(body)
+        if size > self.max_bytes:
+            return
+        if email_id in self._entries:
+            self._remove(email_id)
+        self._entries[email_id] = (now + self.ttl_seconds, hash(ciphertext), body, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, email_id: int):
+        self._bytes -= self._entries.pop(email_id)[3]
+
+    def get(self, email_id: int, ciphertext: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            return self._lookup(email_id, ciphertext, self.clock())
+
+    def put(self, email_id: int, ciphertext: str, body: str):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._store(email_id, ciphertext, body, self.clock())
+
+    def decrypt(self, email_id: int, ciphertext: str) -> str:
+        """The plaintext of one email body, decrypting only on a miss."""
+        return self.decrypt_many([(email_id, ciphertext)])[email_id]
+
+    def decrypt_many(self, bodies: Iterable[tuple]) -> Dict[int, str]:
+        """
+        (email_id, ciphertext) pairs -> {email_id: plaintext}. Cached bodies are
+        served under one lock acquisition; the misses are decrypted together
+        (each distinct ciphertext once) outside the lock, then cached.
+        """
+        bodies = dict(bodies)
+        result, missing = {}, []
+        if self.enabled:
+            with self._lock:
+                now = self.clock()
+                for email_id, ciphertext in bodies.items():
+                    body = self._lookup(email_id, ciphertext, now)
+                    if body is None:
+                        missing.append(email_id)
+                    else:
+                        result[email_id] = body
+        else:
+            missing = list(bodies)
+        if not missing:
+            return result
+
+        plaintexts = decrypt_messages([bodies[email_id] for email_id in missing])
+        self.decrypted += len(missing)
+        result.update(zip(missing, plaintexts))
+        if self.enabled:
+            with self._lock:
+                now = self.clock()
+                for email_id, plaintext in zip(missing, plaintexts):
+                    self._store(email_id, bodies[email_id], plaintext, now)
+        return result
+
+    def invalidate(self, email_ids: Iterable[int]):
+        with self._lock:
+            for email_id in email_ids:
+                if email_id in self._entries:
+                    self._remove(email_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "decrypted": self.decrypted
+            }
+
+
+body_cache = MailBodyCache()
+
+
+def read_body(email) -> str:
+    """Plaintext body of an InternalEmail (legacy unencrypted rows as stored)."""
+    if not email.is_encrypted or not email.body:
+        return email.body
+    return body_cache.decrypt(email.id, email.body)
+
+
+def read_bodies(emails: Iterable) -> Dict[int, str]:
+    """Batched read_body for a page of InternalEmail rows (or id/body/is_encrypted rows): {email_id: body}."""
+    emails = list(emails)
+    result = {email.id: email.body for email in emails if not email.is_encrypted or not email.body}
+    result.update(body_cache.decrypt_many(
+        (email.id, email.body) for email in emails if email.id not in result
+    ))
+    return result
+
+
+def preview_text(body: Optional[str], length: int = PREVIEW_LENGTH) -> str:
+    text = " ".join((body or "").split())
+    return text if len(text) <= length else text[:length - 1].rstrip() + "…"
@@ -0,0 +1,366 @@
+import hashlib
+import hmac
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+from sqlalchemy import Integer, column, event, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .encryption import decrypt_message, get_search_key, search_key_fingerprint
+
+# Mail search index
+# One document per internal_emails row, keyed by email id:
+#   SQLite      FTS5 virtual table mail_search(subject, sender, body, owners)
+#   PostgreSQL  mail_search(email_id, document tsvector) with a GIN index;
+#               subject is weight A, sender B, owners C, body D
+# Subjects and sender names are stored as text (they are plaintext in
+# internal_emails already). Bodies are encrypted at rest, so the body column
+# holds keyed hashes of the words instead of the words: searching "leave"
+# looks up HMAC("leave"), and a database reader learns nothing it could not
+# learn from the ciphertext. Prefixes of BODY_PREFIX_MIN..BODY_PREFIX_MAX
+# characters are hashed too so body terms support prefix matching.
+# "owners" lists a token per mailbox holding the email (r<user_id> for each
+# recipient, s<user_id> for the sender). Every search includes the caller's
+# token, so the index intersects the caller's mail with the query terms itself
+# instead of matching the whole corpus and filtering afterwards; results are
+# then joined to email_recipients for the current folder. Bodies therefore
+# only ever match mail the caller is allowed to read.
+# mail_search_meta records the fingerprint of the search key the index was
+# built with, so a changed key (see encryption.get_search_key) is detected at
+# startup and triggers a full rebuild instead of silently breaking body search.
+SEARCH_TABLE = "mail_search"
+SEARCH_META_TABLE = "mail_search_meta"
+BODY_PREFIX_MIN = 3
+BODY_PREFIX_MAX = 8
+MAX_QUERY_TERMS = 8
+
+# bm25 column weights (subject, sender, body, owners); FTS5 ranks lower = better
+SQLITE_RANK = f"bm25({SEARCH_TABLE}, 10.0, 5.0, 1.0, 0.0)"
+# ts_rank weights for D (body), C (owners), B (sender), A (subject)
+POSTGRES_RANK_WEIGHTS = "{0.1, 0, 0.4, 1.0}"
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def _words(value: str) -> List[str]:
+    return _WORD.findall((value or "").casefold())
+
+
+@lru_cache(maxsize=65536)
+def _hash_token(kind: str, word: str) -> str:
+    digest = hmac.new(get_search_key(), f"{kind}:{word}".encode(), hashlib.sha256).hexdigest()
+    # 'f' whole word, 'p' prefix; 64 bits is plenty to keep tokens distinct
+    return kind + digest[:16]
+
+
+def body_tokens(body: str) -> str:
+    """Space-separated hashed tokens for a plaintext body (each distinct word once)."""
+    tokens = {}
+    for word in _words(body):
+        tokens[_hash_token("f", word)] = None
+        for k in range(BODY_PREFIX_MIN, min(len(word), BODY_PREFIX_MAX) + 1):
+            tokens[_hash_token("p", word[:k])] = None
+    return " ".join(tokens)
+
+
+def _body_term(term: str) -> str:
+    # Short and medium terms match as prefixes; longer ones as whole words
+    if BODY_PREFIX_MIN <= len(term) <= BODY_PREFIX_MAX:
+        return _hash_token("p", term)
+    return _hash_token("f", term)
+
+
+def dialect(db_or_conn) -> Optional[str]:
+    """'sqlite' or 'postgresql' when the index is supported, else None (ILIKE fallback)."""
+    name = db_or_conn.bind.dialect.name if isinstance(db_or_conn, Session) else db_or_conn.dialect.name
+    return name if name in ("sqlite", "postgresql") else None
+
+
+# ======================
+# Schema
+# ======================
+
+def create_search_index(connection):
+    """Creates the search table/index if missing. Safe to call repeatedly."""
+    name = dialect(connection)
+    if name == "sqlite":
+        connection.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+            "subject, sender, body, owners, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+    elif name == "postgresql":
+        connection.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+            "email_id INTEGER PRIMARY KEY REFERENCES internal_emails(id) ON DELETE CASCADE, "
+            "document TSVECTOR NOT NULL)"
+        )
+        connection.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_{SEARCH_TABLE}_document ON {SEARCH_TABLE} USING GIN (document)"
+        )
+    if name is not None:
+        connection.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {SEARCH_META_TABLE} (name VARCHAR PRIMARY KEY, value VARCHAR NOT NULL)"
+        )
+
+
+@event.listens_for(models.Base.metadata, "after_create")
+def _create_search_index(target, connection, **kw):
+    # Runs on every metadata.create_all(), alongside the ORM tables
+    create_search_index(connection)
+
+
+# ======================
+# Indexing
+# ======================
+
+def _owner_token(user_id: int, sent: bool = False) -> str:
+    return f"{'s' if sent else 'r'}{int(user_id)}"
+
+
+def document(email_id: int, sender_id: int, subject: str, sender_name: str, body: str,
+             recipient_ids: Iterable[int]) -> dict:
+    """Index row for one email, built from its plaintext body."""
+    owners = [_owner_token(sender_id, sent=True)] + [_owner_token(rid) for rid in dict.fromkeys(recipient_ids)]
+    return {"id": email_id, "subject": subject or "", "sender": sender_name or "",
+            "body": body_tokens(body), "owners": " ".join(owners)}
+
+
+def index_email(db: Session, email_id: int, sender_id: int, subject: str, sender_name: str, body: str,
+                recipient_ids: Iterable[int]):
+    """(Re)indexes one email. Runs in the caller's transaction."""
+    index_emails(db, [document(email_id, sender_id, subject, sender_name, body, recipient_ids)])
+
+
+def index_emails(db: Session, documents: List[dict]):
+    """(Re)indexes document() rows with one executemany."""
+    name = dialect(db)
+    if name is None or not documents:
+        return
+    if name == "sqlite":
+        db.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :id"), [{"id": d["id"]} for d in documents])
+        db.execute(text(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, subject, sender, body, owners) "
+            "VALUES (:id, :subject, :sender, :body, :owners)"
+        ), documents)
+    else:
+        db.execute(text(
+            f"INSERT INTO {SEARCH_TABLE} (email_id, document) VALUES (:id, "
+            "setweight(to_tsvector('simple', :subject), 'A') || "
+            "setweight(to_tsvector('simple', :sender), 'B') || "
+            "setweight(to_tsvector('simple', :owners), 'C') || "
+            "setweight(to_tsvector('simple', :body), 'D')) "
+            "ON CONFLICT (email_id) DO UPDATE SET document = EXCLUDED.document"
+        ), documents)
+
+
+def _indexed_ids(db: Session, email_ids: List[int]) -> set:
+    column = "rowid" if dialect(db) == "sqlite" else "email_id"
+    rows = db.execute(
+        text(f"SELECT {column} FROM {SEARCH_TABLE} WHERE {column} IN ({', '.join(str(int(i)) for i in email_ids)})")
+    ).all()
+    return {r[0] for r in rows}
+
+
+def rebuild_index(db: Session, full: bool = False, batch_size: int = 500, progress_callback=None) -> dict:
+    """
+    Indexes emails missing from the search index (all emails when full=True),
+    decrypting bodies batch by batch. Committed per batch, so an interrupted
+    run resumes where it stopped.
+    """
+    if dialect(db) is None:
+        return {"indexed": 0, "skipped": 0, "supported": False}
+
+    total = db.query(models.InternalEmail.id).count()
+    indexed = skipped = 0
+    last_id = 0
+    while True:
+        rows = (
+            db.query(models.InternalEmail, models.User)
+            .outerjoin(models.User, models.InternalEmail.sender_id == models.User.user_id)
+            .filter(models.InternalEmail.id > last_id)
+            .order_by(models.InternalEmail.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0].id
+        done = set() if full else _indexed_ids(db, [email.id for email, _ in rows])
+        pending = [(email, sender) for email, sender in rows if email.id not in done]
+        recipients = defaultdict(list)
+        if pending:
+            for email_id, recipient_id in db.query(models.EmailRecipient.email_id, models.EmailRecipient.recipient_id).filter(
+                    models.EmailRecipient.email_id.in_([email.id for email, _ in pending])):
+                recipients[email_id].append(recipient_id)
+        documents = [
+            document(email.id, email.sender_id, email.subject, sender_label(sender),
+                     decrypt_message(email.body) if email.is_encrypted else email.body, recipients[email.id])
+            for email, sender in pending
+        ]
+        index_emails(db, documents)
+        indexed += len(documents)
+        skipped += len(rows) - len(documents)
+        db.commit()
+        if progress_callback:
+            progress_callback(100 * (indexed + skipped) / max(total, 1), f"Indexed {indexed} of {total} emails")
+
+    if full:
+        # Every document now uses the current key
+        _record_key_fingerprint(db)
+        db.commit()
+    return {"indexed": indexed, "skipped": skipped, "supported": True}
+
+
+def needs_rebuild(db: Session) -> bool:
+    """True when mail exists but the index is empty (e.g. first start after upgrading)."""
+    if dialect(db) is None or db.query(models.InternalEmail.id).first() is None:
+        return False
+    column = "rowid" if dialect(db) == "sqlite" else "email_id"
+    return db.execute(text(f"SELECT {column} FROM {SEARCH_TABLE} LIMIT 1")).first() is None
+
+
+def _record_key_fingerprint(db: Session):
+    db.execute(text(f"DELETE FROM {SEARCH_META_TABLE} WHERE name = 'key_fingerprint'"))
+    db.execute(text(f"INSERT INTO {SEARCH_META_TABLE} (name, value) VALUES ('key_fingerprint', :value)"),
+               {"value": search_key_fingerprint()})
+
+
+def search_key_changed(db: Session) -> bool:
+    """
+    True when the index was built with a different search key and needs a full
+    rebuild. The first check records the current key (the index is assumed to
+    have been built with it).
+    """
+    if dialect(db) is None:
+        return False
+    stored = db.execute(text(f"SELECT value FROM {SEARCH_META_TABLE} WHERE name = 'key_fingerprint'")).scalar()
+    if stored is None:
+        try:
+            _record_key_fingerprint(db)
+            db.commit()
+        except IntegrityError:
+            # Another worker recorded it first
+            db.rollback()
+        return False
+    return stored != search_key_fingerprint()
+
+
+def sender_label(sender) -> str:
+    """Indexed sender text: rank, full name and username."""
+    if sender is None:
+        return ""
+    return " ".join(v for v in (sender.rank, sender.full_name, sender.username) if v)
+
+
+# ======================
+# Querying
+# ======================
+
+def query_terms(q: str) -> List[str]:
+    return list(dict.fromkeys(_words(q)))[:MAX_QUERY_TERMS]
+
+
+def build_match(owner: str, terms: Iterable[str], include_body: bool = True) -> str:
+    """FTS5 MATCH expression: the owner's mail where every term matches subject/sender (prefix) or the body."""
+    groups = [f"owners : {owner}"]
+    for term in terms:
+        group = f'{{subject sender}} : "{term}"*'
+        if include_body:
+            group = f"({group} OR body : {_body_term(term)})"
+        groups.append(group)
+    return " AND ".join(groups)
+
+
+def build_tsquery(owner: str, terms: Iterable[str], include_body: bool = True) -> str:
+    """to_tsquery('simple', ...) expression equivalent to build_match()."""
+    groups = [f"{owner}:C"]
+    for term in terms:
+        group = f"{term}:*AB"
+        if include_body:
+            group = f"({group} | {_body_term(term)}:D)"
+        groups.append(group)
+    return " & ".join(groups)
+
+
+def matching_email_ids(db: Session, user_id: int, terms: List[str], include_body: bool = False, sent: bool = False):
+    """Subquery of the user's email ids matching every term, or None when the index is unavailable."""
+    name = dialect(db)
+    owner = _owner_token(user_id, sent)
+    if name == "sqlite":
+        query = text(f"SELECT rowid AS email_id FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match").bindparams(
+            match=build_match(owner, terms, include_body))
+    elif name == "postgresql":
+        query = text(
+            f"SELECT email_id FROM {SEARCH_TABLE} WHERE document @@ to_tsquery('simple', :tsquery)"
+        ).bindparams(tsquery=build_tsquery(owner, terms, include_body))
+    else:
+        return None
+    return query.columns(column("email_id", Integer))
+
+
+def _ranked_sql(db: Session, folder: str) -> str:
+    # The owner token already limits matches to the caller's mail; the join
+    # applies the current folder (and drops permanently deleted entries)
+    if folder == "sent":
+        scope = (
+            "JOIN internal_emails e ON e.id = {id} "
+            "WHERE e.sender_id = :user_id AND e.is_deleted_by_sender = :not_deleted AND {match}"
+        )
+        select = "e.id"
+    else:
+        scope = (
+            "JOIN email_recipients r ON r.email_id = {id} "
+            "WHERE r.recipient_id = :user_id AND r.folder = :folder AND {match}"
+        )
+        select = "r.id"
+
+    if dialect(db) == "sqlite":
+        return (
+            f"SELECT {select}, {SQLITE_RANK} AS rank FROM {SEARCH_TABLE} "
+            + scope.format(id=f"{SEARCH_TABLE}.rowid", match=f"{SEARCH_TABLE} MATCH :match")
+            + " ORDER BY rank LIMIT :limit OFFSET :skip"
+        )
+    return (
+        f"SELECT {select}, -ts_rank('{POSTGRES_RANK_WEIGHTS}', s.document, to_tsquery('simple', :tsquery)) AS rank "
+        f"FROM {SEARCH_TABLE} s "
+        + scope.format(id="s.email_id", match="s.document @@ to_tsquery('simple', :tsquery)")
+        + " ORDER BY rank LIMIT :limit OFFSET :skip"
+    )
+
+
+def search(db: Session, user_id: int, q: str, folder: str = "inbox", include_body: bool = True,
+           skip: int = 0, limit: int = 20) -> List[schemas.MailSearchHit]:
+    """
+    Ranked search of one user's folder ('inbox', 'trash' or 'sent').
+    Every query word must match, as a prefix of a subject/sender word or a body word.
+    """
+    from .mail_service import MailService
+
+    terms = query_terms(q)
+    if not terms:
+        return []
+    if dialect(db) is None:
+        return MailService.search_fallback(db, user_id, terms, folder, skip, limit)
+
+    # 1. Ranked ids from the index, restricted to the caller's mailbox
+    owner = _owner_token(user_id, sent=folder == "sent")
+    ranked = db.execute(text(_ranked_sql(db, folder)), {
+        "match": build_match(owner, terms, include_body),
+        "tsquery": build_tsquery(owner, terms, include_body),
+        "user_id": user_id, "folder": folder, "not_deleted": False,
+        "limit": limit, "skip": skip,
+    }).all()
+    if not ranked:
+        return []
+
+    # 2. List rows for just those ids, returned in rank order
+    ranks = {row[0]: -row[1] for row in ranked}
+    items = {item.id: item for item in MailService.list_items(db, user_id, folder, list(ranks))}
+    return [
+        schemas.MailSearchHit(**items[item_id].model_dump(), rank=round(rank, 4))
+        for item_id, rank in ranks.items() if item_id in items
+    ]
@@ -1,14 +1,210 @@
 
+import base64
+import json
+from collections import Counter, defaultdict
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, func, insert, or_, tuple_
+from sqlalchemy.exc import IntegrityError
 from . import models, schemas
 from datetime import datetime
-from .encryption import encrypt_message, decrypt_message
+from .encryption import encrypt_message
+from .mail_body_cache import read_body, read_bodies, preview_text
+from . import mail_search
+
+# Mailbox counters
+# inbox_unread/inbox_total/trash_total/sent_total live in mailbox_counters and
+# are adjusted with atomic "col = col + delta" updates in the same transaction
+# as every MailService mutation, so the polled unread-count/stats endpoints
+# read one row by primary key. A user's row is built from COUNT queries the
+# first time it is read; reconcile_counters() repairs any drift.
+COUNTER_FIELDS = ("inbox_unread", "inbox_total", "trash_total", "sent_total")
+
+def _entry_counts(folder: str, is_read: bool) -> dict:
+    # What one EmailRecipient row contributes to its owner's counters
+    if folder == "inbox":
+        return {"inbox_total": 1, "inbox_unread": 0 if is_read else 1}
+    if folder == "trash":
+        return {"trash_total": 1}
+    return {}
+
+def _new_deltas():
+    # user_id -> Counter of field -> delta
+    return defaultdict(Counter)
+
+def _add_entry(deltas, user_id: int, folder: str, is_read: bool, count: int = 1):
+    # count < 0 removes entries
+    for field, value in _entry_counts(folder, is_read).items():
+        deltas[user_id][field] += count * value
+
+def _apply_counter_deltas(db: Session, deltas):
+    """Issues one UPDATE per distinct delta (e.g. all recipients of a broadcast)."""
+    groups = defaultdict(list)
+    for user_id, counter in deltas.items():
+        changes = tuple(sorted((f, d) for f, d in counter.items() if d))
+        if changes:
+            groups[changes].append(user_id)
+
+    for changes, user_ids in groups.items():
+        values = {getattr(models.MailboxCounter, f): getattr(models.MailboxCounter, f) + d for f, d in changes}
+        for i in range(0, len(user_ids), 500):
+            # Users without a counter row yet are skipped; their row is built from
+            # the (already updated) mail tables on first read
+            db.query(models.MailboxCounter).filter(
+                models.MailboxCounter.user_id.in_(user_ids[i:i + 500])
+            ).update(values, synchronize_session=False)
+
+def _format_recipient_summary(first_name: str, count: int) -> str:
+    # "First Recipient +N others", as shown in the Sent list
+    if not count:
+        return "Unknown"
+    name = first_name or "Unknown"
+    return name if count == 1 else f"{name} +{count - 1} others"
+
+# Folder pagination
+# Listings are ordered newest first on (timestamp, id). Besides skip/limit they
+# accept an opaque cursor naming the last row of the previous page; the next
+# page starts strictly after it, so deep pages cost the same as the first and
+# mail arriving mid-scroll neither shifts nor duplicates rows. Inbox and trash
+# page on email_recipients.email_timestamp (a copy of the email's timestamp)
+# so the whole walk stays on ix_email_recipients_folder_page.
+def encode_cursor(timestamp: datetime, email_id: int) -> str:
+    raw = json.dumps([timestamp.isoformat(), email_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """(timestamp, email_id) from encode_cursor(); ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, email_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), int(email_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def next_cursor(items: list, limit: int):
+    """Cursor for the page after items, or None when items was the last page."""
+    if not items or len(items) < limit:
+        return None
+    return encode_cursor(items[-1].timestamp, items[-1].email_id)
+
+def _page(query, timestamp_col, id_col, skip: int, limit: int, cursor: str = None):
+    # Newest first; a cursor replaces the offset with a seek past its row
+    query = query.order_by(desc(timestamp_col), desc(id_col))
+    if cursor:
+        query = query.filter(tuple_(timestamp_col, id_col) < tuple_(*decode_cursor(cursor)))
+    elif skip:
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
+def _inbox_item(rec, email, sender) -> schemas.InboxItem:
+    return schemas.InboxItem(
+        id=rec.id, # Recipient Entry ID
+        email_id=email.id,
+        subject=email.subject,
+        sender_id=email.sender_id,
+        sender_name=sender.full_name or sender.username,
+        sender_role=sender.role,
+        timestamp=email.timestamp,
+        is_read=rec.is_read,
+        priority=email.priority,
+        is_starred=rec.is_starred
+    )
 
 class MailService:
+    @staticmethod
+    def _set_recipient_summary(db: Session, email: models.InternalEmail, recipient_ids: list):
+        """Fills the denormalized recipient_count/recipient_summary columns."""
+        first_name = None
+        if recipient_ids:
+            first = db.query(models.User.full_name, models.User.username)\
+                .filter(models.User.user_id == recipient_ids[0]).first()
+            if first:
+                first_name = first.full_name or first.username
+        email.recipient_count = len(recipient_ids)
+        email.recipient_summary = _format_recipient_summary(first_name, len(recipient_ids))
+
+    @staticmethod
+    def _summaries_from_recipients(db: Session, email_ids: list) -> dict:
+        """
+        email_id -> recipient summary for emails sent before the denormalized
+        columns existed: count and first recipient's name in one grouped query.
+        """
+        grouped = (
+            db.query(
+                models.EmailRecipient.email_id.label("email_id"),
+                func.count(models.EmailRecipient.id).label("recipient_count"),
+                func.min(models.EmailRecipient.id).label("first_entry_id")
+            )
+            .filter(models.EmailRecipient.email_id.in_(email_ids))
+            .group_by(models.EmailRecipient.email_id)
+            .subquery()
+        )
+        rows = (
+            db.query(grouped.c.email_id, grouped.c.recipient_count, models.User.full_name, models.User.username)
+            .join(models.EmailRecipient, models.EmailRecipient.id == grouped.c.first_entry_id)
+            .outerjoin(models.User, models.User.user_id == models.EmailRecipient.recipient_id)
+            .all()
+        )
+        return {
+            row.email_id: _format_recipient_summary(row.full_name or row.username, row.recipient_count)
+            for row in rows
+        }
+
+    @staticmethod
+    def resolve_recipients(db: Session, email_data: schemas.EmailCreate, sender_id: int) -> list:
+        """
+        Resolves explicit ids and broadcast targets to user_ids, without duplicates,
+        keeping the order explicit ids -> batch/company -> role. Broadcasts are a
+        single agniveers -> users_auth join returning only user_ids.
+        """
+        # dict keys keep first-seen order and drop duplicates (a user can fall into
+        # several categories but gets one notification)
+        recipient_ids = dict.fromkeys(email_data.recipient_ids or [])
+        
+        # 1. Batch / Company Broadcast
+        unit_filters = []
+        if email_data.target_batch:
+            unit_filters.append(models.Agniveer.batch_no == email_data.target_batch)
+        if email_data.target_company:
+            unit_filters.append(models.Agniveer.company == email_data.target_company)
+        if unit_filters:
+            rows = (
+                db.query(models.User.user_id)
+                .join(models.Agniveer, models.User.agniveer_id == models.Agniveer.id)
+                .filter(or_(*unit_filters))
+                .order_by(models.User.user_id)
+                .all()
+            )
+            recipient_ids.update(dict.fromkeys(r[0] for r in rows))
+                    
+        # 2. Role Routing
+        # Allows sending to all Commanding Officers (CO) or specific Company Commanders (COY_CDR).
+        if email_data.target_role == 'co':
+            rows = db.query(models.User.user_id).filter(models.User.role == models.UserRole.CO).all()
+            recipient_ids.update(dict.fromkeys(r[0] for r in rows))
+                     
+        elif email_data.target_role == 'coy_cdr':
+            # Company Commanders of the sender's company (via their Agniveer profile)
+            sender_company = (
+                db.query(models.Agniveer.company)
+                .join(models.User, models.User.agniveer_id == models.Agniveer.id)
+                .filter(models.User.user_id == sender_id)
+                .scalar()
+            )
+            if sender_company:
+                rows = db.query(models.User.user_id).filter(
+                    models.User.role == models.UserRole.COY_CDR,
+                    models.User.assigned_company == sender_company
+                ).all()
+                recipient_ids.update(dict.fromkeys(r[0] for r in rows))
+
+        return list(recipient_ids)
+
     @staticmethod
     def send_email(db: Session, email_data: schemas.EmailCreate, sender_id: int):
-        # 1. Create Core Email Content (with encrypted body)
+        # 1. Determine Recipients
+        recipient_ids = MailService.resolve_recipients(db, email_data, sender_id)
+
+        # 2. Create Core Email Content (with encrypted body)
         # Encrypt the body using Fernet symmetric encryption before storing.
         # This ensures that database administrators cannot read the email content directly.
         encrypted_body = encrypt_message(email_data.body)
@@ -18,77 +214,42 @@ class MailService:
             subject=email_data.subject,
             body=encrypted_body,
             priority=email_data.priority,
-            is_encrypted=True
+            is_encrypted=True,
+            timestamp=datetime.utcnow()
         )
+        MailService._set_recipient_summary(db, new_email, recipient_ids)
         db.add(new_email)
-        db.commit()
-        db.refresh(new_email)
-        
-        # 2. Determine Recipients
-        # Use a Set to avoid duplicate notifications if a user falls into multiple categories.
-        recipient_ids = set(email_data.recipient_ids or [])
-        
-        # 2a. Handle Batch Broadcast
-        # If a target batch is specified, fetch all Agniveers in that batch number.
-        if email_data.target_batch:
-            agniveers = db.query(models.Agniveer).filter(models.Agniveer.batch_no == email_data.target_batch).all()
-            for ag in agniveers:
-                if ag.user_account:
-                    recipient_ids.add(ag.user_account.user_id)
-                    
-        # 2b. Handle Company Broadcast
-        # If a target company is specified, fetch all Agniveers in that company.
-        if email_data.target_company:
-            agniveers = db.query(models.Agniveer).filter(models.Agniveer.company == email_data.target_company).all()
-            for ag in agniveers:
-                if ag.user_account:
-                    recipient_ids.add(ag.user_account.user_id)
-                    
-        # 2c. Handle Role Routing (New)
-        # Allows sending to all Commanding Officers (CO) or specific Company Commanders (COY_CDR).
-        if email_data.target_role:
-             # Case: Send to all Commanding Officers
-             if email_data.target_role == 'co':
-                 co_users = db.query(models.User).filter(models.User.role == models.UserRole.CO).all()
-                 for u in co_users:
-                     recipient_ids.add(u.user_id)
-                     
-             # Case: Send to the Company Commander of the Sender's company
-             elif email_data.target_role == 'coy_cdr':
-                 # Find Sender's Company via their Agniveer profile link
-                 sender = db.query(models.User).filter(models.User.user_id == sender_id).first()
-                 if sender and sender.agniveer_id:
-                     agniveer = db.query(models.Agniveer).filter(models.Agniveer.id == sender.agniveer_id).first()
-                     if agniveer and agniveer.company:
-                         # Query for Users with COY_CDR role assigned to that company
-                         cmdrs = db.query(models.User).filter(
-                             models.User.role == models.UserRole.COY_CDR,
-                             models.User.assigned_company == agniveer.company
-                         ).all()
-                         for u in cmdrs:
-                             recipient_ids.add(u.user_id)
+        db.flush()
+
+        # Search index from the plaintext, before it only exists encrypted
+        sender = db.get(models.User, sender_id)
+        mail_search.index_email(db, new_email.id, sender_id, new_email.subject, mail_search.sender_label(sender),
+                                email_data.body, recipient_ids)
         
         # 3. Create Recipient Entries
-        # Create an individual EmailRecipient record for each resolved user.
-        # This allows per-user read/unread status and folder management.
-        user_entries = []
+        # One EmailRecipient row per resolved user (per-user read/unread status and
+        # folder management), written with a single executemany INSERT in the same
+        # transaction as the email. Self-send is allowed.
+        if recipient_ids:
+            db.execute(insert(models.EmailRecipient), [
+                {"email_id": new_email.id, "recipient_id": rid, "folder": "inbox",
+                 "email_timestamp": new_email.timestamp}
+                for rid in recipient_ids
+            ])
+
+        # 4. Counters: one unread inbox item per recipient, one sent item for the sender
+        deltas = _new_deltas()
         for rid in recipient_ids:
-            # Allow self-send by not filtering out sender_id
-            user_entries.append(models.EmailRecipient(
-                email_id=new_email.id,
-                recipient_id=rid,
-                folder="inbox"
-            ))
-        
-        if user_entries:
-            db.add_all(user_entries)
-            db.commit()
+            _add_entry(deltas, rid, "inbox", False)
+        deltas[sender_id]["sent_total"] += 1
+        _apply_counter_deltas(db, deltas)
+        db.commit()
             
         # Return list of recipient IDs so we can send real-time notifications
-        return [entry.recipient_id for entry in user_entries]
+        return recipient_ids
 
     @staticmethod
-    def get_inbox(db: Session, user_id: int, skip: int = 0, limit: int = 20, search: str = None):
+    def get_inbox(db: Session, user_id: int, skip: int = 0, limit: int = 20, search: str = None, cursor: str = None):
         # Join to get sender details
         # Query EmailRecipient where recipient_id == user_id
         query = (
@@ -100,42 +261,94 @@ class MailService:
         )
         
         # Apply search filter if provided
+        # Every word must match subject, sender or body (see mail_search); the
+        # listing stays newest first. Without a search index, fall back to
+        # ILIKE on subject and sender name/username.
         if search:
-            search_term = f"%{search}%"
-            # Filter matches if the search term is found in:
-            # 1. Email Subject
-            # 2. Sender's Full Name
-            # 3. Sender's Username
-            # Using ilike for case-insensitive matching (PostgreSQL/SQLite compatible)
+            terms = mail_search.query_terms(search)
+            matches = mail_search.matching_email_ids(db, user_id, terms, include_body=True) if terms else None
+            if matches is not None:
+                query = query.filter(models.EmailRecipient.email_id.in_(matches))
+            else:
+                query = MailService._ilike_terms(query, terms or [search])
+        
+        results = _page(query, models.EmailRecipient.email_timestamp, models.EmailRecipient.email_id, skip, limit, cursor)
+        return [_inbox_item(rec, email, sender) for rec, email, sender in results]
+
+    @staticmethod
+    def _ilike_terms(query, terms: list):
+        # Each term as a substring of the subject, sender full name or username
+        for term in terms:
+            pattern = f"%{term}%"
             query = query.filter(
-                (models.InternalEmail.subject.ilike(search_term)) |
-                (models.User.full_name.ilike(search_term)) |
-                (models.User.username.ilike(search_term))
+                (models.InternalEmail.subject.ilike(pattern)) |
+                (models.User.full_name.ilike(pattern)) |
+                (models.User.username.ilike(pattern))
             )
-        
+        return query
+
+    @staticmethod
+    def search_fallback(db: Session, user_id: int, terms: list, folder: str, skip: int = 0, limit: int = 20):
+        """mail_search.search() for databases without a search index: unranked, newest first."""
+        if folder == "sent":
+            query = (
+                db.query(models.InternalEmail.id)
+                .join(models.User, models.InternalEmail.sender_id == models.User.user_id)
+                .filter(models.InternalEmail.sender_id == user_id)
+                .filter(models.InternalEmail.is_deleted_by_sender == False)
+            )
+            order = (desc(models.InternalEmail.timestamp), desc(models.InternalEmail.id))
+        else:
+            query = (
+                db.query(models.EmailRecipient.id)
+                .join(models.InternalEmail, models.EmailRecipient.email_id == models.InternalEmail.id)
+                .join(models.User, models.InternalEmail.sender_id == models.User.user_id)
+                .filter(models.EmailRecipient.recipient_id == user_id)
+                .filter(models.EmailRecipient.folder == folder)
+            )
+            order = (desc(models.EmailRecipient.email_timestamp), desc(models.EmailRecipient.email_id))
+        ids = [r[0] for r in MailService._ilike_terms(query, terms).order_by(*order).offset(skip).limit(limit).all()]
+        items = {item.id: item for item in MailService.list_items(db, user_id, folder, ids)}
+        return [schemas.MailSearchHit(**items[i].model_dump(), rank=0.0) for i in ids if i in items]
+
+    @staticmethod
+    def list_items(db: Session, user_id: int, folder: str, ids: list):
+        """Folder list rows for specific ids (recipient entry ids, or email ids for 'sent')."""
+        if not ids:
+            return []
+        if folder == "sent":
+            emails = (
+                db.query(models.InternalEmail)
+                .filter(models.InternalEmail.id.in_(ids))
+                .filter(models.InternalEmail.sender_id == user_id)
+                .all()
+            )
+            return MailService._sent_items(db, emails, user_id)
         results = (
-            query
-            .order_by(desc(models.InternalEmail.timestamp))
-            .offset(skip)
-            .limit(limit)
+            db.query(models.EmailRecipient, models.InternalEmail, models.User)
+            .join(models.InternalEmail, models.EmailRecipient.email_id == models.InternalEmail.id)
+            .join(models.User, models.InternalEmail.sender_id == models.User.user_id)
+            .filter(models.EmailRecipient.id.in_(ids))
+            .filter(models.EmailRecipient.recipient_id == user_id)
             .all()
         )
-        
-        inbox_items = []
-        for rec, email, sender in results:
-            inbox_items.append(schemas.InboxItem(
-                id=rec.id, # Recipient Entry ID
-                email_id=email.id,
-                subject=email.subject,
-                sender_id=email.sender_id,
-                sender_name=sender.full_name or sender.username,
-                sender_role=sender.role,
-                timestamp=email.timestamp,
-                is_read=rec.is_read,
-                priority=email.priority,
-                is_starred=rec.is_starred
-            ))
-        return inbox_items
+        return [_inbox_item(rec, email, sender) for rec, email, sender in results]
+
+    @staticmethod
+    def attach_previews(db: Session, items: list):
+        """Sets item.preview for a folder page: one query for the bodies, one batched decrypt."""
+        email_ids = {item.email_id for item in items}
+        if not email_ids:
+            return items
+        rows = (
+            db.query(models.InternalEmail.id, models.InternalEmail.body, models.InternalEmail.is_encrypted)
+            .filter(models.InternalEmail.id.in_(email_ids))
+            .all()
+        )
+        bodies = read_bodies(rows)
+        for item in items:
+            item.preview = preview_text(bodies.get(item.email_id))
+        return items
 
     @staticmethod
     def get_email_detail(db: Session, recipient_entry_id: int, user_id: int):
@@ -150,16 +363,20 @@ class MailService:
             
         # Mark as read
         if not entry.is_read:
+            deltas = _new_deltas()
+            _add_entry(deltas, user_id, entry.folder, False, -1)
+            _add_entry(deltas, user_id, entry.folder, True)
             entry.is_read = True
             entry.read_at = datetime.utcnow()
+            _apply_counter_deltas(db, deltas)
             db.commit()
             
         # Fetch content
         email = db.query(models.InternalEmail).filter(models.InternalEmail.id == entry.email_id).first()
         sender = db.query(models.User).filter(models.User.user_id == email.sender_id).first()
         
-        # Decrypt body if encrypted
-        body = decrypt_message(email.body) if email.is_encrypted else email.body
+        # Decrypt body if encrypted (served from the body cache for mail already opened)
+        body = read_body(email)
         
         return schemas.EmailDetail(
             id=entry.id,
@@ -176,11 +393,18 @@ class MailService:
 
     @staticmethod
     def get_unread_count(db: Session, user_id: int):
-        return db.query(models.EmailRecipient).filter(
-            models.EmailRecipient.recipient_id == user_id,
-            models.EmailRecipient.is_read == False,
-            models.EmailRecipient.folder == "inbox"
-        ).count()
+        return MailService.get_counters(db, user_id).inbox_unread
+
+    @staticmethod
+    def _move_entry(db: Session, entry: models.EmailRecipient, folder: str):
+        """Moves a recipient entry to another folder, adjusting the owner's counters."""
+        if entry.folder == folder:
+            return
+        deltas = _new_deltas()
+        _add_entry(deltas, entry.recipient_id, entry.folder, entry.is_read, -1)
+        _add_entry(deltas, entry.recipient_id, folder, entry.is_read)
+        entry.folder = folder
+        _apply_counter_deltas(db, deltas)
 
     @staticmethod
     def soft_delete_email(db: Session, recipient_entry_id: int, user_id: int):
@@ -190,7 +414,7 @@ class MailService:
             models.EmailRecipient.recipient_id == user_id
         ).first()
         if entry:
-            entry.folder = "trash"
+            MailService._move_entry(db, entry, "trash")
             db.commit()
             return True
         
@@ -202,7 +426,11 @@ class MailService:
         ).first()
         
         if email:
-            email.is_deleted_by_sender = True
+            if not email.is_deleted_by_sender:
+                email.is_deleted_by_sender = True
+                deltas = _new_deltas()
+                deltas[user_id]["sent_total"] -= 1
+                _apply_counter_deltas(db, deltas)
             db.commit()
             return True
             
@@ -216,7 +444,7 @@ class MailService:
             models.EmailRecipient.recipient_id == user_id
         ).first()
         if entry:
-            entry.folder = "inbox"
+            MailService._move_entry(db, entry, "inbox")
             db.commit()
             return True
         return False
@@ -229,73 +457,52 @@ class MailService:
             models.EmailRecipient.recipient_id == user_id
         ).first()
         if entry:
+            deltas = _new_deltas()
+            _add_entry(deltas, user_id, entry.folder, entry.is_read, -1)
             db.delete(entry)
+            _apply_counter_deltas(db, deltas)
             db.commit()
             return True
         return False
 
     @staticmethod
-    def get_trash(db: Session, user_id: int, skip: int = 0, limit: int = 20):
-        results = (
+    def get_trash(db: Session, user_id: int, skip: int = 0, limit: int = 20, cursor: str = None):
+        query = (
             db.query(models.EmailRecipient, models.InternalEmail, models.User)
             .join(models.InternalEmail, models.EmailRecipient.email_id == models.InternalEmail.id)
             .join(models.User, models.InternalEmail.sender_id == models.User.user_id)
             .filter(models.EmailRecipient.recipient_id == user_id)
             .filter(models.EmailRecipient.folder == "trash")
-            .order_by(desc(models.InternalEmail.timestamp))
-            .offset(skip)
-            .limit(limit)
-            .all()
         )
-        items = []
-        for rec, email, sender in results:
-            items.append(schemas.InboxItem(
-                id=rec.id,
-                email_id=email.id,
-                subject=email.subject,
-                sender_id=email.sender_id,
-                sender_name=sender.full_name or sender.username,
-                sender_role=sender.role,
-                timestamp=email.timestamp,
-                is_read=rec.is_read,
-                priority=email.priority
-            ))
-        return items
+        results = _page(query, models.EmailRecipient.email_timestamp, models.EmailRecipient.email_id, skip, limit, cursor)
+        return [_inbox_item(rec, email, sender) for rec, email, sender in results]
 
     @staticmethod
-    def get_sent(db: Session, user_id: int, skip: int = 0, limit: int = 20):
+    def get_sent(db: Session, user_id: int, skip: int = 0, limit: int = 20, cursor: str = None):
         # For Sent items, we query InternalEmail where sender_id == user_id
         # Note: We don't have a 'Sent' folder per se, just all mails sent by user.
-        # But we probably want to group them. 
-        # Actually, `InternalEmail` is the source.
-        # We need to know who it was sent TO. 
-        # This is 1-to-Many. An email can have multiple recipients.
-        # For the list view, we can just show "To: Multiple" or the first recipient.
-        
-        emails = (
+        # An email can have many recipients; the list shows the first recipient
+        # and a count ("To: Name +N others"), stored on the email at send time,
+        # so listing never reads email_recipients.
+        query = (
             db.query(models.InternalEmail)
             .filter(models.InternalEmail.sender_id == user_id)
             .filter(models.InternalEmail.is_deleted_by_sender == False)
-            .order_by(desc(models.InternalEmail.timestamp))
-            .offset(skip)
-            .limit(limit)
-            .all()
         )
-        
+        emails = _page(query, models.InternalEmail.timestamp, models.InternalEmail.id, skip, limit, cursor)
+        return MailService._sent_items(db, emails, user_id)
+
+    @staticmethod
+    def _sent_items(db: Session, emails: list, user_id: int):
+        # Emails from before the denormalized columns: one grouped query for the page
+        legacy_ids = [email.id for email in emails if email.recipient_summary is None]
+        legacy = MailService._summaries_from_recipients(db, legacy_ids) if legacy_ids else {}
+
         sent_items = []
         for email in emails:
-            # Fetch at least one recipient to show
-            rec_count = db.query(models.EmailRecipient).filter(models.EmailRecipient.email_id == email.id).count()
-            first_rec = db.query(models.EmailRecipient).filter(models.EmailRecipient.email_id == email.id).first()
-            
-            recipient_name = "Unknown"
-            if first_rec:
-                rec_user = db.query(models.User).filter(models.User.user_id == first_rec.recipient_id).first()
-                if rec_user:
-                    recipient_name = rec_user.full_name or rec_user.username
-            
-            if rec_count > 1:
-                recipient_name += f" +{rec_count - 1} others"
+            recipient_name = email.recipient_summary
+            if recipient_name is None:
+                recipient_name = legacy.get(email.id, "Unknown")
                 
             sent_items.append(schemas.InboxItem(
                 id=email.id, # Using Email ID itself as the ref for Sent items
@@ -325,8 +532,8 @@ class MailService:
         # Or just return the detail.
         # For simplicity, returning EmailDetail.
         
-        # Decrypt body if encrypted
-        body = decrypt_message(email.body) if email.is_encrypted else email.body
+        # Decrypt body if encrypted (served from the body cache for mail already opened)
+        body = read_body(email)
         
         return schemas.EmailDetail(
             id=email.id, # Using InternalID
@@ -341,37 +548,88 @@ class MailService:
             priority=email.priority
         )
 
+    @staticmethod
+    def count_mailboxes(db: Session, user_ids: list = None) -> dict:
+        """
+        Counter values computed from the mail tables: user_id -> {field: count}.
+        Two grouped queries (recipient entries by folder/read state, sent mail),
+        limited to user_ids when given and to users that still exist.
+        """
+        counts = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+
+        entries = (
+            db.query(models.EmailRecipient.recipient_id, models.EmailRecipient.folder,
+                     models.EmailRecipient.is_read, func.count(models.EmailRecipient.id))
+            .join(models.User, models.User.user_id == models.EmailRecipient.recipient_id)
+            .filter(models.EmailRecipient.folder.in_(["inbox", "trash"]))
+        )
+        sent = (
+            db.query(models.InternalEmail.sender_id, func.count(models.InternalEmail.id))
+            .join(models.User, models.User.user_id == models.InternalEmail.sender_id)
+            .filter(models.InternalEmail.is_deleted_by_sender == False)
+        )
+        if user_ids is not None:
+            entries = entries.filter(models.EmailRecipient.recipient_id.in_(user_ids))
+            sent = sent.filter(models.InternalEmail.sender_id.in_(user_ids))
+
+        for user_id, folder, is_read, count in entries.group_by(
+            models.EmailRecipient.recipient_id, models.EmailRecipient.folder, models.EmailRecipient.is_read
+        ).all():
+            for field, value in _entry_counts(folder, bool(is_read)).items():
+                counts[user_id][field] += count * value
+        for user_id, count in sent.group_by(models.InternalEmail.sender_id).all():
+            counts[user_id]["sent_total"] = count
+        return dict(counts)
+
+    @staticmethod
+    def get_counters(db: Session, user_id: int) -> models.MailboxCounter:
+        """The user's counter row (primary-key read), built on first use."""
+        counter = db.get(models.MailboxCounter, user_id)
+        if counter is None:
+            values = MailService.count_mailboxes(db, [user_id]).get(user_id, dict.fromkeys(COUNTER_FIELDS, 0))
+            counter = models.MailboxCounter(user_id=user_id, **values)
+            db.add(counter)
+            try:
+                db.commit()
+            except IntegrityError:
+                # Built concurrently by another request
+                db.rollback()
+                counter = db.get(models.MailboxCounter, user_id)
+        return counter
+
     @staticmethod
     def get_mailbox_stats(db: Session, user_id: int):
         """Returns counts for Inbox (Unread), Sent (Total), Trash (Total)"""
-        inbox_unread = db.query(models.EmailRecipient).filter(
-            models.EmailRecipient.recipient_id == user_id,
-            models.EmailRecipient.folder == "inbox",
-            models.EmailRecipient.is_read == False
-        ).count()
-        
-        inbox_total = db.query(models.EmailRecipient).filter(
-           models.EmailRecipient.recipient_id == user_id,
-           models.EmailRecipient.folder == "inbox"
-        ).count()
-        
-        sent_total = db.query(models.InternalEmail).filter(
-            models.InternalEmail.sender_id == user_id,
-            models.InternalEmail.is_deleted_by_sender == False
-        ).count()
-        
-        trash_total = db.query(models.EmailRecipient).filter(
-            models.EmailRecipient.recipient_id == user_id,
-            models.EmailRecipient.folder == "trash"
-        ).count()
-        
+        counter = MailService.get_counters(db, user_id)
         return {
-            "inbox_unread": inbox_unread,
-            "inbox_total": inbox_total,
-            "sent_total": sent_total,
-            "trash_total": trash_total
+            "inbox_unread": counter.inbox_unread,
+            "inbox_total": counter.inbox_total,
+            "sent_total": counter.sent_total,
+            "trash_total": counter.trash_total
         }
 
+    @staticmethod
+    def reconcile_counters(db: Session, user_ids: list = None) -> dict:
+        """
+        Recomputes counters from the mail tables and repairs rows that drifted.
+        Only users that already have a row are checked; others are built on first read.
+        """
+        query = db.query(models.MailboxCounter)
+        if user_ids is not None:
+            query = query.filter(models.MailboxCounter.user_id.in_(user_ids))
+        counters = query.all()
+        actual = MailService.count_mailboxes(db, [c.user_id for c in counters] if user_ids is not None else None)
+
+        repaired = []
+        for counter in counters:
+            expected = actual.get(counter.user_id, dict.fromkeys(COUNTER_FIELDS, 0))
+            if any(getattr(counter, field) != expected[field] for field in COUNTER_FIELDS):
+                for field in COUNTER_FIELDS:
+                    setattr(counter, field, expected[field])
+                repaired.append(counter.user_id)
+        db.commit()
+        return {"checked": len(counters), "repaired": len(repaired), "repaired_user_ids": repaired}
+
     @staticmethod
     def bulk_delete_emails(db: Session, ids: list[int], user_id: int, folder: str):
         """
@@ -379,24 +637,42 @@ class MailService:
         If folder == 'trash', permanent delete.
         Else, soft delete (move to trash).
         """
-        if folder == 'trash':
-             db.query(models.EmailRecipient).filter(
-                 models.EmailRecipient.recipient_id == user_id,
-                 models.EmailRecipient.folder == 'trash',
-                 models.EmailRecipient.id.in_(ids)
-             ).delete(synchronize_session=False)
-        elif folder == 'sent':
+        deltas = _new_deltas()
+        if folder == 'sent':
              # Soft delete for sender
-             db.query(models.InternalEmail).filter(
+             query = db.query(models.InternalEmail).filter(
                  models.InternalEmail.sender_id == user_id,
-                 models.InternalEmail.id.in_(ids)
-             ).update({models.InternalEmail.is_deleted_by_sender: True}, synchronize_session=False)
+                 models.InternalEmail.id.in_(ids),
+                 models.InternalEmail.is_deleted_by_sender == False
+             )
+             deltas[user_id]["sent_total"] -= query.update(
+                 {models.InternalEmail.is_deleted_by_sender: True}, synchronize_session=False)
         else:
-             db.query(models.EmailRecipient).filter(
+             query = db.query(models.EmailRecipient).filter(
                  models.EmailRecipient.recipient_id == user_id,
                  models.EmailRecipient.id.in_(ids)
-             ).update({models.EmailRecipient.folder: "trash"}, synchronize_session=False)
+             )
+             if folder == 'trash':
+                 # Permanent delete of items already in trash
+                 query = query.filter(models.EmailRecipient.folder == 'trash')
+             else:
+                 query = query.filter(models.EmailRecipient.folder != 'trash')
+
+             # Counter changes from the affected rows' current folder/read state
+             for entry_folder, is_read, count in (
+                 query.with_entities(models.EmailRecipient.folder, models.EmailRecipient.is_read, func.count())
+                 .group_by(models.EmailRecipient.folder, models.EmailRecipient.is_read).all()
+             ):
+                 _add_entry(deltas, user_id, entry_folder, is_read, -count)
+                 if folder != 'trash':
+                     _add_entry(deltas, user_id, "trash", is_read, count)
+
+             if folder == 'trash':
+                 query.delete(synchronize_session=False)
+             else:
+                 query.update({models.EmailRecipient.folder: "trash"}, synchronize_session=False)
              
+        _apply_counter_deltas(db, deltas)
         db.commit()
         return True
 
@@ -485,44 +761,37 @@ class MailService:
         # Format the body to include original metadata (Sender, Date, Subject)
         # This mimics standard email client forwarding behavior.
         # The new sender is the current user (forwarder).
+        # Email, recipients and counters are written in one transaction
+        # The quoted body is the decrypted original; the new body is encrypted
+        # like any sent mail and indexed from its plaintext.
+        new_recipient_ids = list(dict.fromkeys(new_recipient_ids))
+        body = f"---------- Forwarded message ----------\nFrom: User ID {original.sender_id}\nDate: {original.timestamp}\nSubject: {original.subject}\n\n{read_body(original)}"
         forwarded = models.InternalEmail(
             sender_id=user_id,
             subject=f"Fwd: {original.subject}",
-            body=f"---------- Forwarded message ----------\nFrom: User ID {original.sender_id}\nDate: {original.timestamp}\nSubject: {original.subject}\n\n{original.body}",
-            priority=original.priority
+            body=encrypt_message(body),
+            priority=original.priority,
+            is_encrypted=True,
+            timestamp=datetime.utcnow()
         )
+        MailService._set_recipient_summary(db, forwarded, new_recipient_ids)
         db.add(forwarded)
-        db.commit()
-        db.refresh(forwarded)
-        
-        # Create recipient entries
+        db.flush()
+        forwarder = db.get(models.User, user_id)
+        mail_search.index_email(db, forwarded.id, user_id, forwarded.subject, mail_search.sender_label(forwarder),
+                                body, new_recipient_ids)
+
+        # Create recipient entries (one executemany INSERT, as in send_email)
+        if new_recipient_ids:
+            db.execute(insert(models.EmailRecipient), [
+                {"email_id": forwarded.id, "recipient_id": rid, "folder": "inbox",
+                 "email_timestamp": forwarded.timestamp}
+                for rid in new_recipient_ids
+            ])
+        deltas = _new_deltas()
         for rid in new_recipient_ids:
-            db.add(models.EmailRecipient(
-                email_id=forwarded.id,
-                recipient_id=rid,
-                folder="inbox"
-            ))
+            _add_entry(deltas, rid, "inbox", False)
+        deltas[user_id]["sent_total"] += 1
+        _apply_counter_deltas(db, deltas)
         db.commit()
         return len(new_recipient_ids)
-
-    @staticmethod
-    def check_rate_limit(db: Session, user_id: int, action: str = "send_mail", limit: int = 10):
-        """Check if user has exceeded rate limit (returns True if within limit)"""
-        from datetime import timedelta
-        one_hour_ago = datetime.utcnow() - timedelta(hours=1)
-        
-        count = db.query(models.RateLimitLog).filter(
-            models.RateLimitLog.user_id == user_id,
-            models.RateLimitLog.action == action,
-            models.RateLimitLog.timestamp >= one_hour_ago
-        ).count()
-        
-        return count < limit
-
-    @staticmethod
-    def log_rate_limit(db: Session, user_id: int, action: str = "send_mail"):
-        """Log an action for rate limiting"""
-        log = models.RateLimitLog(user_id=user_id, action=action)
-        db.add(log)
-        db.commit()
-
@@ -2,21 +2,29 @@ from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, W
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import List, Optional, Union
 from dotenv import load_dotenv
+import json
 import shutil
 import os
 
 # Load environment variables
 load_dotenv()
 
-from . import models, schemas, database, rri_engine, analytics, ai_service, admin_service
+from . import models, schemas, database, rri_engine, analytics, ai_service, admin_service, jobs, ai_report_cache, ai_warmup, mail_search, scheduled_tests
 from .seed_admin import seed_admin
+from .auth_cache import principal_cache, AuthenticatedUser
+from .mail_body_cache import body_cache
+from .notifications import ConnectionManager
+from .rate_limit import limiter
 
 # Create Database Tables
 models.Base.metadata.create_all(bind=database.engine)
@@ -26,6 +34,39 @@ app = FastAPI(title="KAUSHAL-SETU API", version="1.0.0")
 @app.on_event("startup")
 def startup_event():
     seed_admin()
+    # Jobs left QUEUED/RUNNING by a dead process can never finish; the
+    # heartbeat keeps this process's jobs alive and keeps reclaiming dead ones
+    jobs.mark_interrupted_jobs()
+    jobs.start_heartbeat()
+    # Databases created before the current_rri snapshot table have RRI history
+    # but no snapshot rows yet; populate them once so analytics stay correct.
+    db = database.SessionLocal()
+    try:
+        if db.query(models.CurrentRRI).first() is None and db.query(models.RetentionReadiness).first() is not None:
+            rri_engine.backfill_current_rri(db)
+        # Index built with another search key (e.g. the old mail key it was
+        # derived from was removed): re-index everything in the background
+        if mail_search.search_key_changed(db):
+            jobs.submit_job(db, "mail_search_rebuild", {"full": True})
+        # Mail sent before the search index existed: index it in the background
+        elif mail_search.needs_rebuild(db):
+            jobs.submit_job(db, "mail_search_rebuild", {})
+    finally:
+        db.close()
+
+@app.on_event("startup")
+async def start_background_schedules():
+    # Nightly AI briefing warm-up (only when AI_WARMUP_WINDOW is set)
+    ai_warmup.start_scheduler()
+    # Cross-worker WebSocket notifications (NOTIFICATION_BUS_URL)
+    await ws_manager.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    ai_warmup.stop_scheduler()
+    jobs.stop_heartbeat()
+    await ws_manager.stop()
+    await ai_service.ollama_client.aclose()
 
 # HTTPS Enforcement (enable in production via FORCE_HTTPS=true)
 if os.getenv("FORCE_HTTPS", "false").lower() == "true":
@@ -79,7 +120,7 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     db.refresh(new_user)
     return new_user
 
-@app.post("/api/auth/login", response_model=schemas.Token)
+@app.post("/api/auth/login", response_model=schemas.Token, dependencies=[Depends(limiter.dependency("login"))])
 def login_for_access_token(user_credentials: schemas.UserLogin, db: Session = Depends(get_db)):
     user = db.query(models.User).filter(models.User.username == user_credentials.username).first()
     if not user or not verify_password(user_credentials.password, user.password_hash):
@@ -115,8 +156,12 @@ def login_for_access_token(user_credentials: schemas.UserLogin, db: Session = De
         "user_id": user.user_id
     }
 
-# Dependency to get full current user object
+# Dependency to get the current user (detached snapshot, cached per token)
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return cached
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -128,7 +173,10 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     user = db.query(models.User).filter(models.User.username == username).first()
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
-    return user
+
+    principal = AuthenticatedUser.model_validate(user)
+    principal_cache.put(token, principal, payload.get("exp"))
+    return principal
 
 # User Management Endpoints (Admin Only)
 @app.post("/api/admin/users", response_model=schemas.UserResponse)
@@ -168,6 +216,7 @@ def delete_user_admin(user_id: int, db: Session = Depends(get_db)):
         
     db.delete(user)
     db.commit()
+    principal_cache.invalidate_user(user_id=user_id)
     return {"message": "User deleted"}
 
 @app.put("/api/admin/users/{user_id}/password")
@@ -179,6 +228,7 @@ def reset_user_password(user_id: int, data: schemas.UserPasswordReset, db: Sessi
     hashed_password = get_password_hash(data.new_password)
     user.password_hash = hashed_password
     db.commit()
+    principal_cache.invalidate_user(user_id=user_id)
     return {"message": "Password updated successfully"}
 
 @app.get("/api/users/search", response_model=List[schemas.UserResponse])
@@ -225,6 +275,7 @@ def change_password(data: schemas.PasswordChange, db: Session = Depends(get_db),
         
     user.password_hash = get_password_hash(data.new_password)
     db.commit()
+    principal_cache.invalidate_user(username=username)
     return {"message": "Password updated successfully"}
 
 @app.post("/api/agniveers/", response_model=schemas.AgniveerResponse)
@@ -306,6 +357,26 @@ def calculate_agniveer_rri(agniveer_id: int, db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/rri/calculate/company/{company}", response_model=schemas.RRIBulkResult)
+def calculate_company_rri(company: str, db: Session = Depends(get_db)):
+    """Recalculate RRI for every Agniveer in a company in one pass."""
+    ids = [a.id for a in db.query(models.Agniveer.id).filter(models.Agniveer.company == company).all()]
+    if not ids:
+        raise HTTPException(status_code=404, detail="No Agniveers found for company")
+    result = rri_engine.calculate_rri_bulk(db, ids)
+    ai_warmup.after_rri_recalculation(db, [company])
+    return result
+
+@app.post("/api/rri/calculate/batch/{batch_no}", response_model=schemas.RRIBulkResult)
+def calculate_batch_rri(batch_no: str, db: Session = Depends(get_db)):
+    """Recalculate RRI for every Agniveer in a batch in one pass."""
+    ids = [a.id for a in db.query(models.Agniveer.id).filter(models.Agniveer.batch_no == batch_no).all()]
+    if not ids:
+        raise HTTPException(status_code=404, detail="No Agniveers found for batch")
+    result = rri_engine.calculate_rri_bulk(db, ids)
+    ai_warmup.after_rri_recalculation(db)
+    return result
+
 @app.get("/api/rri/{agniveer_id}", response_model=schemas.RRIResponse)
 def get_latest_rri(agniveer_id: int, db: Session = Depends(get_db)):
     agniveer = db.query(models.Agniveer).filter(models.Agniveer.id == agniveer_id).first()
@@ -371,17 +442,27 @@ def get_retention_risk_list(unit_id: str, db: Session = Depends(get_db)):
 def get_pending_assessments(unit_id: str, db: Session = Depends(get_db)):
     return analytics.get_pending_assessments(db, unit_id)
 
+def _validate_trend_params(months: int, granularity: str):
+    if months < 1 or months > 120:
+        raise HTTPException(status_code=400, detail="months must be between 1 and 120")
+    if granularity not in analytics.TREND_GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(analytics.TREND_GRANULARITIES)}")
+
 @app.get("/api/analytics/company/{unit_id}/rri-trend")
-def get_rri_trend(unit_id: str, db: Session = Depends(get_db)):
-    return analytics.get_rri_trend(db, unit_id)
+def get_rri_trend(unit_id: str, months: int = 6, granularity: str = "month", db: Session = Depends(get_db)):
+    _validate_trend_params(months, granularity)
+    return analytics.get_rri_trend(db, unit_id, months, granularity)
 
 @app.get("/api/analytics/company/{unit_id}/technical-trend")
-def get_technical_trend(unit_id: str, db: Session = Depends(get_db)):
-    return analytics.get_technical_trend(db, unit_id)
+def get_technical_trend(unit_id: str, months: int = 6, granularity: str = "month", db: Session = Depends(get_db)):
+    _validate_trend_params(months, granularity)
+    return analytics.get_technical_trend(db, unit_id, months, granularity)
 
 @app.get("/api/analytics/company/{unit_id}/behavioral-trend")
-def get_behavioral_trend(unit_id: str, db: Session = Depends(get_db)):
-    return analytics.get_behavioral_trend(db, unit_id)
+def get_behavioral_trend(unit_id: str, quarters: int = 4, db: Session = Depends(get_db)):
+    if quarters < 1 or quarters > 40:
+        raise HTTPException(status_code=400, detail="quarters must be between 1 and 40")
+    return analytics.get_behavioral_trend(db, unit_id, quarters)
 
 @app.get("/api/analytics/company/{unit_id}/competency-insights")
 def get_competency_insights(unit_id: str, db: Session = Depends(get_db)):
@@ -399,14 +480,18 @@ def get_command_hub(unit_id: str, db: Session = Depends(get_db)):
 def get_action_center(unit_id: str, db: Session = Depends(get_db)):
     return analytics.get_action_center_items(db, unit_id)
 
+@app.get("/api/analytics/company/{unit_id}/dashboard")
+def get_company_dashboard(unit_id: str, db: Session = Depends(get_db)):
+    # All Company dashboard panels in one response (single analytics pass)
+    return analytics.get_company_dashboard(db, unit_id)
+
 from . import models, schemas, database, rri_engine, analytics, ai_service
 
 # ... (Existing code) ...
 
 # --- AI Endpoints ---
 
-@app.post("/api/ai/report/{agniveer_id}")
-def generate_ai_report(agniveer_id: int, db: Session = Depends(get_db)):
+def _ai_report_context(db: Session, agniveer_id: int):
     # 1. Fetch Agniveer
     agniveer = db.query(models.Agniveer).filter(models.Agniveer.id == agniveer_id).first()
     if not agniveer:
@@ -425,28 +510,113 @@ def generate_ai_report(agniveer_id: int, db: Session = Depends(get_db)):
         except:
              raise HTTPException(status_code=400, detail="Data insufficient for AI analysis")
 
-    # 3. Fetch component details for richer context
-    # Technical breakdown is not stored in RRI table directly as JSON (it's in the TechnicalAssessment)
-    # But RRI result object has it. We'll just use the RRI aggregate scores for now to keep it fast.
-    # To get breakdown, we re-fetch the TechnicalAssessment associated?
-    # Actually, let's just use what's in the RRI DB record + some implied data.
-    
-    # Construct Context Dict
-    context = {
-        "rri_score": rri.rri_score,
-        "retention_band": rri.retention_band.value,
-        "technical_component": rri.technical_component,
-        "technical_breakdown": f"Completeness: {rri.technical_completeness*100}%", # Simplified for now
-        "behavioral_component": rri.behavioral_component,
-        "behavioral_status": f"Completeness: {rri.behavioral_completeness*100}%",
-        "behavioral_trend": "N/A", # Not stored in DB model yet, need to re-calc or add col
-        "achievement_component": rri.achievement_component,
-        "achievement_count": "N/A"
-    }
+    # 3. Context for the prompt (shared with the briefing warm-up so cache keys match)
+    context = ai_service.build_rri_context(rri)
+    return agniveer.name, context
+
+@app.post("/api/ai/report/{agniveer_id}", dependencies=[Depends(limiter.dependency("ai_report"))])
+async def generate_ai_report(agniveer_id: int, refresh: bool = False, db: Session = Depends(get_db)):
+    # DB work runs in the threadpool; the model call is awaited without holding a worker
+    name, context = await run_in_threadpool(_ai_report_context, db, agniveer_id)
+    payload = ai_service.build_payload(ai_service.build_rri_prompt(name, context))
+    key = ai_report_cache.cache_key(payload)
+
+    # Serve a previous briefing for identical inputs unless a refresh is forced
+    if refresh:
+        ai_report_cache.record_refresh()
+    else:
+        cached = await run_in_threadpool(ai_report_cache.get_cached_report, db, key)
+        if cached:
+            return {"report": cached.report, "cached": True, "generated_at": cached.created_at}
     
     # 4. Generate
-    report = ai_service.generate_rri_report(agniveer.name, context)
-    return {"report": report}
+    try:
+        report, succeeded = await ai_service.generate_from_payload(payload)
+    except ai_service.AIQueueFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail="AI service is busy, please retry shortly",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    # Only real briefings are cached, never error messages
+    if succeeded:
+        await run_in_threadpool(ai_report_cache.store_report, db, key, agniveer_id, payload["model"], report)
+    return {"report": report, "cached": False, "generated_at": datetime.utcnow()}
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+@app.get("/api/ai/report/{agniveer_id}/stream", dependencies=[Depends(limiter.dependency("ai_report"))])
+async def stream_ai_report(agniveer_id: int, refresh: bool = False, db: Session = Depends(get_db)):
+    """
+    Server-Sent Events variant of the AI report: 'token' events carry text as the
+    model produces it, then a single 'done' (or 'error') event. Disconnecting the
+    client cancels the generator, which closes the upstream Ollama request.
+    """
+    name, context = await run_in_threadpool(_ai_report_context, db, agniveer_id)
+    payload = ai_service.build_payload(ai_service.build_rri_prompt(name, context), stream=True)
+    key = ai_report_cache.cache_key(payload)
+
+    cached = None
+    if refresh:
+        ai_report_cache.record_refresh()
+    else:
+        cached = await run_in_threadpool(ai_report_cache.get_cached_report, db, key)
+
+    if cached is None:
+        # Reject before the stream starts so the client sees a real 429
+        try:
+            ai_service.ollama_client.ensure_capacity()
+        except ai_service.AIQueueFull as e:
+            raise HTTPException(
+                status_code=429,
+                detail="AI service is busy, please retry shortly",
+                headers={"Retry-After": str(e.retry_after)}
+            )
+
+    async def events():
+        if cached is not None:
+            yield _sse("token", {"text": cached.report})
+            yield _sse("done", {"cached": True, "generated_at": cached.created_at})
+            return
+
+        parts = []
+        try:
+            async for token in ai_service.ollama_client.stream(payload):
+                parts.append(token)
+                yield _sse("token", {"text": token})
+        except ai_service.AIQueueFull as e:
+            yield _sse("error", {"detail": "AI service is busy, please retry shortly", "retry_after": e.retry_after})
+            return
+        except Exception as e:
+            yield _sse("error", {"detail": ai_service.describe_error(e)})
+            return
+
+        # Complete briefings are cached for the non-streaming route as well;
+        # a fresh session is used because the request's one may already be closed
+        def store():
+            store_db = database.SessionLocal()
+            try:
+                ai_report_cache.store_report(store_db, key, agniveer_id, payload["model"], "".join(parts))
+            finally:
+                store_db.close()
+        if parts:
+            await run_in_threadpool(store)
+        yield _sse("done", {"cached": False, "generated_at": datetime.utcnow()})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/ai/stats")
+def get_ai_stats(db: Session = Depends(get_db)):
+    return {
+        "generation": ai_service.ollama_client.stats(),
+        "report_cache": ai_report_cache.stats(db)
+    }
 
 
 # --- Leave Management Endpoints ---
@@ -583,12 +753,54 @@ def get_current_user_id(token: str = Depends(oauth2_scheme)):
     except:
         return 1
 
-@app.post("/api/admin/bulk-upload", response_model=schemas.BulkUploadResult)
+@app.post("/api/admin/bulk-upload", response_model=schemas.BulkUploadResult, dependencies=[Depends(limiter.dependency("bulk_upload"))])
 async def bulk_upload_agniveers(file: UploadFile = File(...), db: Session = Depends(get_db)):
     content = await file.read()
     decoded_content = content.decode('utf-8')
     # Assuming Admin ID 1 for now or we update dependency to get current user
-    return admin_service.process_bulk_upload_agniveers(db, decoded_content, admin_id=1)
+    # Run the (CPU + DB heavy) import off the event loop
+    return await run_in_threadpool(admin_service.process_bulk_upload_agniveers, db, decoded_content, admin_id=1)
+
+# -----------------------------
+# BACKGROUND JOBS
+# -----------------------------
+
+def _get_job_for_user(job_id: int, db: Session, current_user):
+    job = db.query(models.Job).filter(models.Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if current_user.role != models.UserRole.ADMIN and job.created_by != current_user.user_id:
+        raise HTTPException(status_code=403, detail="Not allowed to view this job")
+    return job
+
+@app.post("/api/jobs", response_model=schemas.JobResponse, status_code=202)
+def submit_job(job: schemas.JobCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    # Generic submission for jobs with a JSON payload (e.g. rri_recalculate)
+    if job.job_type not in jobs.JOB_HANDLERS or job.job_type == "bulk_upload_agniveers":
+        raise HTTPException(status_code=400, detail=f"Unsupported job type: {job.job_type}")
+    if not jobs.can_submit(job.job_type, current_user.role):
+        raise HTTPException(status_code=403, detail="Not allowed to submit this job type")
+    return jobs.submit_job(db, job.job_type, job.payload, created_by=current_user.user_id)
+
+@app.post("/api/jobs/bulk-upload", response_model=schemas.JobResponse, status_code=202,
+          dependencies=[Depends(limiter.dependency("bulk_upload", get_current_user))])
+async def submit_bulk_upload_job(file: UploadFile = File(...), db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    content = await file.read()
+    payload = {"csv": content.decode('utf-8'), "admin_id": current_user.user_id}
+    return jobs.submit_job(db, "bulk_upload_agniveers", payload, created_by=current_user.user_id)
+
+@app.get("/api/jobs/{job_id}", response_model=schemas.JobResponse)
+def get_job_status(job_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    return _get_job_for_user(job_id, db, current_user)
+
+@app.get("/api/jobs/{job_id}/result")
+def get_job_result(job_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    job = _get_job_for_user(job_id, db, current_user)
+    if job.status == models.JobStatus.FAILED or job.status == models.JobStatus.INTERRUPTED:
+        raise HTTPException(status_code=409, detail=f"Job {job.status.value.lower()}: {job.error}")
+    if job.status != models.JobStatus.COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Job not finished ({job.progress}% complete)")
+    return jobs.get_job_result(job)
 
 @app.post("/api/policies", response_model=schemas.PolicyResponse)
 async def upload_policy(title: str, file: UploadFile = File(...), db: Session = Depends(get_db)):
@@ -610,6 +822,18 @@ def get_policies(db: Session = Depends(get_db)):
 def get_audit_logs(limit: int = 100, db: Session = Depends(get_db)):
     return db.query(models.AuditLog).order_by(models.AuditLog.timestamp.desc()).limit(limit).all()
 
+@app.get("/api/admin/auth-cache/stats")
+def get_auth_cache_stats(current_user: models.User = Depends(get_current_user)):
+    if current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return principal_cache.stats()
+
+@app.get("/api/admin/mail-body-cache/stats")
+def get_mail_body_cache_stats(current_user: models.User = Depends(get_current_user)):
+    if current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return body_cache.stats()
+
 @app.get("/api/admin/stats")
 def get_admin_dashboard_stats(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
     # Base Filters
@@ -728,42 +952,64 @@ def delete_agniveer(agniveer_id: int, db: Session = Depends(get_db)):
          
     # Cascade delete User account
     db_user = db.query(models.User).filter(models.User.agniveer_id == agniveer_id).first()
+    deleted_user_id = db_user.user_id if db_user else None
     if db_user:
         db.delete(db_user)
         
     db.delete(db_agniveer)
     db.commit()
+    if deleted_user_id is not None:
+        principal_cache.invalidate_user(user_id=deleted_user_id)
     return {"message": "Agniveer and associated User account deleted successfully"}
 
 
 # -----------------------------
 # MAIL & BROADCASTING ROUTES
 # -----------------------------
-from .mail_service import MailService
+from .mail_service import MailService, next_cursor
 
-@app.post("/api/mail/send", response_model=int)
+# Rate Limiting: Agniveers can only send 10 messages per hour (rate_limit.DEFAULT_LIMITS)
+@app.post("/api/mail/send", response_model=int,
+          dependencies=[Depends(limiter.dependency("send_mail", get_current_user, count_success_only=True))])
 async def send_email(email: schemas.EmailCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    # Rate Limiting: Agniveers can only send 10 messages per hour
-    if current_user.role == models.UserRole.AGNIVEER:
-        if not MailService.check_rate_limit(db, current_user.user_id, "send_mail", 10):
-            raise HTTPException(status_code=429, detail="Rate limit exceeded. You can only send 10 messages per hour.")
-        
     # Now returns list of recipient IDs
     recipient_ids = MailService.send_email(db, email, current_user.user_id)
     
-    # Send Real-Time Notifications
-    for rid in recipient_ids:
-        await ws_manager.notify_user(rid, {"type": "new_mail"})
-    
-    # Log this send action for rate limiting
-    if current_user.role == models.UserRole.AGNIVEER:
-        MailService.log_rate_limit(db, current_user.user_id, "send_mail")
-        
+    # Send Real-Time Notifications (queued per connection, not awaited)
+    ws_manager.publish(recipient_ids, {"type": "new_mail"})
     return len(recipient_ids)
 
-@app.get("/api/mail/inbox", response_model=List[schemas.InboxItem])
-def get_inbox(skip: int = 0, limit: int = 20, search: str = None, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    return MailService.get_inbox(db, current_user.user_id, skip, limit, search)
+def _mail_folder(fetch, limit: int, cursor: Optional[str], db: Session = None, preview: bool = False):
+    """
+    Folder listing in either pagination mode.
+    Without ?cursor the response is the plain item list (skip/limit, as before).
+    With ?cursor (empty for the first page) it is a MailPage whose next_cursor
+    fetches the following page. ?preview=true adds the start of each body.
+    """
+    try:
+        items = fetch(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if preview:
+        MailService.attach_previews(db, items)
+    if cursor is None:
+        return items
+    return schemas.MailPage(items=items, next_cursor=next_cursor(items, limit))
+
+@app.get("/api/mail/inbox", response_model=Union[List[schemas.InboxItem], schemas.MailPage])
+def get_inbox(skip: int = 0, limit: int = 20, search: str = None, cursor: Optional[str] = None, preview: bool = False, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    return _mail_folder(lambda c: MailService.get_inbox(db, current_user.user_id, skip, limit, search, c), limit, cursor, db, preview)
+
+@app.get("/api/mail/search", response_model=List[schemas.MailSearchHit])
+def search_mail(q: str, folder: str = "inbox", include_body: bool = True, skip: int = 0, limit: int = 20,
+                db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    """
+    Ranked full-text search of the caller's own mail. Every word must match, as
+    a prefix of a subject or sender word, or a word in the body.
+    """
+    if folder not in ("inbox", "trash", "sent"):
+        raise HTTPException(status_code=400, detail="folder must be inbox, trash or sent")
+    return mail_search.search(db, current_user.user_id, q, folder, include_body, skip, min(limit, 100))
 
 @app.get("/api/mail/unread-count", response_model=int)
 def get_unread_count(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
@@ -773,9 +1019,9 @@ def get_unread_count(db: Session = Depends(get_db), current_user: models.User =
 def get_mailbox_stats(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
     return MailService.get_mailbox_stats(db, current_user.user_id)
 
-@app.get("/api/mail/sent", response_model=List[schemas.InboxItem])
-def get_sent(skip: int = 0, limit: int = 20, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    return MailService.get_sent(db, current_user.user_id, skip, limit)
+@app.get("/api/mail/sent", response_model=Union[List[schemas.InboxItem], schemas.MailPage])
+def get_sent(skip: int = 0, limit: int = 20, cursor: Optional[str] = None, preview: bool = False, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    return _mail_folder(lambda c: MailService.get_sent(db, current_user.user_id, skip, limit, c), limit, cursor, db, preview)
 
 @app.get("/api/mail/sent/{id}", response_model=schemas.EmailDetail)
 def get_sent_message(id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
@@ -792,9 +1038,9 @@ def bulk_delete_emails(payload: dict, db: Session = Depends(get_db), current_use
     MailService.bulk_delete_emails(db, ids, current_user.user_id, folder)
     return {"message": "Deleted"}
 
-@app.get("/api/mail/trash", response_model=List[schemas.InboxItem])
-def get_trash(skip: int = 0, limit: int = 20, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    return MailService.get_trash(db, current_user.user_id, skip, limit)
+@app.get("/api/mail/trash", response_model=Union[List[schemas.InboxItem], schemas.MailPage])
+def get_trash(skip: int = 0, limit: int = 20, cursor: Optional[str] = None, preview: bool = False, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    return _mail_folder(lambda c: MailService.get_trash(db, current_user.user_id, skip, limit, c), limit, cursor, db, preview)
 
 @app.post("/api/mail/restore/{id}")
 def restore_email(id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
@@ -885,52 +1131,27 @@ def delete_email(id: int, db: Session = Depends(get_db), current_user: models.Us
 # WEBSOCKET: REAL-TIME MAIL NOTIFICATIONS
 # ======================
 
-class ConnectionManager:
-    """Manages WebSocket connections for real-time notifications"""
-    def __init__(self):
-        # user_id -> List[WebSocket] to support multiple tabs/components
-        self.active_connections: dict[int, list[WebSocket]] = {} 
-    
-    async def connect(self, user_id: int, websocket: WebSocket):
-        await websocket.accept()
-        if user_id not in self.active_connections:
-            self.active_connections[user_id] = []
-        self.active_connections[user_id].append(websocket)
-    
-    def disconnect(self, user_id: int, websocket: WebSocket):
-        if user_id in self.active_connections:
-            if websocket in self.active_connections[user_id]:
-                self.active_connections[user_id].remove(websocket)
-            # Clean up empty lists
-            if not self.active_connections[user_id]:
-                del self.active_connections[user_id]
-    
-    async def notify_user(self, user_id: int, message: dict):
-        """Send notification to all active connections for a specific user"""
-        if user_id in self.active_connections:
-            # Iterate over a copy to allow safe removal during iteration if needed
-            for connection in self.active_connections[user_id][:]:
-                try:
-                    await connection.send_json(message)
-                except Exception:
-                    # If sending fails, assume stale connection and remove
-                    self.disconnect(user_id, connection)
-
-# Global connection manager instance
+# Global connection manager instance (see notifications.py)
 ws_manager = ConnectionManager()
 
 @app.websocket("/ws/mail/{user_id}")
 async def websocket_mail(websocket: WebSocket, user_id: int):
     """WebSocket endpoint for real-time mail notifications"""
-    await ws_manager.connect(user_id, websocket)
+    connection = await ws_manager.connect(user_id, websocket)
     try:
         while True:
             # Keep connection alive; client can send pings
             data = await websocket.receive_text()
-            # Echo back for heartbeat
-            await websocket.send_text(f"pong:{data}")
+            # Echo back for heartbeat (through the queue: one writer per socket)
+            ws_manager.send(connection, f"pong:{data}")
     except WebSocketDisconnect:
-        ws_manager.disconnect(user_id, websocket)
+        pass
+    finally:
+        ws_manager.disconnect(connection)
+
+@app.get("/api/ws/stats")
+def get_ws_stats():
+    return ws_manager.stats()
 
 # ============================================================
 # TRAINING OFFICER ENDPOINTS
@@ -976,41 +1197,7 @@ def get_scheduled_tests(
     db: Session = Depends(get_db)
 ):
     """Get list of scheduled tests with optional filters."""
-    query = db.query(models.ScheduledTest)
-    
-    if target_type:
-        query = query.filter(models.ScheduledTest.target_type == target_type)
-    if target_value:
-        query = query.filter(models.ScheduledTest.target_value == target_value)
-    if status:
-        query = query.filter(models.ScheduledTest.status == status)
-    
-    tests = query.order_by(models.ScheduledTest.scheduled_date.desc()).all()
-    
-    # Add results count
-    result = []
-    for t in tests:
-        test_dict = {
-            "id": t.id,
-            "name": t.name,
-            "test_type": t.test_type,
-            "description": t.description,
-            "scheduled_date": t.scheduled_date,
-            "end_time": t.end_time,
-            "location": t.location,
-            "target_type": t.target_type,
-            "target_value": t.target_value,
-            "instructor": t.instructor,
-            "max_marks": t.max_marks,
-            "passing_marks": t.passing_marks,
-            "created_by": t.created_by,
-            "created_at": t.created_at,
-            "status": t.status,
-            "results_count": len(t.results) if t.results else 0
-        }
-        result.append(test_dict)
-    
-    return result
+    return scheduled_tests.list_tests(db, target_type, target_value, status)
 
 @app.get("/api/tests/{test_id}")
 def get_scheduled_test(test_id: int, db: Session = Depends(get_db)):
@@ -1019,24 +1206,7 @@ def get_scheduled_test(test_id: int, db: Session = Depends(get_db)):
     if not test:
         raise HTTPException(status_code=404, detail="Test not found")
     
-    return {
-        "id": test.id,
-        "name": test.name,
-        "test_type": test.test_type,
-        "description": test.description,
-        "scheduled_date": test.scheduled_date,
-        "end_time": test.end_time,
-        "location": test.location,
-        "target_type": test.target_type,
-        "target_value": test.target_value,
-        "instructor": test.instructor,
-        "max_marks": test.max_marks,
-        "passing_marks": test.passing_marks,
-        "created_by": test.created_by,
-        "created_at": test.created_at,
-        "status": test.status,
-        "results_count": len(test.results) if test.results else 0
-    }
+    return scheduled_tests.scheduled_test_response(test, scheduled_tests.count_results(db, test_id))
 
 @app.put("/api/tests/{test_id}")
 def update_scheduled_test(
@@ -1082,61 +1252,45 @@ def add_test_result(
     if not test:
         raise HTTPException(status_code=404, detail="Test not found")
     
-    # Check if result already exists for this agniveer
-    existing = db.query(models.TestResult).filter(
-        models.TestResult.test_id == test_id,
-        models.TestResult.agniveer_id == result.agniveer_id
-    ).first()
-    
-    if existing:
-        # Update existing
-        existing.score = result.score
-        existing.remarks = result.remarks
-        existing.is_absent = result.is_absent
-        existing.recorded_by = current_user.user_id
-        db.commit()
-        db.refresh(existing)
-        
-        agniveer = db.query(models.Agniveer).filter(models.Agniveer.id == existing.agniveer_id).first()
-        return {
-            "id": existing.id,
-            "test_id": existing.test_id,
-            "agniveer_id": existing.agniveer_id,
-            "score": existing.score,
-            "remarks": existing.remarks,
-            "is_absent": existing.is_absent,
-            "recorded_at": existing.recorded_at,
-            "recorded_by": existing.recorded_by,
-            "agniveer_name": agniveer.name if agniveer else None,
-            "agniveer_service_id": agniveer.service_id if agniveer else None
-        }
-    
-    # Create new result
-    db_result = models.TestResult(
-        test_id=test_id,
-        agniveer_id=result.agniveer_id,
-        score=result.score,
-        remarks=result.remarks,
-        is_absent=result.is_absent,
-        recorded_by=current_user.user_id
-    )
-    db.add(db_result)
-    db.commit()
-    db.refresh(db_result)
-    
-    agniveer = db.query(models.Agniveer).filter(models.Agniveer.id == db_result.agniveer_id).first()
-    return {
-        "id": db_result.id,
-        "test_id": db_result.test_id,
-        "agniveer_id": db_result.agniveer_id,
-        "score": db_result.score,
-        "remarks": db_result.remarks,
-        "is_absent": db_result.is_absent,
-        "recorded_at": db_result.recorded_at,
-        "recorded_by": db_result.recorded_by,
-        "agniveer_name": agniveer.name if agniveer else None,
-        "agniveer_service_id": agniveer.service_id if agniveer else None
-    }
+    return scheduled_tests.save_result(db, test_id, result, current_user.user_id)
+
+@app.post("/api/tests/{test_id}/results/bulk", response_model=schemas.BulkTestResultResponse)
+async def add_test_results_bulk(
+    test_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Save a whole result sheet in one transaction. Accepts JSON
+    ({"results": [{"service_id": ..., "score": ..., "remarks": ..., "is_absent": ...}]}
+    or a bare list), a CSV body (Content-Type: text/csv) or a CSV file upload
+    (multipart field "file"). Rows are checked against the test's roster and
+    reported individually; valid rows are created or updated.
+    """
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith("multipart/form-data"):
+            upload = (await request.form()).get("file")
+            if upload is None or isinstance(upload, str):
+                raise ValueError("Missing file")
+            rows = scheduled_tests.parse_result_csv((await upload.read()).decode("utf-8-sig"))
+        elif content_type.startswith("text/"):
+            rows = scheduled_tests.parse_result_csv((await request.body()).decode("utf-8-sig"))
+        else:
+            payload = await request.json()
+            results = payload.get("results") if isinstance(payload, dict) else payload
+            if not isinstance(results, list):
+                raise ValueError("Expected a list of results")
+            rows = list(enumerate(results, start=1))
+        # All database work (test lookup included) runs off the event loop
+        result = await run_in_threadpool(scheduled_tests.save_results_bulk, db, test_id, rows, current_user.user_id)
+    except ValueError as e:
+        # Includes malformed JSON and non-UTF-8 uploads
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Test not found")
+    return result
 
 @app.get("/api/tests/{test_id}/results", response_model=List[schemas.TestResultResponse])
 def get_test_results(test_id: int, db: Session = Depends(get_db)):
@@ -1145,25 +1299,7 @@ def get_test_results(test_id: int, db: Session = Depends(get_db)):
     if not test:
         raise HTTPException(status_code=404, detail="Test not found")
     
-    results = db.query(models.TestResult).filter(models.TestResult.test_id == test_id).all()
-    
-    response = []
-    for r in results:
-        agniveer = db.query(models.Agniveer).filter(models.Agniveer.id == r.agniveer_id).first()
-        response.append({
-            "id": r.id,
-            "test_id": r.test_id,
-            "agniveer_id": r.agniveer_id,
-            "score": r.score,
-            "remarks": r.remarks,
-            "is_absent": r.is_absent,
-            "recorded_at": r.recorded_at,
-            "recorded_by": r.recorded_by,
-            "agniveer_name": agniveer.name if agniveer else None,
-            "agniveer_service_id": agniveer.service_id if agniveer else None
-        })
-    
-    return response
+    return scheduled_tests.list_results(db, test_id)
 
 @app.get("/api/tests/{test_id}/agniveers")
 def get_test_agniveers(test_id: int, db: Session = Depends(get_db)):
@@ -1172,15 +1308,7 @@ def get_test_agniveers(test_id: int, db: Session = Depends(get_db)):
     if not test:
         raise HTTPException(status_code=404, detail="Test not found")
     
-    query = db.query(models.Agniveer)
-    
-    if test.target_type == "BATCH":
-        query = query.filter(models.Agniveer.batch_no == test.target_value)
-    elif test.target_type == "COMPANY":
-        query = query.filter(models.Agniveer.company == test.target_value)
-    # "ALL" - no filter needed
-    
-    agniveers = query.all()
+    agniveers = scheduled_tests.eligible_agniveers(db, test).all()
     
     # Get existing results for this test
     existing_results = {r.agniveer_id: r for r in test.results}
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime, Enum as SQLEnum, Text
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime, Enum as SQLEnum, Text, Index
 from sqlalchemy.orm import relationship
 from .database import Base
 import enum
@@ -34,7 +34,7 @@ class User(Base):
     password_hash = Column(String, nullable=False)
     role = Column(SQLEnum(UserRole), nullable=False)
 
-    agniveer_id = Column(Integer, ForeignKey("agniveers.id"), nullable=True)
+    agniveer_id = Column(Integer, ForeignKey("agniveers.id"), nullable=True, index=True)
     
     # Officer/Commander Fields
     full_name = Column(String, nullable=True)
@@ -42,6 +42,7 @@ class User(Base):
     assigned_company = Column(String, nullable=True) # For COY_CDR access control
 
     agniveer = relationship("Agniveer", back_populates="user_account")
+    mailbox_counter = relationship("MailboxCounter", uselist=False, cascade="all, delete-orphan")
 
 class Agniveer(Base):
     __tablename__ = "agniveers"
@@ -53,7 +54,7 @@ class Agniveer(Base):
     phone = Column(String, nullable=True)
     
     # Detailed Bio-Data
-    batch_no = Column(String) # e.g. "Jan 2026"
+    batch_no = Column(String, index=True) # e.g. "Jan 2026"
     photo_url = Column(String, nullable=True)
 
     dob = Column(DateTime, nullable=True)
@@ -75,7 +76,7 @@ class Agniveer(Base):
 
     rank = Column(String)
     unit = Column(String)
-    company = Column(String)
+    company = Column(String, index=True)
     joining_date = Column(DateTime)
     
     user_account = relationship("User", back_populates="agniveer", uselist=False)
@@ -87,9 +88,13 @@ class Agniveer(Base):
     grievances = relationship("Grievance", back_populates="agniveer")
     medical_records = relationship("MedicalRecord", back_populates="agniveer")
     rri_calculations = relationship("RetentionReadiness", back_populates="agniveer")
+    current_rri = relationship("CurrentRRI", back_populates="agniveer", uselist=False, cascade="all, delete-orphan")
 
 class TechnicalAssessment(Base):
     __tablename__ = "technical_assessments"
+    __table_args__ = (
+        Index("ix_technical_assessments_agniveer_date", "agniveer_id", "assessment_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     agniveer_id = Column(Integer, ForeignKey("agniveers.id"), nullable=False)
@@ -104,6 +109,9 @@ class TechnicalAssessment(Base):
 
 class BehavioralAssessment(Base):
     __tablename__ = "behavioral_assessments"
+    __table_args__ = (
+        Index("ix_behavioral_assessments_agniveer_quarter", "agniveer_id", "quarter"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     agniveer_id = Column(Integer, ForeignKey("agniveers.id"), nullable=False)
@@ -136,6 +144,9 @@ class Achievement(Base):
 
 class RetentionReadiness(Base):
     __tablename__ = "retention_readiness"
+    __table_args__ = (
+        Index("ix_retention_readiness_agniveer_date", "agniveer_id", "calculation_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     agniveer_id = Column(Integer, ForeignKey("agniveers.id"), nullable=False)
@@ -156,6 +167,24 @@ class RetentionReadiness(Base):
     
     agniveer = relationship("Agniveer", back_populates="rri_calculations")
 
+class CurrentRRI(Base):
+    """Latest RetentionReadiness snapshot per Agniveer (one row each), kept in step by rri_engine"""
+    __tablename__ = "current_rri"
+
+    agniveer_id = Column(Integer, ForeignKey("agniveers.id"), primary_key=True)
+    rri_record_id = Column(Integer, ForeignKey("retention_readiness.id"), nullable=True)
+    calculation_date = Column(DateTime, nullable=False)
+
+    rri_score = Column(Float, nullable=False)
+    retention_band = Column(SQLEnum(RRIBand), nullable=False)
+
+    technical_component = Column(Float)
+    behavioral_component = Column(Float)
+    achievement_component = Column(Float)
+    overall_data_quality = Column(Float)
+
+    agniveer = relationship("Agniveer", back_populates="current_rri")
+
 
 
 class Policy(Base):
@@ -178,6 +207,10 @@ class AuditLog(Base):
     ip_address = Column(String, nullable=True)
 class InternalEmail(Base):
     __tablename__ = "internal_emails"
+    __table_args__ = (
+        # Sent folder keyset pagination: newest first on (timestamp, id)
+        Index("ix_internal_emails_sender_page", "sender_id", "is_deleted_by_sender", "timestamp", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     sender_id = Column(Integer, ForeignKey("users_auth.user_id"), nullable=False)
@@ -187,12 +220,32 @@ class InternalEmail(Base):
     priority = Column(String, default="Normal") # Normal, High, Urgent
     is_deleted_by_sender = Column(Boolean, default=False)
     is_encrypted = Column(Boolean, default=False)
+    # Denormalized at send time so the Sent folder never reads email_recipients
+    recipient_count = Column(Integer)
+    recipient_summary = Column(String) # e.g. "Maj Sharma +3 others"
     
     sender = relationship("User", foreign_keys=[sender_id])
     recipients = relationship("EmailRecipient", back_populates="email_content")
 
+class MailboxCounter(Base):
+    """Per-user mailbox totals kept in step by MailService, so polling is a PK read"""
+    __tablename__ = "mailbox_counters"
+
+    user_id = Column(Integer, ForeignKey("users_auth.user_id", ondelete="CASCADE"), primary_key=True)
+    inbox_unread = Column(Integer, nullable=False, default=0)
+    inbox_total = Column(Integer, nullable=False, default=0)
+    trash_total = Column(Integer, nullable=False, default=0)
+    sent_total = Column(Integer, nullable=False, default=0)
+
 class EmailRecipient(Base):
     __tablename__ = "email_recipients"
+    __table_args__ = (
+        Index("ix_email_recipients_recipient_folder_read", "recipient_id", "folder", "is_read"),
+        # Inbox/trash keyset pagination: newest first on (email_timestamp, email_id)
+        Index("ix_email_recipients_folder_page", "recipient_id", "folder", "email_timestamp", "email_id"),
+        # Search hits (email ids) narrowed to one recipient's rows
+        Index("ix_email_recipients_email_recipient", "email_id", "recipient_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     email_id = Column(Integer, ForeignKey("internal_emails.id"), nullable=False)
@@ -202,6 +255,8 @@ class EmailRecipient(Base):
     read_at = Column(DateTime, nullable=True)
     folder = Column(String, default="inbox") # inbox, trash, archived
     is_starred = Column(Boolean, default=False)
+    # Copy of internal_emails.timestamp so folder listings page on a single index
+    email_timestamp = Column(DateTime)
     
     email_content = relationship("InternalEmail", back_populates="recipients")
     recipient = relationship("User", foreign_keys=[recipient_id])
@@ -221,15 +276,13 @@ class EmailDraft(Base):
     
     user = relationship("User", foreign_keys=[user_id])
 
-class RateLimitLog(Base):
-    __tablename__ = "rate_limit_logs"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users_auth.user_id"), nullable=False)
-    action = Column(String, nullable=False) # e.g., "send_mail"
-    timestamp = Column(DateTime, default=datetime.utcnow)
-    
-    user = relationship("User", foreign_keys=[user_id])
+class RateLimitWindow(Base):
+    """Per-key request count in one fixed window (RATE_LIMIT_STORE=database)"""
+    __tablename__ = "rate_limit_windows"
+
+    key = Column(String, primary_key=True) # e.g. "send_mail:user:42"
+    window_start = Column(Integer, primary_key=True) # epoch seconds, multiple of the window length
+    count = Column(Integer, nullable=False, default=0)
 
 class LeaveStatus(str, enum.Enum):
     PENDING = "PENDING"
@@ -334,6 +387,11 @@ class ScheduledTest(Base):
 
 class TestResult(Base):
     __tablename__ = "test_results"
+    __table_args__ = (
+        # One result per Agniveer per test (conflict target of the bulk upsert
+        # in scheduled_tests.save_results_bulk; lookup index for save_result)
+        Index("uq_test_results_test_agniveer", "test_id", "agniveer_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     test_id = Column(Integer, ForeignKey("scheduled_tests.id"), nullable=False)
@@ -389,3 +447,62 @@ class CounsellingSession(Base):
     # Relationships
     agniveer = relationship("Agniveer", backref="counselling_sessions")
     officer = relationship("User")
+
+
+# ============================================================
+# BACKGROUND JOBS
+# ============================================================
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+    INTERRUPTED = "INTERRUPTED" # Server stopped while the job was queued/running
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_status", "status"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String, nullable=False) # e.g. "bulk_upload_agniveers", "rri_recalculate"
+    status = Column(SQLEnum(JobStatus), default=JobStatus.QUEUED, nullable=False)
+    
+    # Progress reported by the running handler
+    progress = Column(Integer, default=0) # Percent complete (0-100)
+    message = Column(String, nullable=True)
+    
+    payload = Column(Text, nullable=True) # JSON input
+    result = Column(Text, nullable=True) # JSON output
+    error = Column(Text, nullable=True)
+    
+    created_by = Column(Integer, ForeignKey("users_auth.user_id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    # Worker process running the job (jobs.WORKER_ID), refreshed every
+    # JOB_HEARTBEAT_SECONDS while queued/running; a stale heartbeat means it died
+    owner = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+
+
+# ============================================================
+# AI REPORT CACHE
+# ============================================================
+
+class AIReportCache(Base):
+    """Generated AI briefings keyed by a hash of the full generation request (prompt, model, options)"""
+    __tablename__ = "ai_report_cache"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), unique=True, index=True, nullable=False) # sha256 hex
+    agniveer_id = Column(Integer, ForeignKey("agniveers.id"), nullable=True, index=True)
+    model_name = Column(String, nullable=False)
+    report = Column(Text, nullable=False)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, index=True) # LRU eviction order
+    hit_count = Column(Integer, default=0)
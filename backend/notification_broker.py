@@ -0,0 +1,63 @@
+"""
+Relay broker for the notification bus (NOTIFICATION_BUS_URL=tcp://host:port).
+
+Each API worker keeps one TCP connection open and writes newline-delimited
+JSON events; the broker copies every line to all other connected workers.
+It keeps no state, so restarting it only drops events in flight.
+
+Usage:
+    python -m backend.notification_broker [--host 127.0.0.1] [--port 8765]
+"""
+import argparse
+import asyncio
+from typing import Set
+
+# Per-subscriber write buffer limit; a worker that stops reading is disconnected
+MAX_BUFFERED_BYTES = 4 * 1024 * 1024
+
+
+class NotificationBroker:
+    def __init__(self):
+        self.subscribers: Set[asyncio.StreamWriter] = set()
+        self.relayed = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.subscribers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                for subscriber in list(self.subscribers):
+                    if subscriber is writer:
+                        continue
+                    if subscriber.transport.get_write_buffer_size() > MAX_BUFFERED_BYTES:
+                        self.subscribers.discard(subscriber)
+                        subscriber.close()
+                        continue
+                    subscriber.write(line)
+                self.relayed += 1
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.subscribers.discard(writer)
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle, host, port)
+
+
+async def main(host: str, port: int):
+    broker = NotificationBroker()
+    server = await broker.serve(host, port)
+    print(f"Notification broker listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Notification bus relay broker")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    asyncio.run(main(args.host, args.port))
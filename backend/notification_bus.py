@@ -0,0 +1,218 @@
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Notification bus
+# WebSocket connections live in one worker process, but a mail can be sent
+# through any worker. ConnectionManager delivers to its own sockets directly and
+# publishes every event on a bus so the other workers deliver to theirs.
+#   ""                        in-process only (single worker, default)
+#   tcp://host:port           relay broker (python -m backend.notification_broker)
+#   postgresql://...          PostgreSQL LISTEN/NOTIFY on the application database
+NOTIFICATION_BUS_URL = os.getenv("NOTIFICATION_BUS_URL", "")
+NOTIFICATION_CHANNEL = os.getenv("NOTIFICATION_CHANNEL", "kaushal_notifications")
+
+# NOTIFY payloads must stay under 8000 bytes; large broadcasts are split into
+# events whose encoded size stays below this, leaving a margin
+MAX_PAYLOAD_BYTES = 7500
+
+# deliver(user_ids, message) runs on the worker's event loop
+Deliver = Callable[[List[int], dict], None]
+
+
+class NotificationBus:
+    """In-process bus: nothing to forward, local delivery is all there is."""
+
+    def __init__(self):
+        # Events carry the origin so a worker skips its own (already delivered) events
+        self.origin = uuid.uuid4().hex
+        self.published = 0
+        self.received = 0
+        self._deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver):
+        self._deliver = deliver
+
+    def publish(self, user_ids: List[int], message: dict):
+        """Forwards an event to the other workers without waiting on I/O."""
+
+    async def close(self):
+        pass
+
+    def _encode(self, user_ids: List[int], message: dict) -> Iterable[str]:
+        # json.dumps escapes non-ASCII, so the length in characters is the length in bytes
+        size = base = len(json.dumps({"origin": self.origin, "user_ids": [], "message": message}))
+        chunk = []
+        for user_id in user_ids:
+            # Each id adds its digits and a ", " separator
+            item = len(str(user_id)) + 2
+            if chunk and size + item > MAX_PAYLOAD_BYTES:
+                yield json.dumps({"origin": self.origin, "user_ids": chunk, "message": message})
+                size, chunk = base, []
+            chunk.append(user_id)
+            size += item
+        if chunk:
+            yield json.dumps({"origin": self.origin, "user_ids": chunk, "message": message})
+
+    def _on_payload(self, payload: str):
+        event = json.loads(payload)
+        if event.get("origin") == self.origin:
+            return
+        self.received += 1
+        self._deliver(event["user_ids"], event["message"])
+
+    def stats(self) -> dict:
+        return {"backend": type(self).__name__, "published": self.published, "received": self.received}
+
+
+class BrokerBus(NotificationBus):
+    """
+    Newline-delimited JSON over one TCP connection to the relay broker, which
+    copies each line to every other connected worker. Reconnects with backoff;
+    events published while disconnected are dropped (clients still refresh on
+    their own polling interval).
+    """
+
+    def __init__(self, host: str, port: int):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+
+    async def start(self, deliver: Deliver):
+        await super().start(deliver)
+        self._reader_task = asyncio.create_task(self._run())
+        # Do not hold up startup for long if the broker is down; _run keeps retrying
+        try:
+            await asyncio.wait_for(self._connected.wait(), 2)
+        except asyncio.TimeoutError:
+            logger.warning("Notification broker %s:%s not reachable yet", self.host, self.port)
+
+    async def _run(self):
+        backoff = 0.5
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError:
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 10)
+                continue
+            backoff = 0.5
+            self._writer = writer
+            self._connected.set()
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    self._on_payload(line.decode())
+            except (OSError, ValueError):
+                pass
+            finally:
+                self._connected.clear()
+                self._writer = None
+                writer.close()
+
+    def publish(self, user_ids: List[int], message: dict):
+        if self._writer is None:
+            return
+        for payload in self._encode(user_ids, message):
+            self._writer.write(payload.encode() + b"\n")
+        self.published += 1
+
+    async def close(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+
+
+class PostgresBus(NotificationBus):
+    """
+    PostgreSQL LISTEN/NOTIFY. A listener thread waits on a dedicated connection
+    and hands payloads to the event loop; NOTIFYs are sent from a single-thread
+    executor so publishing never blocks the loop.
+    """
+
+    def __init__(self, dsn: str, channel: str = NOTIFICATION_CHANNEL):
+        super().__init__()
+        # SQLAlchemy URLs may name the driver ("postgresql+psycopg2://")
+        self.dsn = dsn.replace("+psycopg2", "", 1)
+        self.channel = channel
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop = threading.Event()
+        self._listener: Optional[threading.Thread] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pg-notify")
+        self._notify_conn = None
+
+    async def start(self, deliver: Deliver):
+        await super().start(deliver)
+        self._loop = asyncio.get_running_loop()
+        self._listener = threading.Thread(target=self._listen, name="pg-listen", daemon=True)
+        self._listener.start()
+
+    def _connect(self):
+        import psycopg2
+        conn = psycopg2.connect(self.dsn)
+        conn.set_session(autocommit=True)
+        return conn
+
+    def _listen(self):
+        while not self._stop.is_set():
+            try:
+                conn = self._connect()
+                with conn.cursor() as cur:
+                    cur.execute(f'LISTEN "{self.channel}"')
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self._loop.call_soon_threadsafe(self._on_payload, notify.payload)
+                conn.close()
+            except Exception:
+                logger.exception("LISTEN connection lost, reconnecting")
+                self._stop.wait(2)
+
+    def _notify(self, payloads: List[str]):
+        try:
+            if self._notify_conn is None or self._notify_conn.closed:
+                self._notify_conn = self._connect()
+            with self._notify_conn.cursor() as cur:
+                for payload in payloads:
+                    cur.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+        except Exception:
+            logger.exception("NOTIFY failed")
+            self._notify_conn = None
+
+    def publish(self, user_ids: List[int], message: dict):
+        self._executor.submit(self._notify, list(self._encode(user_ids, message)))
+        self.published += 1
+
+    async def close(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False)
+        if self._notify_conn is not None:
+            self._notify_conn.close()
+
+
+def create_bus(url: str = None) -> NotificationBus:
+    url = NOTIFICATION_BUS_URL if url is None else url
+    if not url:
+        return NotificationBus()
+    if url.startswith("tcp://"):
+        host, _, port = url[len("tcp://"):].rpartition(":")
+        return BrokerBus(host or "127.0.0.1", int(port))
+    if url.startswith("postgres"):
+        return PostgresBus(url)
+    raise ValueError(f"Unsupported NOTIFICATION_BUS_URL: {url}")
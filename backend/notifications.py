@@ -0,0 +1,160 @@
+import asyncio
+import os
+from typing import Dict, Iterable, List, Union
+from fastapi import WebSocket
+
+from .notification_bus import NotificationBus, create_bus
+
+# Real-time notifications
+# Every WebSocket connection gets a bounded outbound queue drained by its own
+# sender task. Fan-out only enqueues, so a slow or dead socket never delays the
+# HTTP request that triggered the notification or the other recipients. A
+# connection whose queue overflows (client not reading) or whose send times out
+# is closed; the client reconnects and refetches its counts.
+# Events are also forwarded on a notification bus (notification_bus.py) so
+# sockets held by other worker processes receive them.
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "32"))
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+
+# Events that only tell the client to refresh: one pending copy per connection is enough
+COALESCED_EVENTS = {"new_mail", "unread_update"}
+
+# 1013 = "Try Again Later"
+CLOSE_CODE_OVERFLOW = 1013
+
+Outbound = Union[dict, str]
+
+
+class Connection:
+    """One WebSocket plus its outbound queue and sender task."""
+
+    def __init__(self, user_id: int, websocket: WebSocket, queue_size: int):
+        self.user_id = user_id
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        # Coalesced event types currently waiting in the queue
+        self.pending_events = set()
+        self.sender_task: asyncio.Task = None
+        self.closed = False
+
+    def enqueue(self, message: Outbound) -> str:
+        """Queues a message without waiting: 'queued', 'coalesced' or 'full'."""
+        event = message.get("type") if isinstance(message, dict) else None
+        if event in COALESCED_EVENTS:
+            if event in self.pending_events:
+                return "coalesced"
+            self.pending_events.add(event)
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.pending_events.discard(event)
+            return "full"
+        return "queued"
+
+
+class ConnectionManager:
+    """Manages WebSocket connections for real-time notifications"""
+
+    def __init__(self, queue_size: int = WS_SEND_QUEUE_SIZE, send_timeout: float = WS_SEND_TIMEOUT_SECONDS,
+                 bus: NotificationBus = None):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        # user_id -> connections, to support multiple tabs/components
+        self.active_connections: Dict[int, List[Connection]] = {}
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped_connections = 0
+        # Close tasks for dropped connections (referenced until they finish)
+        self._closing = set()
+        self.bus = bus if bus is not None else create_bus()
+
+    async def start(self):
+        """Connects the bus; events from other workers are delivered locally."""
+        await self.bus.start(self.deliver)
+
+    async def stop(self):
+        await self.bus.close()
+
+    async def connect(self, user_id: int, websocket: WebSocket) -> Connection:
+        await websocket.accept()
+        connection = Connection(user_id, websocket, self.queue_size)
+        connection.sender_task = asyncio.create_task(self._sender(connection))
+        self.active_connections.setdefault(user_id, []).append(connection)
+        return connection
+
+    def disconnect(self, connection: Connection):
+        connection.closed = True
+        connections = self.active_connections.get(connection.user_id)
+        if connections and connection in connections:
+            connections.remove(connection)
+            # Clean up empty lists
+            if not connections:
+                del self.active_connections[connection.user_id]
+        if connection.sender_task is not None and connection.sender_task is not asyncio.current_task():
+            connection.sender_task.cancel()
+
+    async def _sender(self, connection: Connection):
+        try:
+            while True:
+                message = await connection.queue.get()
+                async with asyncio.timeout(self.send_timeout):
+                    if isinstance(message, dict):
+                        connection.pending_events.discard(message.get("type"))
+                        await connection.websocket.send_json(message)
+                    else:
+                        await connection.websocket.send_text(message)
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Stale or stuck connection
+            self.disconnect(connection)
+            await self._close(connection)
+
+    async def _close(self, connection: Connection, code: int = 1000):
+        try:
+            await asyncio.wait_for(connection.websocket.close(code=code), self.send_timeout)
+        except Exception:
+            pass
+
+    def send(self, connection: Connection, message: Outbound):
+        """Queues a message for one connection; overflowing connections are dropped."""
+        if connection.closed:
+            return
+        result = connection.enqueue(message)
+        if result == "coalesced":
+            self.coalesced += 1
+        elif result == "full":
+            self.dropped_connections += 1
+            self.disconnect(connection)
+            task = asyncio.get_running_loop().create_task(self._close(connection, CLOSE_CODE_OVERFLOW))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    def deliver(self, user_ids: Iterable[int], message: dict):
+        """Queues the message for every local connection of every user, without awaiting I/O."""
+        for user_id in dict.fromkeys(user_ids):
+            for connection in list(self.active_connections.get(user_id, ())):
+                self.send(connection, message)
+
+    def publish(self, user_ids: Iterable[int], message: dict):
+        """Fan-out to this worker's sockets and, through the bus, to every other worker."""
+        user_ids = list(dict.fromkeys(user_ids))
+        self.deliver(user_ids, message)
+        self.bus.publish(user_ids, message)
+
+    async def notify_user(self, user_id: int, message: dict):
+        """Send notification to all active connections for a specific user"""
+        self.publish([user_id], message)
+
+    def stats(self) -> dict:
+        connections = [c for conns in self.active_connections.values() for c in conns]
+        return {
+            "users": len(self.active_connections),
+            "connections": len(connections),
+            "queued_messages": sum(c.queue.qsize() for c in connections),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "dropped_connections": self.dropped_connections,
+            "bus": self.bus.stats()
+        }
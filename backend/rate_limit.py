@@ -0,0 +1,311 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy import delete, func, select, update
+
+from . import database, models
+
+# Rate limiting
+# Limits are per scope ("send_mail", "login", ...) and per role, written as
+# "<count>/<second|minute|hour|day>". A role without an entry falls back to
+# "*"; a scope/role with neither is unlimited. Authenticated scopes count per
+# user, anonymous ones per client IP.
+#   RATE_LIMIT_STORE=memory    sliding-window log per key in this process (default)
+#   RATE_LIMIT_STORE=database  sliding-window counters in rate_limit_windows,
+#                              shared by every worker using the same database
+#   RATE_LIMITS='{"send_mail": {"agniveer": "20/hour"}}' overrides/extends the defaults
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Behind a reverse proxy the client address is the first X-Forwarded-For entry
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+
+DEFAULT_LIMITS = {
+    "login": {"*": "30/minute"},
+    "send_mail": {"agniveer": "10/hour"},
+    "ai_report": {"*": "30/minute"},
+    "bulk_upload": {"*": "10/hour"},
+}
+
+_UNITS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: int  # seconds until another request would be allowed
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(self.reset_after),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(self.reset_after)
+        return headers
+
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    """'10/hour' -> (10, 3600)"""
+    count, _, unit = rate.partition("/")
+    unit = unit.strip().lower().rstrip("s")
+    if unit not in _UNITS or not count.strip().isdigit():
+        raise ValueError(f"Invalid rate limit: {rate!r}")
+    return int(count), _UNITS[unit]
+
+
+def load_limits(overrides: str = None) -> Dict[str, Dict[str, Tuple[int, int]]]:
+    overrides = os.getenv("RATE_LIMITS", "") if overrides is None else overrides
+    merged = {scope: dict(roles) for scope, roles in DEFAULT_LIMITS.items()}
+    for scope, roles in (json.loads(overrides) if overrides else {}).items():
+        merged.setdefault(scope, {}).update(roles)
+    return {
+        scope: {role: parse_rate(rate) for role, rate in roles.items() if rate}
+        for scope, roles in merged.items()
+    }
+
+
+class MemoryStore:
+    """Exact sliding-window log: the timestamps of the last `limit` hits per key."""
+
+    # Idle keys are swept every this many hits
+    SWEEP_EVERY = 1024
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._hits: Dict[str, Tuple[int, deque]] = {}
+        self._lock = threading.Lock()
+        self._since_sweep = 0
+
+    def _window_hits(self, key: str, window: int, now: float) -> deque:
+        # Caller holds the lock
+        _, hits = self._hits.setdefault(key, (window, deque()))
+        while hits and hits[0] <= now - window:
+            hits.popleft()
+        return hits
+
+    @staticmethod
+    def _decide(hits: deque, limit: int, window: int, now: float) -> Decision:
+        """The decision for one more hit on top of `hits`."""
+        if len(hits) >= limit:
+            return Decision(False, limit, 0, max(1, int(hits[0] + window - now + 0.999)))
+        oldest = hits[0] if hits else now
+        return Decision(True, limit, limit - len(hits) - 1, int(oldest + window - now + 0.999))
+
+    def hit(self, key: str, limit: int, window: int) -> Decision:
+        """Checks and, when allowed, counts one hit."""
+        now = self.clock()
+        with self._lock:
+            hits = self._window_hits(key, window, now)
+            decision = self._decide(hits, limit, window, now)
+            if decision.allowed:
+                hits.append(now)
+                self._maybe_sweep(now)
+            return decision
+
+    def remove_last(self, key: str, window: int):
+        """Takes back the most recent hit (its request failed after being counted)."""
+        with self._lock:
+            entry = self._hits.get(key)
+            if entry and entry[1]:
+                entry[1].pop()
+
+    def _maybe_sweep(self, now: float):
+        self._since_sweep += 1
+        if self._since_sweep < self.SWEEP_EVERY:
+            return
+        self._since_sweep = 0
+        for key in [k for k, (window, hits) in self._hits.items() if not hits or hits[-1] <= now - window]:
+            del self._hits[key]
+
+    def __len__(self):
+        return len(self._hits)
+
+
+class DatabaseStore:
+    """
+    Sliding-window counter shared through the database: one row per key and
+    fixed window, and the estimate weights the previous window by how much of
+    it still overlaps the sliding window. Concurrent workers may briefly admit
+    a request or two over the limit; nothing is ever under-counted.
+    """
+
+    # Rows older than this are deleted every PRUNE_EVERY hits
+    RETENTION_SECONDS = 2 * _UNITS["day"]
+    PRUNE_EVERY = 500
+
+    def __init__(self, session_factory=None, clock: Callable[[], float] = time.time):
+        self.session_factory = session_factory or database.SessionLocal
+        self.clock = clock
+        self._since_prune = 0
+        self._lock = threading.Lock()
+
+    def _upsert(self, db):
+        table = models.RateLimitWindow.__table__
+        if db.bind.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        statement = insert(table)
+        return statement.on_conflict_do_update(
+            index_elements=[table.c.key, table.c.window_start],
+            set_={"count": table.c.count + 1}
+        )
+
+    def _decide(self, db, key: str, limit: int, window: int, now: float) -> Decision:
+        current = int(now // window) * window
+        table = models.RateLimitWindow.__table__
+        counts = dict(db.execute(
+            select(table.c.window_start, table.c.count)
+            .where(table.c.key == key, table.c.window_start.in_([current - window, current]))
+        ).all())
+        overlap = 1 - (now - current) / window
+        estimate = counts.get(current - window, 0) * overlap + counts.get(current, 0)
+        reset_after = max(1, int(current + window - now + 0.999))
+        if estimate + 1 > limit:
+            return Decision(False, limit, 0, reset_after)
+        return Decision(True, limit, max(0, int(limit - estimate - 1)), reset_after)
+
+    def _add(self, db, key: str, window: int, now: float):
+        current = int(now // window) * window
+        db.execute(self._upsert(db), {"key": key, "window_start": current, "count": 1})
+        self._maybe_prune(db, now)
+        db.commit()
+
+    def hit(self, key: str, limit: int, window: int) -> Decision:
+        """Checks and, when allowed, counts one hit."""
+        now = self.clock()
+        db = self.session_factory()
+        try:
+            decision = self._decide(db, key, limit, window, now)
+            if decision.allowed:
+                self._add(db, key, window, now)
+            return decision
+        finally:
+            db.close()
+
+    def remove_last(self, key: str, window: int):
+        """Takes back the most recent hit (its request failed after being counted)."""
+        table = models.RateLimitWindow.__table__
+        # The newest window with hits, which is where the hit was counted
+        # unless the window rolled over while the request ran
+        latest = select(func.max(table.c.window_start)).where(table.c.key == key, table.c.count > 0).scalar_subquery()
+        db = self.session_factory()
+        try:
+            db.execute(update(table).where(table.c.key == key, table.c.window_start == latest)
+                       .values(count=table.c.count - 1))
+            db.commit()
+        finally:
+            db.close()
+
+    def _maybe_prune(self, db, now: float):
+        with self._lock:
+            self._since_prune += 1
+            if self._since_prune < self.PRUNE_EVERY:
+                return
+            self._since_prune = 0
+        db.execute(delete(models.RateLimitWindow).where(
+            models.RateLimitWindow.window_start < now - self.RETENTION_SECONDS))
+
+
+def create_store(name: str = None):
+    name = RATE_LIMIT_STORE if name is None else name
+    if name == "memory":
+        return MemoryStore()
+    if name == "database":
+        return DatabaseStore()
+    raise ValueError(f"Unsupported RATE_LIMIT_STORE: {name}")
+
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _no_user():
+    return None
+
+
+class RateLimiter:
+    def __init__(self, store=None, limits: Dict[str, Dict[str, Tuple[int, int]]] = None,
+                 enabled: bool = RATE_LIMIT_ENABLED):
+        self.store = store if store is not None else create_store()
+        self.limits = limits if limits is not None else load_limits()
+        self.enabled = enabled
+
+    def limit_for(self, scope: str, role: Optional[str]) -> Optional[Tuple[int, int]]:
+        roles = self.limits.get(scope, {})
+        return roles.get(role) or roles.get("*")
+
+    def check(self, scope: str, identity: str, role: Optional[str] = None) -> Optional[Decision]:
+        """Counts one request; None when the scope/role is unlimited."""
+        rule = self.limit_for(scope, role)
+        if not self.enabled or rule is None:
+            return None
+        limit, window = rule
+        return self.store.hit(f"{scope}:{identity}", limit, window)
+
+    def release(self, scope: str, identity: str, role: Optional[str] = None):
+        """Gives back a request counted by check() whose endpoint failed."""
+        rule = self.limit_for(scope, role)
+        if self.enabled and rule is not None:
+            self.store.remove_last(f"{scope}:{identity}", rule[1])
+
+    def enforce(self, scope: str, identity: str, role: Optional[str], response: Response):
+        decision = self.check(scope, identity, role)
+        if decision is None:
+            return
+        if not decision.allowed:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Rate limit exceeded, retry in {decision.reset_after} seconds",
+                headers=decision.headers()
+            )
+        response.headers.update(decision.headers())
+
+    def dependency(self, scope: str, user_dependency: Callable = None, count_success_only: bool = False):
+        """
+        FastAPI dependency enforcing `scope`. With user_dependency (e.g.
+        get_current_user) requests count per user and per-role limits apply;
+        without it they count per client IP under the "*" limit.
+        With count_success_only a request reserves its slot before the endpoint
+        runs and gives it back if the endpoint raises, so rejected requests do
+        not use up the quota and concurrent ones cannot overrun it.
+        """
+        def identify(request: Request, user):
+            if user is None:
+                return f"ip:{client_ip(request)}", None
+            return f"user:{user.user_id}", getattr(user.role, "value", user.role)
+
+        if count_success_only:
+            def limit_successes(request: Request, response: Response, user=Depends(user_dependency or _no_user)):
+                identity, role = identify(request, user)
+                self.enforce(scope, identity, role, response)
+                try:
+                    yield
+                except Exception:
+                    self.release(scope, identity, role)
+                    raise
+            return limit_successes
+
+        if user_dependency is None:
+            def limit_by_ip(request: Request, response: Response):
+                self.enforce(scope, f"ip:{client_ip(request)}", None, response)
+            return limit_by_ip
+
+        def limit_by_user(response: Response, user=Depends(user_dependency)):
+            role = getattr(user.role, "value", user.role)
+            self.enforce(scope, f"user:{user.user_id}", role, response)
+        return limit_by_user
+
+
+limiter = RateLimiter()
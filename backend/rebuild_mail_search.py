@@ -0,0 +1,24 @@
+import sys
+
+from backend.database import SessionLocal, engine
+from backend import models, mail_search
+
+# Ensure tables exist (create_all also creates the search index)
+models.Base.metadata.create_all(bind=engine)
+
+def rebuild_mail_search(full: bool = False):
+    db = SessionLocal()
+    try:
+        print("Rebuilding the mail search index..." if full else "Indexing mail missing from the search index...")
+        result = mail_search.rebuild_index(db, full=full)
+        if not result["supported"]:
+            print(f"No search index for {engine.dialect.name}; search uses ILIKE instead.")
+            return
+        print(f"Indexed {result['indexed']} emails ({result['skipped']} already indexed).")
+    except Exception as e:
+        print(f"Error rebuilding mail search index: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild_mail_search(full="--full" in sys.argv)
@@ -0,0 +1,22 @@
+from backend.database import SessionLocal, engine
+from backend import models
+from backend.mail_service import MailService
+
+# Ensure tables exist (creates mailbox_counters on databases that predate it)
+models.Base.metadata.create_all(bind=engine)
+
+def reconcile_mailbox_counters():
+    db = SessionLocal()
+    try:
+        print("Recomputing mailbox counters from internal_emails/email_recipients...")
+        result = MailService.reconcile_counters(db)
+        print(f"Mailbox counters checked: {result['checked']}, repaired: {result['repaired']}.")
+        if result["repaired_user_ids"]:
+            print(f"Repaired users: {result['repaired_user_ids']}")
+    except Exception as e:
+        print(f"Error reconciling mailbox counters: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    reconcile_mailbox_counters()
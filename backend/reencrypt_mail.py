@@ -0,0 +1,37 @@
+import argparse
+
+from backend.database import SessionLocal, engine
+from backend import models, key_rotation
+
+# Ensure tables exist
+models.Base.metadata.create_all(bind=engine)
+
+def reencrypt_mail(after_id: int = 0, batch_size: int = None, max_rows_per_second: float = None):
+    db = SessionLocal()
+    try:
+        print("Re-encrypting mail bodies with the primary key...")
+        result = key_rotation.reencrypt_bodies(
+            db, batch_size=batch_size, after_id=after_id, max_rows_per_second=max_rows_per_second,
+            progress_callback=lambda percent, message: print(f"  {percent:5.1f}% {message}", end="\r", flush=True)
+        )
+        print()
+        print(f"Re-encrypted {result['reencrypted']} of {result['scanned']} bodies "
+              f"({result['already_current']} already current) at {result['rows_per_second']} rows/s.")
+        if result["undecryptable"] or result["changed_concurrently"]:
+            print(f"{result['undecryptable']} bodies match no configured key and "
+                  f"{result['changed_concurrently']} changed during the run; re-run before removing old keys.")
+        else:
+            print("All bodies are on the primary key; MAIL_ENCRYPTION_OLD_KEYS can be removed "
+                  "(without MAIL_SEARCH_KEY, removing the oldest key needs a full search rebuild; see encryption.py).")
+    except Exception as e:
+        print(f"\nError re-encrypting mail (resume with --after-id): {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-encrypt mail bodies after a key rotation")
+    parser.add_argument("--after-id", type=int, default=0, help="resume after this internal_emails.id")
+    parser.add_argument("--batch-size", type=int)
+    parser.add_argument("--max-rows-per-second", type=float)
+    args = parser.parse_args()
+    reencrypt_mail(args.after_id, args.batch_size, args.max_rows_per_second)
@@ -28,10 +28,11 @@ class AchievementScoreResult(BaseModel):
     achievements_count: int
     flags: List[str]
 
-def calculate_achievement_score(achievements: List[AchievementInput]) -> AchievementScoreResult:
+def calculate_achievement_score(achievements: List[AchievementInput], reference_date: Optional[datetime] = None) -> AchievementScoreResult:
     if not achievements:
         return AchievementScoreResult(total_score=0.0, raw_points_sum=0.0, achievements_count=0, flags=[])
     
+    now = reference_date or datetime.utcnow()
     total_weighted_points = 0.0
     flags = []
     
@@ -79,7 +80,7 @@ def calculate_achievement_score(achievements: List[AchievementInput]) -> Achieve
             limit_validity = limits[2] if limits else 24
             
             expiry_date = ach.date_earned.timestamp() + (limit_validity * 30 * 24 * 3600)
-            if datetime.utcnow().timestamp() > expiry_date:
+            if now.timestamp() > expiry_date:
                 continue # Expired
         
         # 3. Time Decay
@@ -88,7 +89,7 @@ def calculate_achievement_score(achievements: List[AchievementInput]) -> Achieve
         # Exception: DISCIPLINARY (No decay specified? Usually negative points stick for their valid duration)
         # Let's assume DISCIPLINARY is 1.0 until it expires (12 months).
         
-        days_old = (datetime.utcnow() - ach.date_earned).days
+        days_old = (now - ach.date_earned).days
         multiplier = 0.0
         
         if is_bravery or is_disciplinary:
@@ -33,7 +33,10 @@ def calculate_rri_score(
     behavioral_assessments: List[BehavioralAssessmentInput],
     
     # Achievement Inputs
-    achievements: List[AchievementInput]
+    achievements: List[AchievementInput],
+
+    # Defaults to now; pinned by batch what-if runs and tests
+    reference_date: Optional[datetime] = None
 ) -> RRIResult:
     
     audit_notes = []
@@ -43,12 +46,13 @@ def calculate_rri_score(
         firing_score, firing_date,
         weapon_score, weapon_date,
         tactical_score, tactical_date,
-        cognitive_score, cognitive_date
+        cognitive_score, cognitive_date,
+        reference_date
     )
     
     behav_result = calculate_behavioral_score(behavioral_assessments)
     
-    ach_result = calculate_achievement_score(achievements)
+    ach_result = calculate_achievement_score(achievements, reference_date)
     
     # 2. Calculate Final RRI
     rri_score = (
@@ -88,6 +92,6 @@ def calculate_rri_score(
         achievement=ach_result,
         overall_data_quality=round(overall_quality, 2),
         quality_status=q_status,
-        calculation_date=datetime.utcnow(),
+        calculation_date=reference_date or datetime.utcnow(),
         audit_notes=audit_notes
     )
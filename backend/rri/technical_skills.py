@@ -24,7 +24,8 @@ def calculate_technical_score(
     tactical_score: Optional[float],
     tactical_date: Optional[datetime],
     cognitive_score: Optional[float],
-    cognitive_date: Optional[datetime]
+    cognitive_date: Optional[datetime],
+    reference_date: Optional[datetime] = None
 ) -> TechnicalScoreResult:
     
     breakdown = {}
@@ -33,7 +34,7 @@ def calculate_technical_score(
     
     # 1. Firing
     if firing_score is not None:
-        recency = calculate_recency_weight(firing_date)
+        recency = calculate_recency_weight(firing_date, reference_date)
         norm_score = normalize_to_0_100(firing_score, 100) # Assuming input is 0-100
         val = norm_score * recency * WEIGHT_FIRING
         breakdown["firing"] = val
@@ -42,7 +43,7 @@ def calculate_technical_score(
         
     # 2. Weapon Handling
     if weapon_score is not None:
-        recency = calculate_recency_weight(weapon_date)
+        recency = calculate_recency_weight(weapon_date, reference_date)
         norm_score = normalize_to_0_100(weapon_score, 100)
         val = norm_score * recency * WEIGHT_WEAPON
         breakdown["weapon"] = val
@@ -51,7 +52,7 @@ def calculate_technical_score(
 
     # 3. Tactical
     if tactical_score is not None:
-        recency = calculate_recency_weight(tactical_date)
+        recency = calculate_recency_weight(tactical_date, reference_date)
         norm_score = normalize_to_0_100(tactical_score, 100)
         val = norm_score * recency * WEIGHT_TACTICAL
         breakdown["tactical"] = val
@@ -60,7 +61,7 @@ def calculate_technical_score(
 
     # 4. Cognitive
     if cognitive_score is not None:
-        recency = calculate_recency_weight(cognitive_date)
+        recency = calculate_recency_weight(cognitive_date, reference_date)
         norm_score = normalize_to_0_100(cognitive_score, 100)
         val = norm_score * recency * WEIGHT_COGNITIVE
         breakdown["cognitive"] = val
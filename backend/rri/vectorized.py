@@ -0,0 +1,290 @@
+"""
+Columnar (NumPy) implementation of the RRI scoring pipeline.
+
+Mirrors technical_skills, behavioral_competencies, achievements and
+rri_calculator for N soldiers at once. Used for battalion-wide what-if runs
+where building one Pydantic object per assessment is too slow.
+
+Conventions:
+- Missing scores are NaN, missing dates are NaT (use `to_datetime64`).
+- Behavioral inputs are padded to (N, Q) with NaT dates for unused slots.
+- Achievements are flat arrays of length M with an `owner` index into 0..N-1.
+- Audit notes / achievement flags are not produced here; use the scalar path
+  when an individual audit trail is needed.
+"""
+from datetime import datetime
+from typing import Dict, Optional, Sequence
+import numpy as np
+
+from .technical_skills import WEIGHT_FIRING, WEIGHT_WEAPON, WEIGHT_TACTICAL, WEIGHT_COGNITIVE
+from .behavioral_competencies import (
+    WEIGHT_INITIATIVE, WEIGHT_DEDICATION, WEIGHT_TEAM,
+    WEIGHT_COURAGE, WEIGHT_MOTIVATION, WEIGHT_ADAPTABILITY
+)
+from .achievements import ACHIEVEMENT_LIMITS
+from .rri_calculator import RRI_WEIGHT_TECH, RRI_WEIGHT_BEHAV, RRI_WEIGHT_ACHIEVE
+
+# Column order for technical (N, 4) and behavioral (N, Q, 6) score arrays
+TECHNICAL_FIELDS = ("firing", "weapon", "tactical", "cognitive")
+TECHNICAL_WEIGHTS = (WEIGHT_FIRING, WEIGHT_WEAPON, WEIGHT_TACTICAL, WEIGHT_COGNITIVE)
+BEHAVIORAL_FIELDS = ("initiative", "dedication", "team_spirit", "courage", "motivation", "adaptability")
+BEHAVIORAL_WEIGHTS = (
+    WEIGHT_INITIATIVE, WEIGHT_DEDICATION, WEIGHT_TEAM,
+    WEIGHT_COURAGE, WEIGHT_MOTIVATION, WEIGHT_ADAPTABILITY
+)
+
+_US_PER_DAY = 86400 * 10**6
+
+
+def to_datetime64(values: Sequence[Optional[datetime]]) -> np.ndarray:
+    """Converts a (possibly nested) list of datetimes/None to datetime64[us] with NaT for None."""
+    return np.array(values, dtype="datetime64[us]")
+
+
+def _reference(reference_date: Optional[datetime]) -> np.datetime64:
+    return np.datetime64(reference_date or datetime.utcnow(), "us")
+
+
+def _elapsed_days(dates: np.ndarray, reference: np.datetime64) -> np.ndarray:
+    # Same as timedelta.days (floored), computed on integer microseconds
+    elapsed_us = (reference - dates).astype("timedelta64[us]").astype(np.int64)
+    return elapsed_us // _US_PER_DAY
+
+
+def _round(values: np.ndarray, ndigits: int = 2) -> np.ndarray:
+    """
+    np.round with Python round() semantics.
+    They only disagree when the scaled value sits on a .5 boundary, so those
+    few elements are re-rounded with the builtin to keep parity exact.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.round(values, ndigits)
+    scaled = values * 10**ndigits
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        idx = np.nonzero(near_tie)
+        rounded[idx] = [round(float(v), ndigits) for v in values[idx]]
+    return rounded
+
+
+def calculate_recency_weights(dates: np.ndarray, reference_date: Optional[datetime] = None) -> np.ndarray:
+    """Vectorized normalization.calculate_recency_weight. NaT and future dates weigh 0."""
+    dates = np.asarray(dates, dtype="datetime64[us]")
+    reference = _reference(reference_date)
+    days = _elapsed_days(dates, reference)
+    valid = ~np.isnat(dates) & (dates <= reference)
+    weights = np.select(
+        [days <= 60, days <= 120, days <= 180, days <= 270, days <= 365, days <= 730],
+        [1.0, 0.95, 0.85, 0.70, 0.50, 0.25],
+        default=0.0
+    )
+    return np.where(valid, weights, 0.0)
+
+
+def calculate_technical_scores(
+    scores: np.ndarray,
+    dates: np.ndarray,
+    reference_date: Optional[datetime] = None
+) -> Dict[str, np.ndarray]:
+    """
+    scores: (N, 4) in TECHNICAL_FIELDS order, NaN where a category is missing.
+    dates: (N, 4) per-category dates, or (N,) when one assessment covers all four.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    dates = np.asarray(dates, dtype="datetime64[us]")
+    if dates.ndim == 1:
+        dates = np.repeat(dates[:, None], scores.shape[1], axis=1)
+
+    present = ~np.isnan(scores)
+    recency = calculate_recency_weights(dates, reference_date)
+
+    # normalize_to_0_100(score, 100): negatives -> 0, capped at 100
+    clipped = np.where(scores < 0, 0.0, scores)
+    normalized = (clipped / 100) * 100.0
+    normalized = np.where(normalized > 100, 100.0, normalized)
+
+    # Accumulate in the same order as the scalar path so float results match
+    weighted_sum = np.zeros(scores.shape[0])
+    for col, weight in enumerate(TECHNICAL_WEIGHTS):
+        val = normalized[:, col] * recency[:, col] * weight
+        weighted_sum = weighted_sum + np.where(present[:, col], val, 0.0)
+
+    categories_present = present.sum(axis=1)
+    status = np.where(categories_present == 4, "COMPLETE",
+                      np.where(categories_present == 3, "PARTIAL", "INCOMPLETE"))
+
+    return {
+        "total_score": _round(weighted_sum, 2),
+        "completeness": categories_present / 4.0,
+        "status": status,
+        "categories_present": categories_present
+    }
+
+
+def _masked_mean(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    # statistics.mean is exact and rounds once; summing in extended precision
+    # gets the same float64 result for the handful of values per soldier
+    counts = mask.sum(axis=1)
+    sums = np.where(mask, values, 0.0).astype(np.longdouble).sum(axis=1)
+    means = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+    return means.astype(np.float64)
+
+
+def _mean_without_outliers(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    # behavioral_competencies.remove_outliers: drop values outside mean +/- 2 sample stdev,
+    # only when a soldier has 3+ assessments and a non-zero spread
+    counts = mask.sum(axis=1)
+    mean = _masked_mean(values, mask)
+    sq_dev = np.where(mask, (values - mean[:, None]) ** 2, 0.0).sum(axis=1)
+    stdev = np.sqrt(np.divide(sq_dev, counts - 1, out=np.zeros_like(sq_dev), where=counts > 1))
+
+    lower = (mean - 2 * stdev)[:, None]
+    upper = (mean + 2 * stdev)[:, None]
+    apply_filter = ((counts >= 3) & (stdev != 0))[:, None]
+    keep = mask & (~apply_filter | ((values >= lower) & (values <= upper)))
+    return _masked_mean(values, keep)
+
+
+def calculate_behavioral_scores(scores: np.ndarray, dates: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    scores: (N, Q, 6) in BEHAVIORAL_FIELDS order.
+    dates: (N, Q) assessment dates; NaT marks an unused (padding) slot.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    dates = np.asarray(dates, dtype="datetime64[us]")
+    mask = ~np.isnat(dates)
+    counts = mask.sum(axis=1)
+
+    # 1 + 2. Outlier-filtered parameter means, weighted and scaled 10 -> 100
+    raw_weighted_sum = np.zeros(scores.shape[0])
+    for col, weight in enumerate(BEHAVIORAL_WEIGHTS):
+        raw_weighted_sum = raw_weighted_sum + _mean_without_outliers(scores[:, :, col], mask) * weight
+    total_score = np.where(counts > 0, _round(raw_weighted_sum * 10.0, 2), 0.0)
+
+    # 3. Status
+    status = np.where(counts >= 4, "COMPLETE", np.where(counts >= 2, "PARTIAL", "INSUFFICIENT"))
+    completeness = np.minimum(counts / 4.0, 1.0)
+
+    # 4. Trend: mean of per-assessment averages, 2nd half vs 1st half by date
+    per_assessment = scores[:, :, 0]
+    for col in range(1, len(BEHAVIORAL_FIELDS)):
+        per_assessment = per_assessment + scores[:, :, col]
+    per_assessment = per_assessment / 6.0
+
+    # Rank of each assessment in date order (NaT sorts last, stable for ties)
+    order = np.argsort(dates, axis=1, kind="stable")
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.arange(dates.shape[1])[None, :].repeat(dates.shape[0], axis=0), axis=1)
+    mid = (counts // 2)[:, None]
+    first_half = mask & (rank < mid)
+    second_half = mask & (rank >= mid)
+    diff = _masked_mean(per_assessment, second_half) - _masked_mean(per_assessment, first_half)
+
+    trend = np.where(diff > 1.0, "IMPROVING", np.where(diff < -1.0, "DECLINING", "STABLE"))
+    trend = np.where(counts < 2, "STABLE", trend)
+
+    return {
+        "total_score": total_score,
+        "completeness": completeness,
+        "status": status,
+        "trend": trend,
+        "quarters_count": counts
+    }
+
+
+def calculate_achievement_scores(
+    owner: np.ndarray,
+    types: np.ndarray,
+    points: np.ndarray,
+    dates: np.ndarray,
+    n_soldiers: int,
+    reference_date: Optional[datetime] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Flat achievement arrays of length M; owner[i] is the soldier index (0..N-1) of row i.
+    """
+    owner = np.asarray(owner, dtype=np.int64)
+    types = np.asarray(types, dtype=object)
+    points = np.asarray(points, dtype=np.float64)
+    dates = np.asarray(dates, dtype="datetime64[us]")
+    reference = _reference(reference_date)
+
+    # 1. Clamp to per-type limits (unknown types keep raw points, 24 month validity)
+    known = np.array([t in ACHIEVEMENT_LIMITS for t in types], dtype=bool)
+    limits = np.array([ACHIEVEMENT_LIMITS.get(t, (-np.inf, np.inf, 24)) for t in types], dtype=np.float64).reshape(-1, 3)
+    safe_points = np.where(known, np.clip(points, limits[:, 0], limits[:, 1]), points)
+
+    is_bravery = types == "BRAVERY"
+    is_disciplinary = types == "DISCIPLINARY"
+
+    # 2. Expiry (bravery never expires)
+    elapsed_seconds = (reference - dates).astype("timedelta64[us]").astype(np.int64) / 10**6
+    expired = ~is_bravery & (elapsed_seconds > limits[:, 2] * 30 * 24 * 3600)
+
+    # 3. Time decay (bravery/disciplinary hold full weight until expiry)
+    days_old = _elapsed_days(dates, reference)
+    decay = np.select(
+        [days_old <= 180, days_old <= 365, days_old <= 730],
+        [1.0, 0.85, 0.60],
+        default=0.0
+    )
+    multiplier = np.where(is_bravery | is_disciplinary, 1.0, decay)
+    weighted = np.where(expired, 0.0, safe_points * multiplier)
+
+    # 4. Per-soldier sum (bincount accumulates in input order like the scalar loop),
+    # capped at 50, floored at 0
+    raw_sum = np.bincount(owner, weights=weighted, minlength=n_soldiers)
+    raw_sum = np.clip(raw_sum, 0.0, 50.0)
+    counts = np.bincount(owner, minlength=n_soldiers)
+
+    # 5. Scale to 0-100
+    return {
+        "total_score": _round((raw_sum / 50.0) * 100.0, 2),
+        "raw_points_sum": _round(raw_sum, 2),
+        "achievements_count": counts
+    }
+
+
+def calculate_rri_scores(
+    technical_scores: np.ndarray,
+    technical_dates: np.ndarray,
+    behavioral_scores: np.ndarray,
+    behavioral_dates: np.ndarray,
+    achievement_owner: np.ndarray,
+    achievement_types: np.ndarray,
+    achievement_points: np.ndarray,
+    achievement_dates: np.ndarray,
+    reference_date: Optional[datetime] = None
+) -> Dict[str, object]:
+    """Vectorized rri_calculator.calculate_rri_score for N soldiers."""
+    reference_date = reference_date or datetime.utcnow()
+    n = np.asarray(technical_scores).shape[0]
+
+    tech = calculate_technical_scores(technical_scores, technical_dates, reference_date)
+    behav = calculate_behavioral_scores(behavioral_scores, behavioral_dates)
+    ach = calculate_achievement_scores(
+        achievement_owner, achievement_types, achievement_points, achievement_dates, n, reference_date
+    )
+
+    rri_score = _round(
+        (tech["total_score"] * RRI_WEIGHT_TECH) +
+        (behav["total_score"] * RRI_WEIGHT_BEHAV) +
+        (ach["total_score"] * RRI_WEIGHT_ACHIEVE),
+        2
+    )
+    band = np.where(rri_score >= 80, "GREEN", np.where(rri_score >= 65, "AMBER", "RED"))
+
+    overall_quality = (tech["completeness"] + behav["completeness"]) / 2.0
+    quality_status = np.where(overall_quality >= 0.75, "GOOD",
+                              np.where(overall_quality >= 0.50, "WARNING", "INSUFFICIENT"))
+
+    return {
+        "rri_score": rri_score,
+        "retention_band": band,
+        "technical": tech,
+        "behavioral": behav,
+        "achievement": ach,
+        "overall_data_quality": _round(overall_quality, 2),
+        "quality_status": quality_status,
+        "calculation_date": reference_date
+    }
@@ -1,8 +1,102 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import func, insert
 from datetime import datetime
+import time
 from . import models
 from .rri import rri_calculator, behavioral_competencies, achievements
 
+# Max number of ids per IN (...) clause when loading inputs in bulk.
+# Keeps us well under SQLite's bound-parameter limit.
+BULK_CHUNK_SIZE = 500
+
+def _chunks(ids, size=BULK_CHUNK_SIZE):
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+def _to_behavioral_input(b):
+    return behavioral_competencies.BehavioralAssessmentInput(
+        quarter=b.quarter,
+        assessment_date=b.assessment_date,
+        initiative=b.initiative,
+        dedication=b.dedication,
+        team_spirit=b.team_spirit,
+        courage=b.courage,
+        motivation=b.motivation,
+        adaptability=b.adaptability
+    )
+
+def _to_achievement_input(a):
+    return achievements.AchievementInput(
+        title=a.title,
+        type=a.type.value, # Enum to string
+        points=a.points,
+        date_earned=a.date_earned,
+        validity_months=a.validity_months
+    )
+
+def _score(tech_assessment, behav_inputs, ach_inputs):
+    # Handle missing data gracefully by setting scores to None (calculator handles None)
+    assessment_date = tech_assessment.assessment_date if tech_assessment else None
+    return rri_calculator.calculate_rri_score(
+        tech_assessment.firing_score if tech_assessment else None, assessment_date,
+        tech_assessment.weapon_handling_score if tech_assessment else None, assessment_date,
+        tech_assessment.tactical_score if tech_assessment else None, assessment_date,
+        tech_assessment.cognitive_score if tech_assessment else None, assessment_date,
+        behav_inputs,
+        ach_inputs
+    )
+
+def _record_values(agniveer_id: int, result) -> dict:
+    # Column values for a RetentionReadiness row built from a calculator result.
+    # Convert string band to Enum before saving.
+    return dict(
+        agniveer_id=agniveer_id,
+        rri_score=result.rri_score,
+        retention_band=models.RRIBand(result.retention_band),
+        technical_component=result.technical.total_score,
+        behavioral_component=result.behavioral.total_score,
+        achievement_component=result.achievement.total_score,
+        technical_completeness=result.technical.completeness,
+        behavioral_completeness=result.behavioral.completeness,
+        overall_data_quality=result.overall_data_quality,
+        # Flatten audit notes list to a single string for storage
+        audit_notes=" | ".join(result.audit_notes) if result.audit_notes else None
+    )
+
+def _snapshot_values(values: dict, record_id: int) -> dict:
+    # Subset of a RetentionReadiness row mirrored into the current_rri snapshot
+    return dict(
+        agniveer_id=values["agniveer_id"],
+        rri_record_id=record_id,
+        calculation_date=values["calculation_date"],
+        rri_score=values["rri_score"],
+        retention_band=values["retention_band"],
+        technical_component=values["technical_component"],
+        behavioral_component=values["behavioral_component"],
+        achievement_component=values["achievement_component"],
+        overall_data_quality=values["overall_data_quality"]
+    )
+
+def _refresh_current_rri(db: Session, snapshots):
+    """
+    Upserts current_rri rows in the caller's transaction.
+    Existing rows are found with one PK lookup per chunk, then written with
+    bulk update/insert (portable across SQLite and PostgreSQL).
+    """
+    ids = [s["agniveer_id"] for s in snapshots]
+    existing = set()
+    for chunk in _chunks(ids):
+        existing.update(r[0] for r in db.query(models.CurrentRRI.agniveer_id).filter(
+            models.CurrentRRI.agniveer_id.in_(chunk)
+        ).all())
+
+    updates = [s for s in snapshots if s["agniveer_id"] in existing]
+    inserts = [s for s in snapshots if s["agniveer_id"] not in existing]
+    if updates:
+        db.bulk_update_mappings(models.CurrentRRI, updates)
+    if inserts:
+        db.bulk_insert_mappings(models.CurrentRRI, inserts)
+
 def calculate_rri(db: Session, agniveer_id: int):
     # 1. Fetch Technical Data
     # Retrieves the most recent technical assessment for the Agniveer.
@@ -10,16 +104,6 @@ def calculate_rri(db: Session, agniveer_id: int):
     tech_assessment = db.query(models.TechnicalAssessment).filter(
         models.TechnicalAssessment.agniveer_id == agniveer_id
     ).order_by(models.TechnicalAssessment.assessment_date.desc()).first()
-    
-    # Handle missing data gracefully by setting scores to None (calculator handles None)
-    firing_score = tech_assessment.firing_score if tech_assessment else None
-    firing_date = tech_assessment.assessment_date if tech_assessment else None
-    weapon_score = tech_assessment.weapon_handling_score if tech_assessment else None
-    weapon_date = tech_assessment.assessment_date if tech_assessment else None
-    tactical_score = tech_assessment.tactical_score if tech_assessment else None
-    tactical_date = tech_assessment.assessment_date if tech_assessment else None
-    cognitive_score = tech_assessment.cognitive_score if tech_assessment else None
-    cognitive_date = tech_assessment.assessment_date if tech_assessment else None
 
     # 2. Fetch Behavioral Data
     # Retrieves ALL behavioral assessments to analyze trends (handled by calculator).
@@ -27,69 +111,151 @@ def calculate_rri(db: Session, agniveer_id: int):
     behav_rows = db.query(models.BehavioralAssessment).filter(
         models.BehavioralAssessment.agniveer_id == agniveer_id
     ).all()
-    
-    behav_inputs = []
-    for b in behav_rows:
-        behav_inputs.append(behavioral_competencies.BehavioralAssessmentInput(
-            quarter=b.quarter,
-            assessment_date=b.assessment_date,
-            initiative=b.initiative,
-            dedication=b.dedication,
-            team_spirit=b.team_spirit,
-            courage=b.courage,
-            motivation=b.motivation,
-            adaptability=b.adaptability
-        ))
-        
+    behav_inputs = [_to_behavioral_input(b) for b in behav_rows]
+
     # 3. Fetch Achievements
     # Retrieves awards/achievements. The calculator will sum points based on type and validity.
     ach_rows = db.query(models.Achievement).filter(
         models.Achievement.agniveer_id == agniveer_id
     ).all()
-    
-    ach_inputs = []
-    for a in ach_rows:
-        ach_inputs.append(achievements.AchievementInput(
-            title=a.title,
-            type=a.type.value, # Enum to string
-            points=a.points,
-            date_earned=a.date_earned,
-            validity_months=a.validity_months
-        ))
-        
+    ach_inputs = [_to_achievement_input(a) for a in ach_rows]
+
     # 4. Calculate
     # Passes all raw inputs to the core domain logic (rri_calculator).
     # This separates data fetching (Infrastructure) from calculation (Domain).
-    result = rri_calculator.calculate_rri_score(
-        firing_score, firing_date,
-        weapon_score, weapon_date,
-        tactical_score, tactical_date,
-        cognitive_score, cognitive_date,
-        behav_inputs,
-        ach_inputs
-    )
-    
+    result = _score(tech_assessment, behav_inputs, ach_inputs)
+
     # 5. Save Record
-    # Persist the calculated RRI score, band, and component breakdowns.
-    # Convert string band to Enum before saving.
-    band_enum = models.RRIBand(result.retention_band)
-    
-    rri_record = models.RetentionReadiness(
-        agniveer_id=agniveer_id,
-        rri_score=result.rri_score,
-        retention_band=band_enum,
-        technical_component=result.technical.total_score,
-        behavioral_component=result.behavioral.total_score,
-        achievement_component=result.achievement.total_score,
-        technical_completeness=result.technical.completeness,
-        behavioral_completeness=result.behavioral.completeness,
-        overall_data_quality=result.overall_data_quality,
-        # Flatten audit notes list to a single string for storage
-        audit_notes=" | ".join(result.audit_notes) if result.audit_notes else None
-    )
-    
+    # Persist the calculated RRI score, band, and component breakdowns,
+    # and move the current_rri snapshot to it in the same transaction.
+    values = _record_values(agniveer_id, result)
+    values["calculation_date"] = datetime.utcnow()
+    rri_record = models.RetentionReadiness(**values)
+
     db.add(rri_record)
+    db.flush()
+    _refresh_current_rri(db, [_snapshot_values(values, rri_record.id)])
     db.commit()
     db.refresh(rri_record)
-    
+
     return rri_record
+
+def calculate_rri_bulk(db: Session, agniveer_ids, progress_callback=None):
+    """
+    Recalculates RRI for many Agniveers at once.
+    Inputs are loaded with a few set-based queries per chunk of ids (instead of
+    three queries per soldier), grouped in memory, scored with the same domain
+    calculator as calculate_rri, and persisted with a single bulk insert + commit.
+    progress_callback(percent, message) is optional (used by background jobs).
+    """
+    started = time.perf_counter()
+    agniveer_ids = sorted(set(agniveer_ids))
+
+    latest_tech = {}
+    behav_by_id = {aid: [] for aid in agniveer_ids}
+    ach_by_id = {aid: [] for aid in agniveer_ids}
+
+    loaded = 0
+    for chunk in _chunks(agniveer_ids):
+        # 1. Latest technical assessment per Agniveer (same subquery pattern as analytics)
+        tech_sub = db.query(
+            models.TechnicalAssessment.agniveer_id,
+            func.max(models.TechnicalAssessment.assessment_date).label('max_date')
+        ).filter(
+            models.TechnicalAssessment.agniveer_id.in_(chunk)
+        ).group_by(models.TechnicalAssessment.agniveer_id).subquery()
+
+        tech_rows = db.query(models.TechnicalAssessment).join(
+            tech_sub,
+            (models.TechnicalAssessment.agniveer_id == tech_sub.c.agniveer_id) &
+            (models.TechnicalAssessment.assessment_date == tech_sub.c.max_date)
+        ).all()
+        for t in tech_rows:
+            # Two assessments on the same timestamp: keep the first one seen
+            latest_tech.setdefault(t.agniveer_id, t)
+
+        # 2. All behavioral assessments for the chunk
+        for b in db.query(models.BehavioralAssessment).filter(
+            models.BehavioralAssessment.agniveer_id.in_(chunk)
+        ).all():
+            behav_by_id[b.agniveer_id].append(_to_behavioral_input(b))
+
+        # 3. All achievements for the chunk
+        for a in db.query(models.Achievement).filter(
+            models.Achievement.agniveer_id.in_(chunk)
+        ).all():
+            ach_by_id[a.agniveer_id].append(_to_achievement_input(a))
+
+        loaded += len(chunk)
+        if progress_callback:
+            progress_callback(80 * loaded / len(agniveer_ids), f"Loaded inputs for {loaded}/{len(agniveer_ids)} Agniveers")
+
+    # 4. Calculate in memory
+    calculation_date = datetime.utcnow()
+    records = []
+    bands = {"green": 0, "amber": 0, "red": 0}
+    for aid in agniveer_ids:
+        result = _score(latest_tech.get(aid), behav_by_id[aid], ach_by_id[aid])
+        values = _record_values(aid, result)
+        values["calculation_date"] = calculation_date
+        records.append(values)
+        bands[result.retention_band.lower()] += 1
+
+    # 5. Save all records in one round trip, then update the snapshot table
+    # in the same transaction
+    if records:
+        inserted = db.execute(
+            insert(models.RetentionReadiness).returning(
+                models.RetentionReadiness.agniveer_id, models.RetentionReadiness.id
+            ),
+            records
+        ).all()
+        record_ids = {aid: rid for aid, rid in inserted}
+        _refresh_current_rri(db, [_snapshot_values(r, record_ids[r["agniveer_id"]]) for r in records])
+    db.commit()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "processed": len(records),
+        "calculation_date": calculation_date,
+        "duration_seconds": round(elapsed, 3),
+        "soldiers_per_second": round(len(records) / elapsed, 1) if elapsed > 0 else 0,
+        "band_distribution": bands
+    }
+
+def backfill_current_rri(db: Session) -> int:
+    """
+    Rebuilds the current_rri snapshot from the full retention_readiness history.
+    Needed once for databases that predate the snapshot table, and safe to re-run.
+    """
+    subquery = db.query(
+        models.RetentionReadiness.agniveer_id,
+        func.max(models.RetentionReadiness.calculation_date).label('max_date')
+    ).group_by(models.RetentionReadiness.agniveer_id).subquery()
+
+    latest = {}
+    for r in db.query(models.RetentionReadiness).join(
+        subquery,
+        (models.RetentionReadiness.agniveer_id == subquery.c.agniveer_id) &
+        (models.RetentionReadiness.calculation_date == subquery.c.max_date)
+    ).all():
+        # Same calculation_date twice (bulk runs): the later insert wins
+        if r.agniveer_id not in latest or r.id > latest[r.agniveer_id].id:
+            latest[r.agniveer_id] = r
+
+    snapshots = [_snapshot_values({
+        "agniveer_id": r.agniveer_id,
+        "calculation_date": r.calculation_date,
+        "rri_score": r.rri_score,
+        "retention_band": r.retention_band,
+        "technical_component": r.technical_component,
+        "behavioral_component": r.behavioral_component,
+        "achievement_component": r.achievement_component,
+        "overall_data_quality": r.overall_data_quality
+    }, r.id) for r in latest.values()]
+
+    db.query(models.CurrentRRI).delete(synchronize_session=False)
+    if snapshots:
+        db.bulk_insert_mappings(models.CurrentRRI, snapshots)
+    db.commit()
+    return len(snapshots)
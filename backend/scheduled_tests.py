@@ -0,0 +1,244 @@
+import csv
+import io
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+
+# Scheduled tests and their result sheets
+# Result rows are always read joined to their Agniveer (one query per sheet,
+# however many soldiers it has) and shaped by result_response(); test listings
+# take results_count from one grouped COUNT instead of loading the results.
+# Whole sheets are saved by save_results_bulk(): validated against the test's
+# roster, then written with a single INSERT ... ON CONFLICT (test_id,
+# agniveer_id) DO UPDATE in one transaction.
+BULK_RESULTS_MAX_ROWS = 5000
+
+# CSV header aliases -> BulkTestResultRow fields
+CSV_COLUMNS = {
+    "agniveer_id": "agniveer_id",
+    "service_id": "service_id", "service_no": "service_id", "service_number": "service_id",
+    "score": "score", "marks": "score",
+    "remarks": "remarks",
+    "is_absent": "is_absent", "absent": "is_absent",
+}
+
+def scheduled_test_response(test: models.ScheduledTest, results_count: int) -> dict:
+    return {
+        "id": test.id,
+        "name": test.name,
+        "test_type": test.test_type,
+        "description": test.description,
+        "scheduled_date": test.scheduled_date,
+        "end_time": test.end_time,
+        "location": test.location,
+        "target_type": test.target_type,
+        "target_value": test.target_value,
+        "instructor": test.instructor,
+        "max_marks": test.max_marks,
+        "passing_marks": test.passing_marks,
+        "created_by": test.created_by,
+        "created_at": test.created_at,
+        "status": test.status,
+        "results_count": results_count
+    }
+
+def result_response(result: models.TestResult, agniveer_name: Optional[str], agniveer_service_id: Optional[str]) -> dict:
+    return {
+        "id": result.id,
+        "test_id": result.test_id,
+        "agniveer_id": result.agniveer_id,
+        "score": result.score,
+        "remarks": result.remarks,
+        "is_absent": result.is_absent,
+        "recorded_at": result.recorded_at,
+        "recorded_by": result.recorded_by,
+        "agniveer_name": agniveer_name,
+        "agniveer_service_id": agniveer_service_id
+    }
+
+def list_tests(db: Session, target_type: str = None, target_value: str = None, status: str = None) -> List[dict]:
+    # Grouped count served from uq_test_results_test_agniveer (test_id leads it)
+    counts = (
+        db.query(models.TestResult.test_id, func.count(models.TestResult.id).label("results_count"))
+        .group_by(models.TestResult.test_id)
+        .subquery()
+    )
+    query = (
+        db.query(models.ScheduledTest, func.coalesce(counts.c.results_count, 0))
+        .outerjoin(counts, counts.c.test_id == models.ScheduledTest.id)
+    )
+    if target_type:
+        query = query.filter(models.ScheduledTest.target_type == target_type)
+    if target_value:
+        query = query.filter(models.ScheduledTest.target_value == target_value)
+    if status:
+        query = query.filter(models.ScheduledTest.status == status)
+
+    tests = query.order_by(models.ScheduledTest.scheduled_date.desc()).all()
+    return [scheduled_test_response(test, count) for test, count in tests]
+
+def count_results(db: Session, test_id: int) -> int:
+    return db.query(func.count(models.TestResult.id)).filter(models.TestResult.test_id == test_id).scalar()
+
+def _results_query(db: Session):
+    # Outer join: a result whose Agniveer was deleted still shows (without a name)
+    return (
+        db.query(models.TestResult, models.Agniveer.name, models.Agniveer.service_id)
+        .outerjoin(models.Agniveer, models.Agniveer.id == models.TestResult.agniveer_id)
+    )
+
+def list_results(db: Session, test_id: int) -> List[dict]:
+    rows = _results_query(db).filter(models.TestResult.test_id == test_id).order_by(models.TestResult.id).all()
+    return [result_response(*row) for row in rows]
+
+def save_result(db: Session, test_id: int, result: schemas.TestResultCreate, recorded_by: int) -> dict:
+    """Creates or updates the Agniveer's result for the test."""
+    # 1. Existing result and the Agniveer's name in one query
+    row = (
+        db.query(models.Agniveer.name, models.Agniveer.service_id, models.TestResult)
+        .select_from(models.Agniveer)
+        .outerjoin(models.TestResult, (models.TestResult.agniveer_id == models.Agniveer.id) &
+                   (models.TestResult.test_id == test_id))
+        .filter(models.Agniveer.id == result.agniveer_id)
+        .first()
+    )
+    name, service_id, db_result = row if row else (None, None, None)
+    if row is None:
+        # Unknown Agniveer: no name to show, but still look for an orphaned result
+        db_result = db.query(models.TestResult).filter(
+            models.TestResult.test_id == test_id,
+            models.TestResult.agniveer_id == result.agniveer_id
+        ).first()
+
+    # 2. Update or create
+    if db_result is None:
+        db_result = models.TestResult(test_id=test_id, agniveer_id=result.agniveer_id)
+        db.add(db_result)
+    db_result.score = result.score
+    db_result.remarks = result.remarks
+    db_result.is_absent = result.is_absent
+    db_result.recorded_by = recorded_by
+    db.commit()
+    db.refresh(db_result)
+    return result_response(db_result, name, service_id)
+
+def eligible_agniveers(db: Session, test: models.ScheduledTest, *columns):
+    """Query for the Agniveers a test applies to (target_type BATCH, COMPANY or ALL)."""
+    query = db.query(*columns) if columns else db.query(models.Agniveer)
+    if test.target_type == "BATCH":
+        query = query.filter(models.Agniveer.batch_no == test.target_value)
+    elif test.target_type == "COMPANY":
+        query = query.filter(models.Agniveer.company == test.target_value)
+    # "ALL" - no filter needed
+    return query
+
+def parse_result_csv(text: str) -> List[tuple]:
+    """
+    A CSV result sheet -> [(line_no, row dict)]. The header names the columns
+    (service_id or agniveer_id, score, remarks, is_absent; see CSV_COLUMNS);
+    empty cells are omitted so the row defaults apply.
+    """
+    reader = csv.reader(io.StringIO(text))
+    header = next(reader, None)
+    if not header:
+        raise ValueError("Empty file")
+    fields = [CSV_COLUMNS.get(h.strip().lower().replace(" ", "_").replace("-", "_")) for h in header]
+    if "agniveer_id" not in fields and "service_id" not in fields:
+        raise ValueError("Header must include a service_id or agniveer_id column")
+
+    rows = []
+    for line_no, cells in enumerate(reader, start=2):
+        if not any(cell.strip() for cell in cells):
+            continue
+        rows.append((line_no, {
+            field: cell.strip() for field, cell in zip(fields, cells) if field and cell.strip()
+        }))
+    return rows
+
+def save_results_bulk(db: Session, test_id: int, rows: List[tuple], recorded_by: int) -> Optional[schemas.BulkTestResultResponse]:
+    """
+    Validates and saves a result sheet: rows are (row_no, dict) pairs. Valid
+    rows are upserted together; invalid ones are reported and skipped.
+    Returns None when the test does not exist.
+
+    1. The test, its roster (id <-> service number) and the Agniveers already holding a result.
+    2. Per-row validation: known and eligible Agniveer, not repeated, score within max_marks.
+    3. One INSERT ... ON CONFLICT DO UPDATE for every valid row, one commit.
+    """
+    if len(rows) > BULK_RESULTS_MAX_ROWS:
+        raise ValueError(f"A sheet may have at most {BULK_RESULTS_MAX_ROWS} rows")
+    test = db.query(models.ScheduledTest).filter(models.ScheduledTest.id == test_id).first()
+    if not test:
+        return None
+
+    # 1. Roster and existing results
+    roster = dict(eligible_agniveers(db, test, models.Agniveer.id, models.Agniveer.service_id).all())
+    by_service_id = {service_id: agniveer_id for agniveer_id, service_id in roster.items()}
+    existing = {r[0] for r in db.query(models.TestResult.agniveer_id).filter(models.TestResult.test_id == test.id)}
+
+    # 2. Validate
+    outcomes, values, seen = [], [], set()
+    now = datetime.utcnow()
+    for row_no, data in rows:
+        outcome = schemas.BulkTestResultOutcome(row=row_no, status="error")
+        outcomes.append(outcome)
+        try:
+            row = schemas.BulkTestResultRow.model_validate(data)
+        except ValidationError as e:
+            error = e.errors()[0]
+            field = ".".join(str(p) for p in error["loc"])
+            outcome.error = f"{field}: {error['msg']}" if field else error["msg"]
+            continue
+        outcome.service_id = row.service_id
+
+        if row.agniveer_id is None and row.service_id is None:
+            outcome.error = "Missing service_id or agniveer_id"
+            continue
+        agniveer_id = row.agniveer_id if row.agniveer_id is not None else by_service_id.get(row.service_id)
+        if agniveer_id not in roster or (row.service_id is not None and roster[agniveer_id] != row.service_id):
+            outcome.error = f"Agniveer {row.service_id or row.agniveer_id} is not on this test's roster"
+            continue
+        outcome.agniveer_id, outcome.service_id = agniveer_id, roster[agniveer_id]
+        if agniveer_id in seen:
+            outcome.error = "Duplicate row for this Agniveer"
+            continue
+        if row.score is not None and (row.score < 0 or (test.max_marks is not None and row.score > test.max_marks)):
+            outcome.error = f"Score must be between 0 and {test.max_marks}"
+            continue
+
+        seen.add(agniveer_id)
+        outcome.status, outcome.error = ("updated" if agniveer_id in existing else "created"), None
+        values.append({
+            "test_id": test.id, "agniveer_id": agniveer_id, "score": row.score, "remarks": row.remarks,
+            "is_absent": row.is_absent, "recorded_by": recorded_by, "recorded_at": now
+        })
+
+    # 3. Upsert (uq_test_results_test_agniveer is the conflict target)
+    if values:
+        db.execute(_upsert(db), values)
+        db.commit()
+
+    created = sum(1 for o in outcomes if o.status == "created")
+    updated = sum(1 for o in outcomes if o.status == "updated")
+    return schemas.BulkTestResultResponse(
+        total=len(outcomes), created=created, updated=updated,
+        failed=len(outcomes) - created - updated, rows=outcomes
+    )
+
+def _upsert(db: Session):
+    table = models.TestResult.__table__
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    statement = insert(table)
+    # An updated result keeps its original recorded_at, as in save_result()
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.test_id, table.c.agniveer_id],
+        set_={column: statement.excluded[column] for column in ("score", "remarks", "is_absent", "recorded_by")}
+    )
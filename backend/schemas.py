@@ -1,7 +1,7 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 from datetime import datetime
-from .models import UserRole, AchievementType, RRIBand, MedicalCategory
+from .models import UserRole, AchievementType, RRIBand, MedicalCategory, JobStatus
 
 # User Schemas
 class UserBase(BaseModel):
@@ -175,10 +175,22 @@ class RRIResponse(BaseModel):
     achievement: Optional[dict] = None
     
     audit_notes: Optional[str] = None
-    
+
     class Config:
         from_attributes = True
 
+class RRIBandDistribution(BaseModel):
+    green: int = 0
+    amber: int = 0
+    red: int = 0
+
+class RRIBulkResult(BaseModel):
+    processed: int
+    calculation_date: datetime
+    duration_seconds: float
+    soldiers_per_second: float
+    band_distribution: RRIBandDistribution
+
 # Message Schemas
 
 
@@ -247,10 +259,20 @@ class InboxItem(BaseModel):
     is_read: bool
     priority: str
     is_starred: bool = False
+    # First characters of the body, only with ?preview=true
+    preview: Optional[str] = None
     
     class Config:
         from_attributes = True
 
+class MailPage(BaseModel):
+    """A folder page in cursor mode; pass next_cursor back as ?cursor= (null on the last page)"""
+    items: List[InboxItem]
+    next_cursor: Optional[str] = None
+
+class MailSearchHit(InboxItem):
+    rank: float # Higher is a better match
+
 class EmailDetail(InboxItem):
     body: str
 class LeaveCreate(BaseModel):
@@ -348,6 +370,28 @@ class TestResultResponse(TestResultCreate):
     class Config:
         from_attributes = True
 
+class BulkTestResultRow(BaseModel):
+    """One row of a result sheet; the Agniveer is given by id or service number."""
+    agniveer_id: Optional[int] = None
+    service_id: Optional[str] = None
+    score: Optional[float] = None
+    remarks: Optional[str] = None
+    is_absent: bool = False
+
+class BulkTestResultOutcome(BaseModel):
+    row: int # 1-based position in the sheet (CSV line number for CSV uploads)
+    agniveer_id: Optional[int] = None
+    service_id: Optional[str] = None
+    status: str # "created", "updated" or "error"
+    error: Optional[str] = None
+
+class BulkTestResultResponse(BaseModel):
+    total: int
+    created: int
+    updated: int
+    failed: int
+    rows: List[BulkTestResultOutcome]
+
 # ============================================================
 # COUNSELLING SCHEMAS
 # ============================================================
@@ -381,3 +425,23 @@ class CounsellingSessionResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+# Background Job Schemas
+class JobCreate(BaseModel):
+    job_type: str
+    payload: Dict[str, Any] = {}
+
+class JobResponse(BaseModel):
+    id: int
+    job_type: str
+    status: JobStatus
+    progress: int
+    message: Optional[str] = None
+    error: Optional[str] = None
+    created_by: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -1,5 +1,5 @@
 
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { User } from '../types';
 import CompanyOverview from './company/CompanyOverview';
 import CompanyAgniveers from './company/CompanyAgniveers';
@@ -117,6 +117,7 @@ const CompanyDashboard: React.FC<{ user: User }> = ({ user }) => {
   // AI State
   const [aiReport, setAiReport] = useState<{ name: string, content: string } | null>(null);
   const [isAnalyzing, setIsAnalyzing] = useState(false);
+  const aiStreamRef = useRef<EventSource | null>(null);
 
   // Admin Actions State
   const [companyLeaves, setCompanyLeaves] = useState<any[]>([]);
@@ -174,26 +175,47 @@ const CompanyDashboard: React.FC<{ user: User }> = ({ user }) => {
     } catch (e) { alert("Failed to send reply"); }
   };
 
+  const closeAiReport = () => {
+    aiStreamRef.current?.close();
+    aiStreamRef.current = null;
+    setAiReport(null);
+  };
+
   const handleAction = async (item: ActionItem) => {
     if (item.target === 'ai_report' && item.data?.agniveer_id) {
+      // Extract name from message for now or would ideally get from API
+      const nameMatch = item.message.match(/: (.*?) \(/);
+      const name = nameMatch ? nameMatch[1] : "Agniveer";
+
+      // Stream the briefing over SSE so text appears as the model writes it.
+      // Closing the modal closes the stream, which stops generation server-side.
+      aiStreamRef.current?.close();
+      setAiReport(null);
       setIsAnalyzing(true);
-      try {
-        const res = await fetch(`${API_BASE_URL}/api/ai/report/${item.data.agniveer_id}`, { method: 'POST' });
-        if (res.ok) {
-          const data = await res.json();
-          // Extract name from message for now or would ideally get from API
-          const nameMatch = item.message.match(/: (.*?) \(/);
-          const name = nameMatch ? nameMatch[1] : "Agniveer";
-          setAiReport({ name, content: data.report });
-        } else {
-          alert("AI Analysis failed. Ensure AI Service is active.");
-        }
-      } catch (e) {
-        console.error(e);
-        alert("Connection error to AI Service.");
-      } finally {
+      const source = new EventSource(`${API_BASE_URL}/api/ai/report/${item.data.agniveer_id}/stream`);
+      aiStreamRef.current = source;
+      let received = false;
+
+      source.addEventListener('token', (e) => {
+        const { text } = JSON.parse((e as MessageEvent).data);
+        received = true;
         setIsAnalyzing(false);
-      }
+        setAiReport(prev => ({ name, content: (prev ? prev.content : '') + text }));
+      });
+      source.addEventListener('done', () => {
+        source.close();
+        setIsAnalyzing(false);
+      });
+      source.addEventListener('error', (e) => {
+        source.close();
+        setIsAnalyzing(false);
+        const data = (e as MessageEvent).data;
+        if (data) {
+          alert(JSON.parse(data).detail || "AI Analysis failed. Ensure AI Service is active.");
+        } else if (!received) {
+          alert("Connection error to AI Service.");
+        }
+      });
     } else if (item.target === 'process_assessments') {
       // logic to open modal or scroll
       alert("Redirecting to Assessment Form...");
@@ -353,7 +375,7 @@ const CompanyDashboard: React.FC<{ user: User }> = ({ user }) => {
                   </div>
                   <p className="text-stone-400 text-sm">Analysis for <span className="text-white font-bold">{aiReport.name}</span></p>
                 </div>
-                <button onClick={() => setAiReport(null)} className="p-2 hover:bg-white/10 rounded-full transition-colors">
+                <button onClick={closeAiReport} className="p-2 hover:bg-white/10 rounded-full transition-colors">
                   <svg className="w-5 h-5" fill="none" stroke="currentColor" viewBox="0 0 24 24"><path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M6 18L18 6M6 6l12 12" /></svg>
                 </button>
               </div>
@@ -366,7 +388,7 @@ const CompanyDashboard: React.FC<{ user: User }> = ({ user }) => {
                 </div>
 
                 <div className="mt-8 flex gap-3 pt-6 border-t border-stone-200">
-                  <button onClick={() => setAiReport(null)} className="flex-1 py-3 font-bold text-stone-600 bg-white border border-stone-200 rounded-xl hover:bg-stone-50 transition-colors">
+                  <button onClick={closeAiReport} className="flex-1 py-3 font-bold text-stone-600 bg-white border border-stone-200 rounded-xl hover:bg-stone-50 transition-colors">
                     Close
                   </button>
                   <button onClick={() => alert("Report saved to dossier.")} className="flex-1 py-3 font-bold text-white bg-stone-900 rounded-xl hover:bg-black transition-colors flex items-center justify-center gap-2">
@@ -61,7 +61,7 @@ export const MailProvider: React.FC<{ user: User; children: React.ReactNode }> =
     const [stats, setStats] = useState<MailStats>({ inbox_unread: 0, inbox_total: 0, sent_total: 0, trash_total: 0 });
     const [selectedIds, setSelectedIds] = useState<Set<number>>(new Set());
     const [searchQuery, setSearchQuery] = useState('');
-    const [skip, setSkip] = useState(0);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
     const [hasMore, setHasMore] = useState(true);
     const [drafts, setDrafts] = useState<any[]>([]);
     const LIMIT = 20;
@@ -117,8 +117,9 @@ export const MailProvider: React.FC<{ user: User; children: React.ReactNode }> =
             if (folder === 'sent') endpoint = `${API_BASE_URL}/api/mail/sent`;
             if (folder === 'trash') endpoint = `${API_BASE_URL}/api/mail/trash`;
 
+            // Cursor pagination: an empty cursor asks for the first page
             const params = new URLSearchParams();
-            params.append('skip', reset ? '0' : skip.toString());
+            params.append('cursor', reset ? '' : (nextCursor ?? ''));
             params.append('limit', LIMIT.toString());
             if (searchQuery && folder === 'inbox') params.append('search', searchQuery);
 
@@ -126,15 +127,14 @@ export const MailProvider: React.FC<{ user: User; children: React.ReactNode }> =
                 headers: { Authorization: `Bearer ${token}` }
             });
             if (res.ok) {
-                const data = await res.json();
+                const data: { items: InboxItem[]; next_cursor: string | null } = await res.json();
                 if (reset) {
-                    setInbox(data);
-                    setSkip(LIMIT);
+                    setInbox(data.items);
                 } else {
-                    setInbox(prev => [...prev, ...data]);
-                    setSkip(prev => prev + LIMIT);
+                    setInbox(prev => [...prev, ...data.items]);
                 }
-                setHasMore(data.length === LIMIT);
+                setNextCursor(data.next_cursor);
+                setHasMore(data.next_cursor !== null);
                 setSelectedIds(new Set());
             }
         } catch (err) { console.error(err); } finally { setLoading(false); }
@@ -0,0 +1,94 @@
+"""
+Measures broadcast mail latency against recipient count.
+
+Builds the schema in a throwaway SQLite database (or uses DATABASE_URL when
+--live is passed, creating companies named Bench-<N>), adds one company per
+size with N Agniveers that have user accounts, then times
+MailService.send_email with target_company and counts SQL statements.
+
+Usage:
+    python scripts/benchmark_broadcast.py [--live] [--sizes 10,100,1000,5000] [--repeat 3]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Add parent directory to path so we can import 'backend'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import Session
+from backend import models, schemas
+from backend.mail_service import MailService
+
+
+def seed_company(db: Session, company: str, size: int):
+    """N Agniveers in `company`, each with a user account (skipped if already there)."""
+    existing = db.query(models.Agniveer.id).filter(models.Agniveer.company == company).count()
+    if existing >= size:
+        return
+    agniveer_ids = db.execute(
+        insert(models.Agniveer).returning(models.Agniveer.id),
+        [{"service_id": f"{company}-{i}", "name": f"Bench Agniveer {i}", "company": company} for i in range(size)]
+    ).scalars().all()
+    db.execute(insert(models.User), [
+        {"username": f"{company}-{i}", "password_hash": "x", "role": models.UserRole.AGNIVEER, "agniveer_id": aid}
+        for i, aid in enumerate(agniveer_ids)
+    ])
+    db.commit()
+
+
+def sender_id(db: Session) -> int:
+    sender = db.query(models.User).filter(models.User.username == "bench-sender").first()
+    if sender is None:
+        sender = models.User(username="bench-sender", password_hash="x", role=models.UserRole.CO, full_name="Bench CO")
+        db.add(sender)
+        db.commit()
+    return sender.user_id
+
+
+def benchmark(engine, sizes, repeat: int):
+    statements = [0]
+
+    def count(*args):
+        statements[0] += 1
+    event.listen(engine, "before_cursor_execute", count)
+
+    print(f"{'recipients':>10} {'median ms':>10} {'ms/recipient':>13} {'queries':>8}")
+    with Session(engine) as db:
+        sid = sender_id(db)
+        for size in sizes:
+            company = f"Bench-{size}"
+            seed_company(db, company, size)
+            email = schemas.EmailCreate(subject="Benchmark", body="Broadcast benchmark", target_company=company)
+
+            timings = []
+            for _ in range(repeat):
+                statements[0] = 0
+                started = time.perf_counter()
+                recipients = MailService.send_email(db, email, sid)
+                timings.append((time.perf_counter() - started) * 1000)
+            median = statistics.median(timings)
+            print(f"{len(recipients):>10} {median:>10.1f} {median / max(1, len(recipients)):>13.3f} {statements[0]:>8}")
+
+    event.remove(engine, "before_cursor_execute", count)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--live", action="store_true", help="use DATABASE_URL instead of a temporary SQLite file")
+    parser.add_argument("--sizes", default="10,100,1000,5000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.live:
+        from backend.database import engine
+    else:
+        path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+        engine = create_engine(f"sqlite:///{path}")
+        models.Base.metadata.create_all(bind=engine)
+
+    benchmark(engine, [int(s) for s in args.sizes.split(",")], args.repeat)
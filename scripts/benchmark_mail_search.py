@@ -0,0 +1,120 @@
+"""
+Measures mail search latency on a large mailbox corpus.
+
+Builds the schema in a throwaway SQLite database, generates --emails emails
+with --fanout recipients each (1M recipient rows by default) from a Zipf-like
+vocabulary, indexes them, then times mail_search.search() against the ILIKE
+fallback (the previous inbox filter) for rare, common, prefix and multi-word
+queries in an inbox and in a large Sent folder.
+
+Usage:
+    python scripts/benchmark_mail_search.py [--emails 100000] [--fanout 10] [--users 2000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add parent directory to path so we can import 'backend'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+from backend import mail_search, models
+from backend.mail_service import MailService
+
+SYLLABLES = ["ra", "ko", "ven", "dur", "mi", "sal", "tor", "pe", "lan", "gi", "shu", "mar", "ne", "dha", "bal", "iq"]
+QUERIES = ["parade", "lanmi", "ven", "range schedule", "firing", "medical camp"]
+
+
+def vocabulary(size: int, rng: random.Random):
+    words = {"parade", "range", "schedule", "firing", "medical", "camp", "leave", "roster"}
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def seed(db: Session, emails: int, fanout: int, users: int, batch: int = 5000):
+    rng = random.Random(42)
+    words = vocabulary(5000, rng)
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    rng.shuffle(weights)
+
+    user_ids = db.execute(insert(models.User).returning(models.User.user_id), [
+        {"username": f"search-bench-{i}", "password_hash": "x", "role": models.UserRole.AGNIVEER,
+         "full_name": f"{rng.choice(words).title()} {rng.choice(words).title()}"}
+        for i in range(users)
+    ]).scalars().all()
+    senders = {u.user_id: u for u in db.query(models.User).filter(models.User.user_id.in_(user_ids[:50]))}
+
+    started = datetime(2026, 1, 1)
+    for offset in range(0, emails, batch):
+        count = min(batch, emails - offset)
+        rows = []
+        for i in range(count):
+            rows.append({
+                "sender_id": rng.choice(list(senders)),
+                "subject": " ".join(rng.choices(words, weights, k=rng.randint(2, 6))).capitalize(),
+                "body": " ".join(rng.choices(words, weights, k=rng.randint(20, 80))),
+                "timestamp": started + timedelta(minutes=offset + i),
+                "priority": "Normal", "is_encrypted": False, "is_deleted_by_sender": False,
+            })
+        ids = db.execute(insert(models.InternalEmail).returning(models.InternalEmail.id), rows).scalars().all()
+        recipients = [rng.sample(user_ids, fanout) for _ in ids]
+        db.execute(insert(models.EmailRecipient), [
+            {"email_id": eid, "recipient_id": rid, "folder": "inbox", "is_read": False, "is_starred": False,
+             "email_timestamp": row["timestamp"]}
+            for eid, row, rids in zip(ids, rows, recipients) for rid in rids
+        ])
+        mail_search.index_emails(db, [
+            mail_search.document(eid, row["sender_id"], row["subject"], mail_search.sender_label(senders[row["sender_id"]]),
+                                 row["body"], rids)
+            for eid, row, rids in zip(ids, rows, recipients)
+        ])
+        db.commit()
+        print(f"  seeded {offset + count}/{emails} emails", end="\r", flush=True)
+    print()
+    return user_ids
+
+
+def timed(fn, repeat: int):
+    timings, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--emails", type=int, default=100000)
+    parser.add_argument("--fanout", type=int, default=10)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    engine = create_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(bind=engine)
+
+    with Session(engine) as db:
+        started = time.perf_counter()
+        user_ids = seed(db, args.emails, args.fanout, args.users)
+        print(f"Seeded {args.emails} emails / {args.emails * args.fanout} recipient rows "
+              f"in {time.perf_counter() - started:.0f}s")
+
+        # A typical inbox, and a sender's Sent folder (every 50th email: the large-mailbox case)
+        reader = user_ids[len(user_ids) // 2]
+        sender = user_ids[0]
+        print(f"{'query':<16} {'folder':<6} {'hits':>5} {'search ms':>10} {'ILIKE ms':>9}")
+        for q in QUERIES:
+            for folder, user_id in (("inbox", reader), ("sent", sender)):
+                search_ms, hits = timed(lambda: mail_search.search(db, user_id, q, folder=folder), args.repeat)
+                # The previous inbox search: substring match on subject/sender only, newest first
+                ilike_ms, _ = timed(lambda: MailService.search_fallback(db, user_id, q.split(), folder), args.repeat)
+                print(f"{q:<16} {folder:<6} {len(hits):>5} {search_ms:>10.1f} {ilike_ms:>9.1f}")
@@ -0,0 +1,119 @@
+"""
+Asserts that the hot endpoint queries use an index on SQLite.
+
+Builds the schema from backend.models in a throwaway in-memory database (or
+uses DATABASE_URL when --live is passed), runs EXPLAIN QUERY PLAN for each
+query and fails if its target table is scanned without an index.
+
+Usage:
+    python scripts/check_query_plans.py [--live]
+"""
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Add parent directory to path so we can import 'backend'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func, tuple_
+from sqlalchemy.orm import Session
+from backend import models
+
+
+def hot_queries(db: Session):
+    """(description, target table, query) for each hot predicate."""
+    since = datetime.utcnow() - timedelta(hours=1)
+    return [
+        ("mail inbox", "email_recipients",
+         db.query(models.EmailRecipient).filter(
+             models.EmailRecipient.recipient_id == 1,
+             models.EmailRecipient.folder == "inbox")),
+        ("mail folder page", "email_recipients",
+         db.query(models.EmailRecipient.email_id).filter(
+             models.EmailRecipient.recipient_id == 1,
+             models.EmailRecipient.folder == "inbox",
+             tuple_(models.EmailRecipient.email_timestamp, models.EmailRecipient.email_id) < tuple_(since, 100)
+         ).order_by(models.EmailRecipient.email_timestamp.desc(), models.EmailRecipient.email_id.desc()).limit(20)),
+        ("sent folder page", "internal_emails",
+         db.query(models.InternalEmail.id).filter(
+             models.InternalEmail.sender_id == 1,
+             models.InternalEmail.is_deleted_by_sender == False,
+             tuple_(models.InternalEmail.timestamp, models.InternalEmail.id) < tuple_(since, 100)
+         ).order_by(models.InternalEmail.timestamp.desc(), models.InternalEmail.id.desc()).limit(20)),
+        ("mail unread count", "email_recipients",
+         db.query(func.count(models.EmailRecipient.id)).filter(
+             models.EmailRecipient.recipient_id == 1,
+             models.EmailRecipient.folder == "inbox",
+             models.EmailRecipient.is_read == False)),
+        ("latest RRI", "retention_readiness",
+         db.query(models.RetentionReadiness).filter(
+             models.RetentionReadiness.agniveer_id == 1
+         ).order_by(models.RetentionReadiness.calculation_date.desc()).limit(1)),
+        ("latest technical assessment", "technical_assessments",
+         db.query(models.TechnicalAssessment).filter(
+             models.TechnicalAssessment.agniveer_id == 1
+         ).order_by(models.TechnicalAssessment.assessment_date.desc()).limit(1)),
+        ("behavioral by quarter", "behavioral_assessments",
+         db.query(models.BehavioralAssessment.agniveer_id).filter(
+             models.BehavioralAssessment.agniveer_id == 1,
+             models.BehavioralAssessment.quarter == "Q1 2026")),
+        ("company roster", "agniveers",
+         db.query(models.Agniveer.id).filter(models.Agniveer.company == "Alpha")),
+        ("batch roster", "agniveers",
+         db.query(models.Agniveer.id).filter(models.Agniveer.batch_no == "Batch-2024-A")),
+        ("broadcast recipients", "users_auth",
+         db.query(models.User.user_id)
+         .join(models.Agniveer, models.User.agniveer_id == models.Agniveer.id)
+         .filter(models.Agniveer.company == "Alpha")),
+        ("rate limit window", "rate_limit_windows",
+         db.query(models.RateLimitWindow.count).filter(
+             models.RateLimitWindow.key == "send_mail:user:1",
+             models.RateLimitWindow.window_start >= 0)),
+        ("test result upsert lookup", "test_results",
+         db.query(models.TestResult).filter(
+             models.TestResult.test_id == 1,
+             models.TestResult.agniveer_id == 1)),
+        ("test result sheet", "test_results",
+         db.query(models.TestResult, models.Agniveer.name)
+         .outerjoin(models.Agniveer, models.Agniveer.id == models.TestResult.agniveer_id)
+         .filter(models.TestResult.test_id == 1)),
+    ]
+
+
+def explain(db: Session, query):
+    compiled = query.statement.compile(dialect=db.bind.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = db.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params).all()
+    return [row[-1] for row in rows]
+
+
+def uses_index(plan, table):
+    # Each plan line reads like "SEARCH email_recipients USING INDEX ix_... (recipient_id=? AND ...)"
+    # or "SCAN agniveers" for a full table scan.
+    lines = [line for line in plan if f" {table}" in f" {line}"]
+    return bool(lines) and all("USING" in line and "INDEX" in line or "PRIMARY KEY" in line for line in lines)
+
+
+def check_query_plans(live: bool = False) -> bool:
+    if live:
+        from backend.database import engine
+    else:
+        engine = create_engine("sqlite://")
+        models.Base.metadata.create_all(bind=engine)
+
+    if engine.dialect.name != "sqlite":
+        print(f"EXPLAIN QUERY PLAN check only supports SQLite (got {engine.dialect.name}).")
+        return False
+
+    ok = True
+    with Session(engine) as db:
+        for description, table, query in hot_queries(db):
+            plan = explain(db, query)
+            passed = uses_index(plan, table)
+            ok = ok and passed
+            print(f"[{'OK' if passed else 'FAIL'}] {description}: {' | '.join(plan)}")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check_query_plans(live="--live" in sys.argv) else 1)
@@ -0,0 +1,127 @@
+"""
+WebSocket notification load test.
+
+Creates N Agniveer user accounts in company WS-Bench (directly in DATABASE_URL,
+which must be the database the running server uses), opens one WebSocket per
+user against /ws/mail/{user_id}, then sends company broadcasts through
+/api/mail/send and measures, for every client, the time from the send request
+to the 'new_mail' notification arriving.
+
+Usage:
+    python scripts/load_test_ws.py [--clients 2000] [--rounds 3] [--server http://localhost:8000]
+"""
+import argparse
+import asyncio
+import os
+import resource
+import statistics
+import sys
+import time
+
+# Add parent directory to path so we can import 'backend'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import websockets
+from sqlalchemy.orm import Session
+from backend import models
+from backend.database import engine
+from benchmark_broadcast import seed_company
+
+COMPANY = "WS-Bench"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def bench_user_ids(clients: int):
+    with Session(engine) as db:
+        seed_company(db, COMPANY, clients)
+        rows = (
+            db.query(models.User.user_id)
+            .join(models.Agniveer, models.User.agniveer_id == models.Agniveer.id)
+            .filter(models.Agniveer.company == COMPANY)
+            .order_by(models.User.user_id)
+            .limit(clients)
+            .all()
+        )
+    return [r[0] for r in rows]
+
+
+async def open_clients(ws_base: str, user_ids, connect_concurrency: int = 200):
+    gate = asyncio.Semaphore(connect_concurrency)
+
+    async def connect(user_id):
+        async with gate:
+            return await websockets.connect(f"{ws_base}/ws/mail/{user_id}", max_queue=None, open_timeout=30)
+    return await asyncio.gather(*[connect(uid) for uid in user_ids])
+
+
+async def wait_for_new_mail(ws, timeout: float):
+    deadline = time.perf_counter() + timeout
+    while True:
+        message = await asyncio.wait_for(ws.recv(), max(0.001, deadline - time.perf_counter()))
+        if "new_mail" in message:
+            return time.perf_counter()
+
+
+async def run(server: str, clients: int, rounds: int, timeout: float):
+    user_ids = bench_user_ids(clients)
+    ws_base = server.replace("http", "ws", 1)
+
+    async with httpx.AsyncClient(base_url=server, timeout=60) as http:
+        login = await http.post("/api/auth/login", json={"username": "admin", "password": "admin"})
+        login.raise_for_status()
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        started = time.perf_counter()
+        sockets = await open_clients(ws_base, user_ids)
+        print(f"Opened {len(sockets)} WebSocket clients in {time.perf_counter() - started:.1f}s")
+
+        try:
+            for round_no in range(1, rounds + 1):
+                waiters = [asyncio.create_task(wait_for_new_mail(ws, timeout)) for ws in sockets]
+                await asyncio.sleep(0.1)  # let every waiter reach recv()
+
+                sent_at = time.perf_counter()
+                response = await http.post("/api/mail/send", headers=headers, json={
+                    "subject": f"Load test round {round_no}", "body": "WebSocket fan-out load test",
+                    "target_company": COMPANY
+                })
+                http_ms = (time.perf_counter() - sent_at) * 1000
+                response.raise_for_status()
+
+                results = await asyncio.gather(*waiters, return_exceptions=True)
+                latencies = [(r - sent_at) * 1000 for r in results if isinstance(r, float)]
+                missed = len(results) - len(latencies)
+                if not latencies:
+                    print(f"round {round_no}: no notifications received ({missed} missed)")
+                    continue
+                print(
+                    f"round {round_no}: recipients={response.json()} http={http_ms:.0f}ms "
+                    f"p50={percentile(latencies, 50):.0f}ms p90={percentile(latencies, 90):.0f}ms "
+                    f"p99={percentile(latencies, 99):.0f}ms max={max(latencies):.0f}ms "
+                    f"mean={statistics.mean(latencies):.0f}ms missed={missed}"
+                )
+        finally:
+            await asyncio.gather(*[ws.close() for ws in sockets], return_exceptions=True)
+
+        stats = await http.get("/api/ws/stats")
+        print(f"server: {stats.json()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--server", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for each notification")
+    args = parser.parse_args()
+
+    # Thousands of sockets need more than the default 1024 descriptors
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    asyncio.run(run(args.server, args.clients, args.rounds, args.timeout))
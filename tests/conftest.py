@@ -22,3 +22,92 @@ def admin_token(base_url):
 def auth_headers(admin_token):
     """Returns headers with the admin token."""
     return {"Authorization": f"Bearer {admin_token}", "Content-Type": "application/json"}
+
+
+class FakeOllama:
+    """
+    Minimal stand-in for the Ollama /api/generate endpoint, served from a thread.
+    Each generation sleeps `delay` seconds; peak concurrency and request count are
+    recorded so tests can check queueing behaviour offline.
+    """
+    def __init__(self, delay=0.2, response_text="SITUATION: Test briefing."):
+        import threading
+        self.delay = delay
+        self.response_text = response_text
+        self.requests = 0
+        self.active = 0
+        self.peak_active = 0
+        self._lock = threading.Lock()
+        self.server = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/api/generate"
+
+    def start(self):
+        import json
+        import threading
+        import time
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with fake._lock:
+                    fake.requests += 1
+                    fake.active += 1
+                    fake.peak_active = max(fake.peak_active, fake.active)
+                try:
+                    if body.get("stream"):
+                        # Newline-delimited JSON chunks, like Ollama
+                        words = fake.response_text.split(" ")
+                        self.send_response(200)
+                        self.send_header("Content-Type", "application/x-ndjson")
+                        self.send_header("Transfer-Encoding", "chunked")
+                        self.end_headers()
+                        for i, word in enumerate(words):
+                            time.sleep(fake.delay / len(words))
+                            token = word if i == 0 else " " + word
+                            self._chunk(json.dumps({"response": token, "done": False}) + "\n")
+                        self._chunk(json.dumps({"response": "", "done": True}) + "\n")
+                        self._chunk("")
+                    else:
+                        time.sleep(fake.delay)
+                        data = json.dumps({"response": fake.response_text, "done": True}).encode()
+                        self.send_response(200)
+                        self.send_header("Content-Type", "application/json")
+                        self.send_header("Content-Length", str(len(data)))
+                        self.end_headers()
+                        self.wfile.write(data)
+                finally:
+                    with fake._lock:
+                        fake.active -= 1
+
+            def _chunk(self, text):
+                data = text.encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def fake_ollama():
+    """Offline fake Ollama server; yields a FakeOllama with .url and counters."""
+    fake = FakeOllama().start()
+    yield fake
+    fake.stop()
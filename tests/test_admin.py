@@ -1,6 +1,8 @@
 
 import requests
 import pytest
+import uuid
+import time
 
 def test_get_policies(base_url, auth_headers):
     response = requests.get(f"{base_url}/policies", headers=auth_headers)
@@ -13,3 +15,115 @@ def test_get_audit_logs(base_url, auth_headers):
 def test_system_stats(base_url, auth_headers):
     response = requests.get(f"{base_url}/admin/stats", headers=auth_headers)
     assert response.status_code in [200, 404]
+
+def test_auth_cache_stats_and_invalidation(base_url, auth_headers):
+    # Temporary user whose cached session must stop working once deleted
+    username = f"cache_probe_{uuid.uuid4().hex[:8]}"
+    created = requests.post(f"{base_url}/admin/users", headers=auth_headers, json={
+        "username": username, "password": "probe-pass", "role": "coy_clk"
+    })
+    assert created.status_code == 200
+    user_id = created.json()["user_id"]
+
+    token = requests.post(f"{base_url}/auth/login", json={"username": username, "password": "probe-pass"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    assert requests.get(f"{base_url}/mail/unread-count", headers=headers).status_code == 200
+    assert requests.get(f"{base_url}/mail/unread-count", headers=headers).status_code == 200
+
+    stats = requests.get(f"{base_url}/admin/auth-cache/stats", headers=auth_headers)
+    assert stats.status_code == 200
+    assert stats.json()["hits"] >= 1
+    assert requests.get(f"{base_url}/admin/auth-cache/stats", headers=headers).status_code == 403
+
+    assert requests.delete(f"{base_url}/admin/users/{user_id}", headers=auth_headers).status_code == 200
+    assert requests.get(f"{base_url}/mail/unread-count", headers=headers).status_code == 401
+
+def test_bulk_upload_reports_row_errors(base_url, auth_headers):
+    tag = uuid.uuid4().hex[:6].upper()
+    csv_lines = [
+        "Batch No,Service No,Name,Photo URL,Reporting Date,DoB,NOK Name,NOK Phone,Address,Bank Name,Bank Branch,Bank Account,PAN,Adhaar,Qualification,Coy",
+        f"B-{tag},BU{tag}1,Recruit One,,01-02-2026,05-06-2004,,,,,,,,,,Delta",
+        f"B-{tag},BU{tag}2,Recruit Two,,2026-02-01,,,,,,,,,,,Delta",
+        f"B-{tag},BU{tag}1,Recruit One Again,,,,,,,,,,,,,Delta",
+        f"B-{tag},BU{tag}3,Bad DoB,,,31-31-2004,,,,,,,,,,Delta",
+    ]
+    headers = {"Authorization": auth_headers["Authorization"]}
+    response = requests.post(f"{base_url}/admin/bulk-upload", headers=headers,
+                             files={"file": ("intake.csv", "\n".join(csv_lines))})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_processed"] == 4
+    assert data["successful"] == 2
+    assert data["failed"] == 2
+    assert data["errors"][0].startswith("Row 4: Duplicate Service ID")
+    assert data["errors"][1].startswith("Row 5:")
+
+    # Re-uploading the same recruits is rejected row by row
+    again = requests.post(f"{base_url}/admin/bulk-upload", headers=headers,
+                          files={"file": ("intake.csv", "\n".join(csv_lines[:3]))}).json()
+    assert again["successful"] == 0
+    assert again["failed"] == 2
+
+    # Accounts are created with Service ID / Service ID credentials and linked to the profile
+    login = requests.post(f"{base_url}/auth/login", json={"username": f"BU{tag}1", "password": f"BU{tag}1"})
+    assert login.status_code == 200
+    assert login.json()["agniveer_id"] is not None
+
+def _wait_for_job(base_url, auth_headers, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = requests.get(f"{base_url}/jobs/{job_id}", headers=auth_headers).json()
+        if job["status"] not in ("QUEUED", "RUNNING"):
+            return job
+        time.sleep(0.2)
+    pytest.fail(f"Job {job_id} did not finish in {timeout}s")
+
+def test_rri_recalculate_job(base_url, auth_headers):
+    response = requests.post(f"{base_url}/jobs", headers=auth_headers, json={
+        "job_type": "rri_recalculate", "payload": {"company": "Alpha"}
+    })
+    assert response.status_code == 202
+    job = _wait_for_job(base_url, auth_headers, response.json()["id"])
+    assert job["status"] == "COMPLETED"
+    assert job["progress"] == 100
+
+    result = requests.get(f"{base_url}/jobs/{job['id']}/result", headers=auth_headers).json()
+    bands = result["band_distribution"]
+    assert bands["green"] + bands["amber"] + bands["red"] == result["processed"]
+
+def test_bulk_upload_job(base_url, auth_headers):
+    tag = uuid.uuid4().hex[:6].upper()
+    csv_text = "\n".join([
+        "Batch No,Service No,Name",
+        f"B-{tag},BJ{tag}1,Recruit One",
+        f"B-{tag},BJ{tag}1,Recruit One Again",
+    ])
+    headers = {"Authorization": auth_headers["Authorization"]}
+    response = requests.post(f"{base_url}/jobs/bulk-upload", headers=headers,
+                             files={"file": ("intake.csv", csv_text)})
+    assert response.status_code == 202
+    job = _wait_for_job(base_url, auth_headers, response.json()["id"])
+    assert job["status"] == "COMPLETED"
+
+    result = requests.get(f"{base_url}/jobs/{job['id']}/result", headers=auth_headers).json()
+    assert result["successful"] == 1
+    assert result["failed"] == 1
+
+def test_unknown_job_type(base_url, auth_headers):
+    response = requests.post(f"{base_url}/jobs", headers=auth_headers, json={"job_type": "format_disk"})
+    assert response.status_code == 400
+
+def test_system_jobs_require_admin(base_url, auth_headers):
+    username = f"job_probe_{uuid.uuid4().hex[:8]}"
+    created = requests.post(f"{base_url}/admin/users", headers=auth_headers, json={
+        "username": username, "password": "probe-pass", "role": "coy_cdr"
+    })
+    assert created.status_code == 200
+    try:
+        token = requests.post(f"{base_url}/auth/login", json={"username": username, "password": "probe-pass"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        for job_type in ("rri_recalculate", "mail_search_rebuild", "mail_reencrypt"):
+            response = requests.post(f"{base_url}/jobs", headers=headers, json={"job_type": job_type, "payload": {}})
+            assert response.status_code == 403
+    finally:
+        requests.delete(f"{base_url}/admin/users/{created.json()['user_id']}", headers=auth_headers)
@@ -0,0 +1,69 @@
+from concurrent.futures.process import BrokenProcessPool
+
+from backend import admin_service
+
+
+class BrokenPool:
+    """A process pool whose workers die after producing `survive` results."""
+
+    def __init__(self, survive):
+        self.survive = survive
+
+    def __call__(self, max_workers=None):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def map(self, fn, items, chunksize=1):
+        for i, item in enumerate(items):
+            if i == self.survive:
+                raise BrokenProcessPool("worker died")
+            yield fn(item)
+
+
+def test_hash_passwords_falls_back_inline_when_the_pool_breaks(monkeypatch):
+    monkeypatch.setattr(admin_service, "get_password_hash", lambda p: f"hash:{p}")
+    monkeypatch.setattr(admin_service, "BULK_HASH_MIN_PARALLEL", 1)
+    passwords = [f"pw{i}" for i in range(120)]
+
+    for survive in (0, 60):
+        monkeypatch.setattr(admin_service, "ProcessPoolExecutor", BrokenPool(survive))
+        progress = []
+        hashes = admin_service._hash_passwords(passwords, on_hashed=progress.append)
+        assert hashes == [f"hash:{p}" for p in passwords]
+        assert progress == [50, 100]
+
+    def no_processes(max_workers=None):
+        raise OSError("fork not permitted")
+    monkeypatch.setattr(admin_service, "ProcessPoolExecutor", no_processes)
+    assert admin_service._hash_passwords(passwords[:3]) == ["hash:pw0", "hash:pw1", "hash:pw2"]
+
+
+def test_bulk_upload_errors_are_reported_in_file_order(monkeypatch):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from backend import models
+
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    monkeypatch.setattr(admin_service, "get_password_hash", lambda p: f"hash:{p}")
+    db.add(models.Agniveer(service_id="S3", name="Existing"))
+    db.commit()
+
+    csv_text = "\n".join([
+        "Batch No,Service No,Name",
+        "B1,S1,One",
+        "B1,S3,Clashes with the database",      # found in step 2
+        "B1,S4,Bad dob,,,01-01-2001 10:00",     # parse error, message contains ':'
+        "B1,S1,Duplicate in file",              # found in step 1
+        "B1,,No service id",
+    ])
+    result = admin_service.process_bulk_upload_agniveers(db, csv_text, admin_id=None)
+    assert result.successful == 1 and result.failed == 4
+    assert [e.split(":")[0] for e in result.errors] == ["Row 3", "Row 4", "Row 5", "Row 6"]
+    assert result.errors[0] == "Row 3: Duplicate Service ID S3"
@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend import ai_service
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_generate_report_against_fake_server(fake_ollama):
+    async def scenario():
+        client = ai_service.OllamaClient(url=fake_ollama.url)
+        try:
+            return await ai_service.generate_rri_report("Test Agniveer", {"rri_score": 72}, client=client)
+        finally:
+            await client.aclose()
+
+    assert run(scenario()) == fake_ollama.response_text
+    assert fake_ollama.requests == 1
+
+
+def test_concurrency_limit_and_queue_backpressure(fake_ollama):
+    fake_ollama.delay = 0.3
+
+    async def scenario():
+        client = ai_service.OllamaClient(url=fake_ollama.url, max_concurrency=2, max_queue=2)
+        try:
+            results = await asyncio.gather(
+                *[client.generate(ai_service.build_payload("p")) for _ in range(6)],
+                return_exceptions=True
+            )
+            return results, client.stats()
+        finally:
+            await client.aclose()
+
+    started = time.monotonic()
+    results, stats = run(scenario())
+    elapsed = time.monotonic() - started
+
+    rejected = [r for r in results if isinstance(r, ai_service.AIQueueFull)]
+    served = [r for r in results if isinstance(r, dict)]
+    # 2 running + 2 queued are served, the rest is rejected with a retry hint
+    assert len(served) == 4
+    assert len(rejected) == 2
+    assert all(r.retry_after >= 1 for r in rejected)
+    assert fake_ollama.peak_active == 2
+    assert stats["completed"] == 4 and stats["rejected"] == 2
+    # Two waves of two concurrent generations
+    assert elapsed < 4 * fake_ollama.delay
+
+
+def test_clients_on_separate_loops_share_model_slots(fake_ollama):
+    # e.g. the API's client and a warm-up job's client on a worker thread
+    fake_ollama.delay = 0.3
+    slots = threading.BoundedSemaphore(2)
+
+    def worker():
+        async def scenario():
+            client = ai_service.OllamaClient(url=fake_ollama.url, max_concurrency=2, model_slots=slots)
+            try:
+                await asyncio.gather(*[client.generate(ai_service.build_payload("p")) for _ in range(2)])
+            finally:
+                await client.aclose()
+        run(scenario())
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert fake_ollama.requests == 4
+    assert fake_ollama.peak_active == 2
+
+
+def test_unreachable_server_returns_message():
+    async def scenario():
+        client = ai_service.OllamaClient(url="http://127.0.0.1:9/api/generate", connect_timeout=1)
+        try:
+            return await ai_service.generate_rri_report("Test Agniveer", {}, client=client)
+        finally:
+            await client.aclose()
+
+    assert run(scenario()).startswith("Connection Failed")
+
+
+def test_read_timeout(fake_ollama):
+    fake_ollama.delay = 1.0
+
+    async def scenario():
+        client = ai_service.OllamaClient(url=fake_ollama.url, read_timeout=0.2)
+        try:
+            return await ai_service.generate_rri_report("Test Agniveer", {}, client=client)
+        finally:
+            await client.aclose()
+
+    assert "did not respond" in run(scenario())
+
+
+def test_stream_yields_tokens_before_generation_finishes(fake_ollama):
+    fake_ollama.delay = 1.0
+
+    async def scenario():
+        client = ai_service.OllamaClient(url=fake_ollama.url)
+        started = time.monotonic()
+        first_token_at = None
+        tokens = []
+        try:
+            async for token in client.stream(ai_service.build_payload("p")):
+                if first_token_at is None:
+                    first_token_at = time.monotonic() - started
+                tokens.append(token)
+            return tokens, first_token_at, client.stats()
+        finally:
+            await client.aclose()
+
+    tokens, first_token_at, stats = run(scenario())
+    assert "".join(tokens) == fake_ollama.response_text
+    assert len(tokens) > 1
+    assert first_token_at < fake_ollama.delay
+    assert stats["completed"] == 1 and stats["in_flight"] == 0
+
+
+def test_stream_cancellation_closes_upstream(fake_ollama):
+    fake_ollama.delay = 3.0
+    fake_ollama.response_text = " ".join(f"word{i}" for i in range(30))
+
+    async def scenario():
+        client = ai_service.OllamaClient(url=fake_ollama.url)
+        try:
+            stream = client.stream(ai_service.build_payload("p"))
+            async for _ in stream:
+                break
+            # Same path as a client disconnect: the generator is closed mid-stream
+            await stream.aclose()
+            return client.stats()
+        finally:
+            await client.aclose()
+
+    stats = run(scenario())
+    assert stats["in_flight"] == 0
+    assert stats["cancelled"] == 1 and stats["failed"] == 0
+    # The fake server notices the closed connection on its next write
+    deadline = time.monotonic() + 2
+    while fake_ollama.active and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert fake_ollama.active == 0
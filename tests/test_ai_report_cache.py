@@ -0,0 +1,67 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import models, ai_service, ai_report_cache
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def payload_for(name, rri_score):
+    return ai_service.build_payload(ai_service.build_rri_prompt(name, {"rri_score": rri_score}))
+
+
+def test_cache_key_is_content_addressed():
+    assert ai_report_cache.cache_key(payload_for("A", 70)) == ai_report_cache.cache_key(payload_for("A", 70))
+    # Streaming vs non-streaming produce the same briefing
+    assert ai_report_cache.cache_key(payload_for("A", 70)) == ai_report_cache.cache_key(
+        ai_service.build_payload(ai_service.build_rri_prompt("A", {"rri_score": 70}), stream=True))
+    # Any change in the inputs, model or options is a different entry
+    assert ai_report_cache.cache_key(payload_for("A", 70)) != ai_report_cache.cache_key(payload_for("A", 71))
+    changed_options = payload_for("A", 70)
+    changed_options["options"]["temperature"] = 0.9
+    assert ai_report_cache.cache_key(changed_options) != ai_report_cache.cache_key(payload_for("A", 70))
+
+
+def test_store_and_hit(db, monkeypatch):
+    key = ai_report_cache.cache_key(payload_for("A", 70))
+    assert ai_report_cache.get_cached_report(db, key) is None
+
+    ai_report_cache.store_report(db, key, None, ai_service.MODEL_NAME, "briefing")
+    stored_at = db.query(models.AIReportCache).one().last_accessed_at
+    entry = ai_report_cache.get_cached_report(db, key)
+    assert entry.report == "briefing"
+    # A hit on a recently used entry writes nothing
+    assert not db.dirty
+    db.expire_all()
+    assert entry.hit_count == 0 and entry.last_accessed_at == stored_at
+
+    # Once the entry is older than the touch interval, the tallied hits are written
+    monkeypatch.setattr(ai_report_cache, "AI_REPORT_CACHE_TOUCH_SECONDS", 0)
+    entry = ai_report_cache.get_cached_report(db, key)
+    db.expire_all()
+    assert entry.hit_count == 2 and entry.last_accessed_at > stored_at
+
+
+def test_lru_eviction(db, monkeypatch):
+    monkeypatch.setattr(ai_report_cache, "AI_REPORT_CACHE_MAX_ENTRIES", 2)
+    monkeypatch.setattr(ai_report_cache, "AI_REPORT_CACHE_TOUCH_SECONDS", 0)
+    keys = [ai_report_cache.cache_key(payload_for("A", score)) for score in (1, 2, 3)]
+
+    ai_report_cache.store_report(db, keys[0], None, "m", "r0")
+    ai_report_cache.store_report(db, keys[1], None, "m", "r1")
+    # Touch the oldest so the second one becomes least recently used
+    ai_report_cache.get_cached_report(db, keys[0])
+    ai_report_cache.store_report(db, keys[2], None, "m", "r2")
+
+    assert db.query(models.AIReportCache).count() == 2
+    assert ai_report_cache.get_cached_report(db, keys[1]) is None
+    assert ai_report_cache.get_cached_report(db, keys[0]).report == "r0"
+    assert ai_report_cache.get_cached_report(db, keys[2]).report == "r2"
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import models, ai_service, ai_report_cache, ai_warmup
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def add_soldier(db, service_id, company, score, band):
+    agniveer = models.Agniveer(service_id=service_id, name=f"Agniveer {service_id}", company=company)
+    db.add(agniveer)
+    db.flush()
+    rri = models.RetentionReadiness(
+        agniveer_id=agniveer.id, calculation_date=datetime.utcnow(), rri_score=score, retention_band=band,
+        technical_component=score / 2, behavioral_component=10, achievement_component=5,
+        technical_completeness=1.0, behavioral_completeness=1.0, overall_data_quality=1.0
+    )
+    db.add(rri)
+    db.flush()
+    db.add(models.CurrentRRI(
+        agniveer_id=agniveer.id, rri_record_id=rri.id, calculation_date=rri.calculation_date,
+        rri_score=score, retention_band=band, technical_component=rri.technical_component,
+        behavioral_component=10, achievement_component=5, overall_data_quality=1.0
+    ))
+    db.commit()
+    return agniveer, rri
+
+
+def test_window_parsing():
+    window = ai_warmup.parse_window("23:00-04:00")
+    assert ai_warmup.in_window(datetime(2026, 1, 1, 23, 30), window)
+    assert ai_warmup.in_window(datetime(2026, 1, 1, 3, 59), window)
+    assert not ai_warmup.in_window(datetime(2026, 1, 1, 12, 0), window)
+    assert ai_warmup.seconds_until_window(datetime(2026, 1, 1, 22, 0), window) == 3600
+    assert ai_warmup.window_end(datetime(2026, 1, 1, 23, 30), window) == datetime(2026, 1, 2, 4, 0)
+    assert ai_warmup.parse_window("") is None
+
+
+def test_warmup_generates_watchlist_briefings(db, fake_ollama, monkeypatch):
+    monkeypatch.setattr(ai_service, "OLLAMA_URL", fake_ollama.url)
+    fake_ollama.delay = 0.1
+    red, red_rri = add_soldier(db, "A1", "Alpha", 30, models.RRIBand.RED)
+    add_soldier(db, "A2", "Alpha", 55, models.RRIBand.AMBER)
+    add_soldier(db, "A3", "Alpha", 85, models.RRIBand.GREEN)
+    add_soldier(db, "B1", "Bravo", 35, models.RRIBand.RED)
+
+    result = ai_warmup.warm_briefings(db, bands=["RED", "AMBER"], max_per_company=5, concurrency=4)
+    assert result["candidates"] == 3
+    assert result["per_company"] == {"Alpha": 2, "Bravo": 1}
+    assert result["generated"] == 3 and result["failed"] == 0
+    # Capped below OLLAMA_MAX_CONCURRENCY, leaving a slot for interactive requests
+    assert fake_ollama.peak_active <= max(1, ai_service.OLLAMA_MAX_CONCURRENCY - 1)
+
+    # The report endpoint builds the same payload, so the click is a cache hit
+    payload = ai_service.build_payload(ai_service.build_rri_prompt(red.name, ai_service.build_rri_context(red_rri)))
+    assert ai_report_cache.get_cached_report(db, ai_report_cache.cache_key(payload)).report == fake_ollama.response_text
+
+    # A second pass finds everything cached and makes no requests
+    requests_before = fake_ollama.requests
+    result = ai_warmup.warm_briefings(db, bands=["RED", "AMBER"], max_per_company=5)
+    assert result["already_cached"] == 3 and result["generated"] == 0
+    assert fake_ollama.requests == requests_before
+
+
+def test_warmup_limits_and_deadline(db, fake_ollama, monkeypatch):
+    monkeypatch.setattr(ai_service, "OLLAMA_URL", fake_ollama.url)
+    for i in range(4):
+        add_soldier(db, f"C{i}", "Charlie", 20 + i, models.RRIBand.RED)
+
+    result = ai_warmup.warm_briefings(db, bands=["RED"], max_per_company=2)
+    assert result["candidates"] == 2 and result["generated"] == 2
+
+    # Window already closed: nothing new is started
+    result = ai_warmup.warm_briefings(db, bands=["RED"], max_per_company=4, deadline=datetime.now() - timedelta(seconds=1))
+    assert result["deferred"] == 2 and result["generated"] == 0
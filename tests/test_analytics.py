@@ -13,3 +13,37 @@ def test_technical_gaps(base_url, auth_headers):
 def test_retention_risk(base_url, auth_headers):
     response = requests.get(f"{base_url}/analytics/retention-risk/all", headers=auth_headers)
     assert response.status_code in [200, 404]
+
+def test_company_dashboard(base_url, auth_headers):
+    list_res = requests.get(f"{base_url}/admin/agniveers", headers=auth_headers)
+    companies = [a["company"] for a in list_res.json() if a.get("company")]
+    if not companies:
+        pytest.skip("No Agniveers with a company found")
+
+    company = companies[0]
+    response = requests.get(f"{base_url}/analytics/company/{company}/dashboard", headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    for key in ["overview", "technical_gaps", "retention_risk", "pending", "honor_board", "command_hub", "action_center"]:
+        assert key in data
+
+    # Panels must agree with the individual endpoints
+    overview = requests.get(f"{base_url}/analytics/company/{company}/overview", headers=auth_headers).json()
+    assert data["overview"] == overview
+    assert data["command_hub"]["overview"] == overview
+
+def test_trend_parameters(base_url, auth_headers):
+    response = requests.get(f"{base_url}/analytics/company/Alpha/rri-trend?months=12", headers=auth_headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 12
+
+    response = requests.get(f"{base_url}/analytics/company/Alpha/technical-trend?months=6&granularity=quarter", headers=auth_headers)
+    assert response.status_code == 200
+    assert all(row["quarter"].startswith("Q") for row in response.json())
+
+    response = requests.get(f"{base_url}/analytics/company/Alpha/behavioral-trend?quarters=8", headers=auth_headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 8
+
+    response = requests.get(f"{base_url}/analytics/company/Alpha/rri-trend?granularity=week", headers=auth_headers)
+    assert response.status_code == 400
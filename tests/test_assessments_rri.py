@@ -24,3 +24,33 @@ def test_get_agniveer_rri(base_url, auth_headers):
     # Get Latest
     latest_res = requests.get(f"{base_url}/rri/latest/{agniveer_id}", headers=auth_headers)
     assert latest_res.status_code in [200, 404]
+
+def test_bulk_rri_company(base_url, auth_headers):
+    list_res = requests.get(f"{base_url}/admin/agniveers", headers=auth_headers)
+    agniveers = [a for a in list_res.json() if a.get("company")]
+    if not agniveers:
+        pytest.skip("No Agniveers with a company found")
+
+    company = agniveers[0]["company"]
+    res = requests.post(f"{base_url}/rri/calculate/company/{company}", headers=auth_headers)
+    assert res.status_code == 200
+    data = res.json()
+    assert data["processed"] == sum(1 for a in agniveers if a["company"] == company)
+    assert "soldiers_per_second" in data
+    bands = data["band_distribution"]
+    assert bands["green"] + bands["amber"] + bands["red"] == data["processed"]
+
+def test_company_overview_uses_latest_rri(base_url, auth_headers):
+    list_res = requests.get(f"{base_url}/admin/agniveers", headers=auth_headers)
+    agniveers = [a for a in list_res.json() if a.get("company")]
+    if not agniveers:
+        pytest.skip("No Agniveers with a company found")
+
+    company = agniveers[0]["company"]
+    # Recalculate twice: the overview must count each Agniveer once, with the newest band
+    requests.post(f"{base_url}/rri/calculate/company/{company}", headers=auth_headers)
+    bulk = requests.post(f"{base_url}/rri/calculate/company/{company}", headers=auth_headers).json()
+
+    overview = requests.get(f"{base_url}/analytics/company/{company}/overview", headers=auth_headers).json()
+    assert overview["assessed_count"] == bulk["processed"]
+    assert overview["band_distribution"] == bulk["band_distribution"]
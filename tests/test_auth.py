@@ -6,6 +6,8 @@ def test_admin_login(base_url):
     response = requests.post(f"{base_url}/auth/login", json=payload)
     assert response.status_code == 200
     assert "access_token" in response.json()
+    # Login attempts are rate limited per client IP
+    assert int(response.headers["X-RateLimit-Remaining"]) < int(response.headers["X-RateLimit-Limit"])
 
 def test_invalid_login(base_url):
     payload = {"username": "admin", "password": "wrongpassword"}
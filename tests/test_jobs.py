@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend import jobs, models
+
+
+@pytest.fixture
+def session_factory(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(jobs.database, "SessionLocal", factory)
+    return factory
+
+
+def add_job(db, status, owner, heartbeat_at):
+    job = models.Job(job_type="mailbox_reconcile", status=status, progress=0, payload="{}",
+                     owner=owner, heartbeat_at=heartbeat_at)
+    db.add(job)
+    db.commit()
+    return job.id
+
+
+def test_only_jobs_with_a_stale_heartbeat_are_reclaimed(session_factory):
+    db = session_factory()
+    now = datetime.utcnow()
+    alive = add_job(db, models.JobStatus.RUNNING, "other-worker", now - timedelta(seconds=5))
+    queued = add_job(db, models.JobStatus.QUEUED, "other-worker", now)
+    dead = add_job(db, models.JobStatus.RUNNING, "other-worker",
+                   now - timedelta(seconds=jobs.JOB_HEARTBEAT_TIMEOUT_SECONDS + 1))
+    legacy = add_job(db, models.JobStatus.RUNNING, None, None)
+    done = add_job(db, models.JobStatus.COMPLETED, "other-worker", None)
+
+    # Another worker starting up leaves the live worker's jobs alone
+    assert jobs.mark_interrupted_jobs(db, now) == 2
+    status = {job.id: job.status for job in db.query(models.Job)}
+    assert status[alive] == models.JobStatus.RUNNING
+    assert status[queued] == models.JobStatus.QUEUED
+    assert status[dead] == status[legacy] == models.JobStatus.INTERRUPTED
+    assert status[done] == models.JobStatus.COMPLETED
+
+
+def test_reclaimed_job_is_not_overwritten_by_its_owner(session_factory, monkeypatch):
+    db = session_factory()
+    calls = []
+
+    @jobs.register_job("test_reclaim")
+    def _job(job_db, payload, progress):
+        # The job is reclaimed while it runs (e.g. its heartbeat was missed)
+        job_db.query(models.Job).update({"status": models.JobStatus.INTERRUPTED})
+        job_db.commit()
+        progress(50, "half way")
+        calls.append(payload)
+        return {"ok": True}
+
+    monkeypatch.setattr(jobs._executor, "submit", lambda fn, *args: fn(*args))
+    monkeypatch.setattr(jobs, "start_heartbeat", lambda: None)
+    try:
+        job = jobs.submit_job(db, "test_reclaim", {"n": 1})
+    finally:
+        del jobs.JOB_HANDLERS["test_reclaim"]
+        del jobs.JOB_ROLES["test_reclaim"]
+    db.expire_all()
+    job = db.get(models.Job, job.id)
+    assert calls == [{"n": 1}]
+    assert job.owner == jobs.WORKER_ID and job.status == models.JobStatus.INTERRUPTED
+    assert job.progress == 0 and job.result is None
+
+
+def test_system_jobs_are_admin_only():
+    for job_type in ("rri_recalculate", "ai_briefing_warmup", "mailbox_reconcile", "mail_search_rebuild", "mail_reencrypt"):
+        assert jobs.can_submit(job_type, models.UserRole.ADMIN)
+        assert not jobs.can_submit(job_type, models.UserRole.COY_CDR)
+    assert jobs.can_submit("bulk_upload_agniveers", models.UserRole.COY_CLK)
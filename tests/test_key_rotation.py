@@ -0,0 +1,98 @@
+import pytest
+from cryptography.fernet import Fernet
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import encryption, key_rotation, models, schemas
+from backend.mail_service import MailService
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def keys():
+    original = list(encryption._keys)
+    yield original
+    encryption.set_keys(original)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def send(db, sender, recipient, body):
+    MailService.send_email(db, schemas.EmailCreate(subject="Rotation", body=body, recipient_ids=[recipient]), sender)
+
+
+def test_rotation_keeps_old_mail_readable_and_reencrypts_it(db, keys):
+    users = []
+    for i in range(2):
+        user = models.User(username=f"u{i}", password_hash="x", role=models.UserRole.CO)
+        db.add(user)
+        db.flush()
+        users.append(user.user_id)
+    for i in range(7):
+        send(db, users[0], users[1], f"old body {i}")
+    search_key = encryption.get_search_key()
+
+    # Rotate: new primary key, the previous one kept for decryption
+    encryption.set_keys([Fernet.generate_key()] + keys)
+    assert encryption.get_search_key() == search_key
+    for i in range(3):
+        send(db, users[0], users[1], f"new body {i}")
+    bodies = lambda: [body for body, in db.query(models.InternalEmail.body).order_by(models.InternalEmail.id)]
+    assert [encryption.is_current(b) for b in bodies()] == [False] * 7 + [True] * 3
+    assert [encryption.decrypt_message(b) for b in bodies()][:2] == ["old body 0", "old body 1"]
+
+    # Chunks of 4 rows, each committed and reported
+    clock, reports = Clock(), []
+    first = key_rotation.reencrypt_bodies(db, batch_size=4, max_rows_per_second=2, sleep=clock.sleep, clock=clock,
+                                          progress_callback=lambda p, m: reports.append(p))
+    assert first["reencrypted"] == 7 and first["already_current"] == 3 and first["last_id"] == 10
+    assert reports == [40, 80, 100]
+    # Throttled to 2 rows/s: 10 rows took 5 (simulated) seconds
+    assert clock.now == 5 and first["rows_per_second"] == 2.0
+
+    assert all(encryption.is_current(b) for b in bodies())
+    again = key_rotation.reencrypt_bodies(db, max_rows_per_second=0)
+    assert again["reencrypted"] == 0 and again["already_current"] == 10
+
+    # The old key is no longer needed
+    encryption.set_keys(encryption._keys[:1])
+    assert [encryption.decrypt_message(b) for b in bodies()] == [f"old body {i}" for i in range(7)] + \
+        [f"new body {i}" for i in range(3)]
+
+
+def test_resume_and_unreadable_rows(db, keys):
+    old_key = Fernet.generate_key()
+    encryption.set_keys([old_key] + keys)
+    user = models.User(username="u", password_hash="x", role=models.UserRole.CO)
+    db.add(user)
+    db.flush()
+    for i in range(5):
+        send(db, user.user_id, user.user_id, f"body {i}")
+
+    # A key that was dropped before re-encryption finished
+    lost = Fernet(Fernet.generate_key()).encrypt(b"lost").decode()
+    db.add(models.InternalEmail(sender_id=user.user_id, subject="x", body=lost, is_encrypted=True))
+    db.commit()
+
+    encryption.set_keys([Fernet.generate_key(), old_key] + keys)
+    result = key_rotation.reencrypt_bodies(db, after_id=3, max_rows_per_second=0)
+    assert result["scanned"] == 3 and result["reencrypted"] == 2 and result["undecryptable"] == 1
+    ids = [e.id for e in db.query(models.InternalEmail).order_by(models.InternalEmail.id) if encryption.is_current(e.body)]
+    assert ids == [4, 5]
@@ -1,6 +1,7 @@
 
 import requests
 import pytest
+import uuid
 
 def test_send_email(base_url, auth_headers):
     # Need an Agniveer ID to send to. Using 1 as default/hack for now or better, get one.
@@ -23,6 +24,72 @@ def test_get_sent(base_url, auth_headers):
     response = requests.get(f"{base_url}/mail/sent", headers=auth_headers)
     assert response.status_code == 200
 
+def test_sent_recipient_summary(base_url, auth_headers):
+    me = requests.post(f"{base_url}/auth/login", json={"username": "admin", "password": "admin"}).json()
+    subject = f"Summary Test {uuid.uuid4().hex[:8]}"
+    payload = {"subject": subject, "body": "Sent list summary", "priority": "Normal", "recipient_ids": [me["user_id"]]}
+    assert requests.post(f"{base_url}/mail/send", json=payload, headers=auth_headers).status_code == 200
+
+    # A single recipient is shown by name, a broadcast as "Name +N others"
+    payload = {"subject": subject + " broadcast", "body": "Broadcast", "priority": "Normal",
+               "recipient_ids": [me["user_id"]], "target_company": "Alpha"}
+    assert requests.post(f"{base_url}/mail/send", json=payload, headers=auth_headers).status_code == 200
+
+    sent = {m["subject"]: m for m in requests.get(f"{base_url}/mail/sent", headers=auth_headers).json()}
+    assert sent[subject]["sender_name"] == f"To: {me.get('full_name') or me['username']}"
+    broadcast = sent[subject + " broadcast"]["sender_name"]
+    assert broadcast.startswith("To: ")
+    if "others" in broadcast:
+        assert int(broadcast.split("+")[1].split(" ")[0]) >= 1
+
+def test_inbox_cursor_pagination(base_url, auth_headers):
+    # Without ?cursor the list shape is unchanged; with it the response is a page
+    assert isinstance(requests.get(f"{base_url}/mail/inbox?limit=2", headers=auth_headers).json(), list)
+
+    first = requests.get(f"{base_url}/mail/inbox?cursor=&limit=2", headers=auth_headers).json()
+    assert set(first) == {"items", "next_cursor"}
+    if first["next_cursor"] is None:
+        pytest.skip("Fewer than two messages in inbox")
+    second = requests.get(f"{base_url}/mail/inbox", params={"cursor": first["next_cursor"], "limit": 2}, headers=auth_headers).json()
+    assert not {m["id"] for m in first["items"]} & {m["id"] for m in second["items"]}
+
+    bad = requests.get(f"{base_url}/mail/sent?cursor=garbage", headers=auth_headers)
+    assert bad.status_code == 400
+
+def test_mail_search(base_url, auth_headers):
+    me = requests.post(f"{base_url}/auth/login", json={"username": "admin", "password": "admin"}).json()
+    word = f"zq{uuid.uuid4().hex[:8]}"
+    payload = {"subject": "Search test", "body": f"Body mentions {word} only here", "priority": "Normal",
+               "recipient_ids": [me["user_id"]]}
+    assert requests.post(f"{base_url}/mail/send", json=payload, headers=auth_headers).status_code == 200
+
+    # Encrypted body words are searchable through the index, ranked hits carry a score
+    hits = requests.get(f"{base_url}/mail/search", params={"q": word}, headers=auth_headers).json()
+    assert [h["subject"] for h in hits] == ["Search test"] and "rank" in hits[0]
+    assert requests.get(f"{base_url}/mail/search", params={"q": word, "include_body": "false"}, headers=auth_headers).json() == []
+    assert len(requests.get(f"{base_url}/mail/search", params={"q": word, "folder": "sent"}, headers=auth_headers).json()) == 1
+    assert requests.get(f"{base_url}/mail/search", params={"q": word, "folder": "drafts"}, headers=auth_headers).status_code == 400
+
+def test_inbox_previews(base_url, auth_headers):
+    me = requests.post(f"{base_url}/auth/login", json={"username": "admin", "password": "admin"}).json()
+    payload = {"subject": "Preview test", "body": "Fall in at the\nparade ground " + "x" * 300, "priority": "Normal",
+               "recipient_ids": [me["user_id"]]}
+    assert requests.post(f"{base_url}/mail/send", json=payload, headers=auth_headers).status_code == 200
+
+    plain = requests.get(f"{base_url}/mail/inbox?limit=1", headers=auth_headers).json()
+    assert plain[0]["preview"] is None
+    item = requests.get(f"{base_url}/mail/inbox?limit=1&preview=true", headers=auth_headers).json()[0]
+    assert item["subject"] == "Preview test"
+    assert item["preview"].startswith("Fall in at the parade ground x") and len(item["preview"]) == 120
+
+    # Opening it twice decrypts once; the second read is a cache hit
+    before = requests.get(f"{base_url}/admin/mail-body-cache/stats", headers=auth_headers).json()
+    for _ in range(2):
+        detail = requests.get(f"{base_url}/mail/{item['id']}", headers=auth_headers).json()
+        assert detail["body"] == payload["body"]
+    after = requests.get(f"{base_url}/admin/mail-body-cache/stats", headers=auth_headers).json()
+    assert after["hits"] >= before["hits"] + 2
+
 def test_get_trash(base_url, auth_headers):
     response = requests.get(f"{base_url}/mail/trash", headers=auth_headers)
     assert response.status_code == 200
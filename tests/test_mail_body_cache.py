@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from backend import mail_body_cache
+from backend.encryption import decrypt_messages, encrypt_message
+from backend.mail_body_cache import MailBodyCache, preview_text, read_bodies
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_hits_skip_decryption_and_track_ciphertext():
+    cache = MailBodyCache(max_bytes=1 << 20, ttl_seconds=60)
+    ciphertext = encrypt_message("Parade at 0600")
+    with mock.patch.object(mail_body_cache, "decrypt_messages", wraps=decrypt_messages) as decrypt:
+        assert [cache.decrypt(1, ciphertext) for _ in range(1000)] == ["Parade at 0600"] * 1000
+        assert decrypt.call_count == 1
+
+        # Re-encrypted body (or a reused id): the old plaintext is never served
+        assert cache.decrypt(1, encrypt_message("Parade at 0700")) == "Parade at 0700"
+        assert decrypt.call_count == 2
+    assert cache.stats()["hits"] == 999 and cache.stats()["decrypted"] == 2
+
+
+def test_byte_bound_and_ttl():
+    clock = Clock()
+    body = "x" * 1000
+    cache = MailBodyCache(max_bytes=3500, ttl_seconds=60, clock=clock)
+    for email_id in range(1, 4):
+        cache.put(email_id, f"c{email_id}", body)
+    assert cache.get(1, "c1") == body  # now most recently used
+
+    cache.put(4, "c4", body)
+    assert cache.get(2, "c2") is None and cache.get(1, "c1") == body
+    assert cache.stats()["bytes"] <= 3500 and cache.evictions == 1
+
+    # Larger than the whole cache: not stored
+    cache.put(5, "c5", "y" * 5000)
+    assert cache.get(5, "c5") is None and len(cache) == 3
+
+    clock.now += 61
+    assert cache.get(1, "c1") is None and cache.stats()["bytes"] == 2 * cache._entries[3][3]
+
+
+def test_batched_reads_and_disabled_cache():
+    rows = [
+        SimpleNamespace(id=1, body=encrypt_message("first body"), is_encrypted=True),
+        SimpleNamespace(id=2, body="legacy plain body", is_encrypted=False),
+        SimpleNamespace(id=3, body=encrypt_message("third  body\nwith lines"), is_encrypted=True),
+    ]
+    cache = MailBodyCache(max_bytes=1 << 20, ttl_seconds=60)
+    with mock.patch.object(mail_body_cache, "body_cache", cache):
+        expected = {1: "first body", 2: "legacy plain body", 3: "third  body\nwith lines"}
+        assert read_bodies(rows) == expected
+        assert read_bodies(rows) == expected
+    assert (cache.misses, cache.hits, len(cache)) == (2, 2, 2)
+
+    disabled = MailBodyCache(max_bytes=0)
+    assert disabled.decrypt_many([(1, rows[0].body)]) == {1: "first body"} and len(disabled) == 0
+
+    assert preview_text("third  body\nwith lines") == "third body with lines"
+    assert preview_text("word " * 100, 20) == "word word word word…"
@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import models, schemas
+from backend.mail_service import MailService
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def add_agniveer_user(db, service_id, company, batch_no, with_account=True):
+    agniveer = models.Agniveer(service_id=service_id, name=f"Agniveer {service_id}", company=company, batch_no=batch_no)
+    db.add(agniveer)
+    db.flush()
+    if with_account:
+        user = models.User(username=service_id, password_hash="x", role=models.UserRole.AGNIVEER, agniveer_id=agniveer.id)
+        db.add(user)
+        db.flush()
+        return user.user_id
+    return None
+
+
+def test_broadcast_resolution_and_fan_out(db):
+    sender = models.User(username="co", password_hash="x", role=models.UserRole.CO, full_name="Col Verma")
+    db.add(sender)
+    db.flush()
+    alpha_a = add_agniveer_user(db, "A1", "Alpha", "B-1")
+    alpha_b = add_agniveer_user(db, "A2", "Alpha", "B-2")
+    add_agniveer_user(db, "A3", "Alpha", "B-1", with_account=False)
+    bravo_b = add_agniveer_user(db, "B1", "Bravo", "B-2")
+    db.commit()
+
+    email = schemas.EmailCreate(
+        subject="Parade", body="0600 hrs", recipient_ids=[sender.user_id, alpha_a],
+        target_company="Alpha", target_batch="B-2", target_role="co"
+    )
+    recipients = MailService.send_email(db, email, sender.user_id)
+
+    # Explicit ids first, then the unit broadcast; each user appears once
+    assert recipients[:2] == [sender.user_id, alpha_a]
+    assert sorted(recipients) == sorted({sender.user_id, alpha_a, alpha_b, bravo_b})
+
+    sent = db.query(models.InternalEmail).one()
+    rows = db.query(models.EmailRecipient).filter(models.EmailRecipient.email_id == sent.id).all()
+    assert sorted(r.recipient_id for r in rows) == sorted(recipients)
+    assert all(r.folder == "inbox" and r.is_read is False and r.is_starred is False for r in rows)
+    assert sent.recipient_count == 4
+    assert sent.recipient_summary == "Col Verma +3 others"
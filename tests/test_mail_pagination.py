@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import models, schemas
+from backend.mail_service import MailService, decode_cursor, encode_cursor, next_cursor
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def users(db):
+    sender = models.User(username="co", password_hash="x", role=models.UserRole.CO)
+    reader = models.User(username="r", password_hash="x", role=models.UserRole.AGNIVEER)
+    db.add_all([sender, reader])
+    db.commit()
+    return sender.user_id, reader.user_id
+
+
+def send(db, sender_id, reader_id, subject, timestamp=None):
+    MailService.send_email(db, schemas.EmailCreate(subject=subject, body="b", recipient_ids=[reader_id]), sender_id)
+    if timestamp is not None:
+        email = db.query(models.InternalEmail).order_by(models.InternalEmail.id.desc()).first()
+        email.timestamp = timestamp
+        db.query(models.EmailRecipient).filter(models.EmailRecipient.email_id == email.id).update(
+            {"email_timestamp": timestamp})
+        db.commit()
+
+
+def walk(fetch, limit):
+    pages, cursor = [], ""
+    while cursor is not None:
+        items = fetch(cursor)
+        pages.append([item.subject for item in items])
+        cursor = next_cursor(items, limit)
+    return pages
+
+
+def test_cursor_round_trip():
+    ts = datetime(2026, 1, 2, 3, 4, 5, 678901)
+    assert decode_cursor(encode_cursor(ts, 42)) == (ts, 42)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_cursor_pages_match_offset_pages(db, users):
+    sender, reader = users
+    base = datetime(2026, 1, 1)
+    # Equal timestamps in pairs exercise the id tie-break
+    for i in range(11):
+        send(db, sender, reader, f"m{i}", base + timedelta(minutes=i // 2))
+
+    for fetch in (
+        lambda skip, c: MailService.get_inbox(db, reader, skip, 4, cursor=c),
+        lambda skip, c: MailService.get_sent(db, sender, skip, 4, cursor=c),
+    ):
+        by_offset = [[i.subject for i in fetch(skip, None)] for skip in (0, 4, 8)]
+        assert walk(lambda c: fetch(0, c), 4) == by_offset
+        assert by_offset[0] == ["m10", "m9", "m8", "m7"]
+
+    for entry in db.query(models.EmailRecipient).all():
+        MailService.soft_delete_email(db, entry.id, reader)
+    assert sum(walk(lambda c: MailService.get_trash(db, reader, 0, 5, cursor=c), 5), []) == [f"m{i}" for i in range(10, -1, -1)]
+
+
+def test_new_mail_mid_scroll_does_not_shift_pages(db, users):
+    sender, reader = users
+    base = datetime(2026, 1, 1)
+    for i in range(6):
+        send(db, sender, reader, f"m{i}", base + timedelta(minutes=i))
+
+    first = MailService.get_inbox(db, reader, 0, 3, cursor="")
+    send(db, sender, reader, "late")  # newest mail arrives while the user scrolls
+
+    second = MailService.get_inbox(db, reader, 0, 3, cursor=next_cursor(first, 3))
+    assert [i.subject for i in second] == ["m2", "m1", "m0"]
+    # An offset walk would have repeated m3
+    assert MailService.get_inbox(db, reader, 3, 3)[0].subject == "m3"
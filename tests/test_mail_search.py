@@ -0,0 +1,129 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from backend import mail_search, models, schemas
+from backend.mail_service import MailService
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def users(db):
+    sender = models.User(username="IC-1001", password_hash="x", role=models.UserRole.CO, full_name="Col Verma")
+    reader = models.User(username="r", password_hash="x", role=models.UserRole.AGNIVEER)
+    other = models.User(username="o", password_hash="x", role=models.UserRole.AGNIVEER)
+    db.add_all([sender, reader, other])
+    db.commit()
+    return sender.user_id, reader.user_id, other.user_id
+
+
+def send(db, sender, recipients, subject, body):
+    MailService.send_email(db, schemas.EmailCreate(subject=subject, body=body, recipient_ids=recipients), sender)
+
+
+def subjects(hits):
+    return [h.subject for h in hits]
+
+
+def test_search_subject_sender_and_encrypted_body(db, users):
+    sender, reader, other = users
+    send(db, sender, [reader], "Range schedule", "Firing practice moves to Thursday")
+    send(db, sender, [reader], "Leave roster", "Submit applications before the parade")
+    send(db, sender, [other], "Range schedule for others", "Firing practice")
+
+    # Subject prefix, sender name, and body words (prefix and whole word)
+    assert subjects(mail_search.search(db, reader, "ran")) == ["Range schedule"]
+    assert len(mail_search.search(db, reader, "verma")) == 2
+    assert subjects(mail_search.search(db, reader, "thurs")) == ["Range schedule"]
+    assert subjects(mail_search.search(db, reader, "applications")) == ["Leave roster"]
+    assert subjects(mail_search.search(db, reader, "parade roster")) == ["Leave roster"]
+    assert mail_search.search(db, reader, "parade range") == []
+    assert subjects(mail_search.search(db, reader, "thursday", include_body=False)) == []
+
+    # Another user's mail never matches; the sender finds it in Sent
+    assert len(mail_search.search(db, other, "firing")) == 1
+    assert len(mail_search.search(db, sender, "firing", folder="sent")) == 2
+
+    # Body words are stored as keyed hashes only
+    stored = db.execute(text("SELECT body FROM mail_search")).scalars().all()
+    assert not any("thursday" in body or "firing" in body for body in stored)
+
+
+def test_ranking_prefers_subject_and_inbox_filter(db, users):
+    sender, reader, _ = users
+    send(db, sender, [reader], "Weekly update", "Notes about medical checkups")
+    send(db, sender, [reader], "Medical camp", "Camp on Monday")
+
+    assert subjects(mail_search.search(db, reader, "medical")) == ["Medical camp", "Weekly update"]
+    assert [i.subject for i in MailService.get_inbox(db, reader, search="medic")] == ["Medical camp", "Weekly update"]
+
+    entry = db.query(models.EmailRecipient).filter(models.EmailRecipient.recipient_id == reader).first()
+    MailService.soft_delete_email(db, entry.id, reader)
+    assert len(mail_search.search(db, reader, "medical")) == 1
+    assert len(mail_search.search(db, reader, "medical", folder="trash")) == 1
+
+
+def test_rebuild_indexes_existing_mail(db, users):
+    sender, reader, _ = users
+    send(db, sender, [reader], "Night patrol", "Assemble at the gate")
+    db.execute(text("DELETE FROM mail_search"))
+    db.commit()
+    assert mail_search.needs_rebuild(db)
+    assert mail_search.search(db, reader, "patrol") == []
+
+    assert mail_search.rebuild_index(db)["indexed"] == 1
+    assert mail_search.rebuild_index(db) == {"indexed": 0, "skipped": 1, "supported": True}
+    assert subjects(mail_search.search(db, reader, "gate")) == ["Night patrol"]
+
+
+def test_changed_search_key_requires_full_rebuild(db, users, monkeypatch):
+    from cryptography.fernet import Fernet
+    from backend import encryption
+    sender, reader, _ = users
+    send(db, sender, [reader], "Night patrol", "Assemble at the gate")
+    monkeypatch.delenv("MAIL_SEARCH_KEY", raising=False)
+    original = list(encryption._keys)
+    encryption.set_keys(original)
+    try:
+        # First check records the key the index was built with
+        assert not mail_search.search_key_changed(db)
+        assert not mail_search.search_key_changed(db)
+
+        # Rotated key, with the old one (the search key's source) removed
+        encryption.set_keys([Fernet.generate_key()])
+        assert mail_search.search_key_changed(db)
+        mail_search.rebuild_index(db, full=True)
+        assert not mail_search.search_key_changed(db)
+    finally:
+        encryption.set_keys(original)
+
+
+def test_query_syntax_is_not_interpreted(db, users):
+    sender, reader, _ = users
+    send(db, sender, [reader], "Quotes \"and\" NEAR(stuff)", "OR AND NOT")
+    assert len(mail_search.search(db, reader, 'and" OR *')) == 1
+    assert mail_search.search(db, reader, "  ***  ") == []
+
+
+def test_forwarded_body_is_searchable_and_encrypted(db, users):
+    sender, reader, other = users
+    send(db, sender, [reader], "Range schedule", "Firing practice moves to Thursday")
+    original = db.query(models.InternalEmail).one()
+
+    MailService.forward_email(db, original.id, reader, [other])
+    forwarded = db.query(models.InternalEmail).filter(models.InternalEmail.sender_id == reader).one()
+    assert forwarded.is_encrypted and "Thursday" not in forwarded.body
+    assert subjects(mail_search.search(db, other, "thursday")) == ["Fwd: Range schedule"]
+    assert subjects(mail_search.search(db, reader, "thursday", folder="sent")) == ["Fwd: Range schedule"]
+
+    entry = db.query(models.EmailRecipient).filter(models.EmailRecipient.recipient_id == other).one()
+    body = MailService.get_email_detail(db, entry.id, other).body
+    assert body.startswith("---------- Forwarded message ----------") and body.endswith("Firing practice moves to Thursday")
@@ -0,0 +1,124 @@
+import random
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import models, schemas
+from backend.mail_service import MailService
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def counted(db, user_id):
+    """The stats as the old COUNT(*) queries computed them."""
+    entries = db.query(models.EmailRecipient).filter(models.EmailRecipient.recipient_id == user_id)
+    return {
+        "inbox_unread": entries.filter(models.EmailRecipient.folder == "inbox", models.EmailRecipient.is_read == False).count(),
+        "inbox_total": entries.filter(models.EmailRecipient.folder == "inbox").count(),
+        "sent_total": db.query(models.InternalEmail).filter(
+            models.InternalEmail.sender_id == user_id, models.InternalEmail.is_deleted_by_sender == False).count(),
+        "trash_total": entries.filter(models.EmailRecipient.folder == "trash").count(),
+    }
+
+
+def test_counters_follow_every_mutation(db):
+    users = []
+    for i in range(4):
+        user = models.User(username=f"u{i}", password_hash="x", role=models.UserRole.CO, full_name=f"User {i}")
+        db.add(user)
+        db.flush()
+        users.append(user.user_id)
+    db.commit()
+    # Counter rows exist from the start so every mutation has to maintain them
+    for uid in users:
+        MailService.get_counters(db, uid)
+
+    rng = random.Random(7)
+    for step in range(300):
+        uid = rng.choice(users)
+        action = rng.choice(["send", "send", "read", "delete", "restore", "purge", "bulk", "bulk_trash", "sent_delete", "forward", "star"])
+        entries = db.query(models.EmailRecipient).filter(models.EmailRecipient.recipient_id == uid).all()
+        sent = db.query(models.InternalEmail).filter(models.InternalEmail.sender_id == uid).all()
+
+        if action == "send":
+            recipients = rng.sample(users, rng.randint(1, len(users)))
+            MailService.send_email(db, schemas.EmailCreate(subject=f"s{step}", body="b", recipient_ids=recipients), uid)
+        elif action == "forward" and sent:
+            MailService.forward_email(db, rng.choice(sent).id, uid, rng.sample(users, 2))
+        elif action == "sent_delete" and sent:
+            MailService.soft_delete_email(db, rng.choice(sent).id + 10_000_000, uid)  # miss: no-op
+            MailService.bulk_delete_emails(db, [e.id for e in rng.sample(sent, min(2, len(sent)))], uid, "sent")
+        elif entries:
+            entry = rng.choice(entries)
+            if action == "read":
+                MailService.get_email_detail(db, entry.id, uid)
+            elif action == "delete":
+                MailService.soft_delete_email(db, entry.id, uid)
+            elif action == "restore":
+                MailService.restore_email(db, entry.id, uid)
+            elif action == "purge":
+                MailService.permanent_delete_email(db, entry.id, uid)
+            elif action == "bulk":
+                MailService.bulk_delete_emails(db, [e.id for e in rng.sample(entries, min(3, len(entries)))], uid, "inbox")
+            elif action == "bulk_trash":
+                MailService.bulk_delete_emails(db, [e.id for e in rng.sample(entries, min(3, len(entries)))], uid, "trash")
+            elif action == "star":
+                MailService.toggle_star(db, entry.id, uid)
+
+    for uid in users:
+        assert MailService.get_mailbox_stats(db, uid) == counted(db, uid)
+        assert MailService.get_unread_count(db, uid) == counted(db, uid)["inbox_unread"]
+    assert MailService.reconcile_counters(db)["repaired"] == 0
+
+
+def test_reconcile_repairs_drift(db):
+    sender = models.User(username="s", password_hash="x", role=models.UserRole.CO)
+    reader = models.User(username="r", password_hash="x", role=models.UserRole.AGNIVEER)
+    db.add_all([sender, reader])
+    db.commit()
+    MailService.send_email(db, schemas.EmailCreate(subject="a", body="b", recipient_ids=[reader.user_id]), sender.user_id)
+
+    # First read builds the row from the mail tables
+    assert MailService.get_mailbox_stats(db, reader.user_id)["inbox_unread"] == 1
+
+    counter = db.get(models.MailboxCounter, reader.user_id)
+    counter.inbox_unread = 42
+    db.commit()
+
+    result = MailService.reconcile_counters(db)
+    assert result["repaired"] == 1 and result["repaired_user_ids"] == [reader.user_id]
+    assert MailService.get_mailbox_stats(db, reader.user_id) == counted(db, reader.user_id)
+
+
+def test_forward_is_one_transaction_and_dedupes_recipients(db, monkeypatch):
+    users = [models.User(username=f"f{i}", password_hash="x", role=models.UserRole.CO) for i in range(3)]
+    db.add_all(users)
+    db.commit()
+    a, b, c = (u.user_id for u in users)
+    MailService.send_email(db, schemas.EmailCreate(subject="orig", body="text", recipient_ids=[b]), a)
+    original = db.query(models.InternalEmail).one()
+
+    assert MailService.forward_email(db, original.id, b, [c, c, a]) == 2
+    forwarded = db.query(models.InternalEmail).filter(models.InternalEmail.sender_id == b).one()
+    assert forwarded.recipient_count == 2
+    for uid in (a, b, c):
+        assert MailService.get_mailbox_stats(db, uid) == counted(db, uid)
+
+    # A failure while applying counters leaves no half-forwarded email behind
+    def fail(*args):
+        raise RuntimeError("counter update failed")
+    monkeypatch.setattr("backend.mail_service._apply_counter_deltas", fail)
+    with pytest.raises(RuntimeError):
+        MailService.forward_email(db, original.id, b, [a])
+    db.rollback()
+    assert db.query(models.InternalEmail).filter(models.InternalEmail.sender_id == b).count() == 1
+    monkeypatch.undo()
+    assert MailService.reconcile_counters(db)["repaired"] == 0
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import time
+
+from backend.notification_broker import NotificationBroker
+from backend.notification_bus import MAX_PAYLOAD_BYTES, BrokerBus, NotificationBus, create_bus
+from backend.notifications import ConnectionManager
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.messages = []
+        self.received_at = None
+        self.event = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        self.messages.append(message)
+        self.received_at = time.perf_counter()
+        self.event.set()
+
+    async def close(self, code=1000):
+        pass
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_create_bus_from_url():
+    assert type(create_bus("")) is NotificationBus
+    bus = create_bus("tcp://127.0.0.1:9999")
+    assert isinstance(bus, BrokerBus) and bus.port == 9999
+
+
+def test_large_broadcasts_are_split_under_the_notify_limit():
+    bus = NotificationBus()
+    user_ids = list(range(1_000_000, 1_005_000))
+    message = {"type": "new_mail", "subject": "Привет " * 50}
+    payloads = list(bus._encode(user_ids, message))
+    assert len(payloads) > 1
+    assert all(len(p.encode()) <= MAX_PAYLOAD_BYTES for p in payloads)
+    assert [u for p in payloads for u in json.loads(p)["user_ids"]] == user_ids
+    assert list(bus._encode([], message)) == []
+
+
+def test_events_reach_sockets_on_other_workers():
+    async def scenario():
+        broker = NotificationBroker()
+        server = await broker.serve("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+
+        # Two "workers", each with its own manager and broker connection
+        worker_a = ConnectionManager(bus=BrokerBus("127.0.0.1", port))
+        worker_b = ConnectionManager(bus=BrokerBus("127.0.0.1", port))
+        await worker_a.start()
+        await worker_b.start()
+        try:
+            on_a, on_b, bulk_b = RecordingSocket(), RecordingSocket(), RecordingSocket()
+            await worker_a.connect(1, on_a)
+            await worker_b.connect(2, on_b)
+            await worker_b.connect(2400, bulk_b)
+
+            sent_at = time.perf_counter()
+            worker_a.publish([1, 2], {"type": "new_mail"})
+            await asyncio.wait_for(on_b.event.wait(), 2)
+            latency = on_b.received_at - sent_at
+
+            # Broadcasts larger than one bus event are split and still delivered
+            worker_a.publish(list(range(100, 2500)), {"type": "leave_update"})
+            await asyncio.wait_for(bulk_b.event.wait(), 2)
+            await asyncio.sleep(0.05)
+            return on_a.messages, on_b.messages, bulk_b.messages, latency
+        finally:
+            await worker_a.stop()
+            await worker_b.stop()
+            server.close()
+
+    on_a, on_b, bulk_b, latency = run(scenario())
+    # Local delivery once (no echo from the bus), remote delivery once
+    assert on_a == [{"type": "new_mail"}]
+    assert on_b == [{"type": "new_mail"}]
+    assert bulk_b == [{"type": "leave_update"}]
+    assert latency < 0.1
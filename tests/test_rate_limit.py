@@ -0,0 +1,161 @@
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend import models
+from backend.auth_cache import AuthenticatedUser
+from backend.rate_limit import DatabaseStore, MemoryStore, RateLimiter, load_limits, parse_rate
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_parse_and_merge_limits():
+    assert parse_rate("10/hour") == (10, 3600)
+    assert parse_rate("5 / minutes") == (5, 60)
+    with pytest.raises(ValueError):
+        parse_rate("ten/hour")
+    limits = load_limits('{"send_mail": {"co": "100/day"}, "search": {"*": "60/minute"}}')
+    assert limits["send_mail"] == {"agniveer": (10, 3600), "co": (100, 86400)}
+    assert limits["search"] == {"*": (60, 60)}
+
+
+def test_memory_store_sliding_window():
+    clock = Clock()
+    store = MemoryStore(clock)
+    decisions = []
+    for _ in range(3):
+        decisions.append(store.hit("k", 3, 60))
+        clock.now += 20
+    assert [d.remaining for d in decisions] == [2, 1, 0] and all(d.allowed for d in decisions)
+
+    # t=60 frees the t=0 slot only; t=70 waits for the t=20 slot
+    assert store.hit("k", 3, 60).allowed
+    clock.now += 10
+    denied = store.hit("k", 3, 60)
+    assert not denied.allowed and denied.reset_after == 10
+    assert denied.headers()["Retry-After"] == "10"
+    clock.now += 10
+    assert store.hit("k", 3, 60).allowed
+
+
+def test_memory_store_sweeps_idle_keys():
+    clock = Clock()
+    store = MemoryStore(clock)
+    for i in range(100):
+        store.hit(f"k{i}", 1, 10)
+    clock.now += 11
+    for _ in range(MemoryStore.SWEEP_EVERY):
+        store.hit("busy", 10_000, 10)
+    assert len(store) == 1
+
+
+def test_database_store_shared_between_instances():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    sessions = sessionmaker(bind=engine)
+    clock = Clock(3600 * 1000 + 600)  # 10 minutes into an hour window
+    worker_a, worker_b = DatabaseStore(sessions, clock), DatabaseStore(sessions, clock)
+
+    assert [worker_a.hit("k", 4, 3600).allowed, worker_b.hit("k", 4, 3600).allowed] == [True, True]
+    assert worker_a.hit("k", 4, 3600).remaining == 1
+    assert worker_b.hit("k", 4, 3600).allowed
+    assert not worker_a.hit("k", 4, 3600).allowed
+
+    # Half-way through the next window, half of the previous count still applies
+    clock.now += 3600 + 1200
+    assert [worker_a.hit("k", 4, 3600).allowed for _ in range(3)] == [True, True, False]
+
+
+def test_dependency_per_role_headers_and_429():
+    limiter = RateLimiter(MemoryStore(), {"send_mail": {"agniveer": (2, 3600)}, "login": {"*": (1, 60)}})
+    role = {"value": models.UserRole.AGNIVEER}
+
+    def current_user():
+        return AuthenticatedUser(user_id=7, username="a", role=role["value"])
+
+    app = FastAPI()
+
+    @app.post("/send", dependencies=[Depends(limiter.dependency("send_mail", current_user))])
+    def send():
+        return 1
+
+    @app.post("/login", dependencies=[Depends(limiter.dependency("login"))])
+    def login():
+        return "ok"
+
+    client = TestClient(app)
+    first = client.post("/send")
+    assert first.headers["X-RateLimit-Limit"] == "2" and first.headers["X-RateLimit-Remaining"] == "1"
+    assert client.post("/send").status_code == 200
+    blocked = client.post("/send")
+    assert blocked.status_code == 429 and int(blocked.headers["Retry-After"]) > 0
+
+    # Other roles have no send_mail limit
+    role["value"] = models.UserRole.CO
+    response = client.post("/send")
+    assert response.status_code == 200 and "X-RateLimit-Limit" not in response.headers
+
+    assert client.post("/login").status_code == 200
+    assert client.post("/login").status_code == 429
+
+
+def make_store(name):
+    if name == "memory":
+        return MemoryStore()
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    return DatabaseStore(sessionmaker(bind=engine))
+
+
+@pytest.mark.parametrize("store_name", ["memory", "database"])
+def test_released_reservations_free_their_slot(store_name):
+    limiter = RateLimiter(make_store(store_name), {"send_mail": {"agniveer": (2, 3600)}})
+    # Two requests in flight hold both slots, so a third is refused straight away
+    assert limiter.check("send_mail", "user:7", "agniveer").allowed
+    assert limiter.check("send_mail", "user:7", "agniveer").allowed
+    assert not limiter.check("send_mail", "user:7", "agniveer").allowed
+
+    # One of them fails and hands its slot back
+    limiter.release("send_mail", "user:7", "agniveer")
+    assert limiter.check("send_mail", "user:7", "agniveer").allowed
+    assert not limiter.check("send_mail", "user:7", "agniveer").allowed
+
+    # Releasing more than was counted never goes below zero
+    for _ in range(3):
+        limiter.release("send_mail", "user:7", "agniveer")
+    assert [limiter.check("send_mail", "user:7", "agniveer").allowed for _ in range(3)] == [True, True, False]
+
+
+@pytest.mark.parametrize("store_name", ["memory", "database"])
+def test_count_success_only_ignores_rejected_requests(store_name):
+    limiter = RateLimiter(make_store(store_name), {"send_mail": {"agniveer": (2, 3600)}})
+
+    def current_user():
+        return AuthenticatedUser(user_id=7, username="a", role=models.UserRole.AGNIVEER)
+
+    app = FastAPI()
+
+    @app.post("/send", dependencies=[Depends(limiter.dependency("send_mail", current_user, count_success_only=True))])
+    def send(ok: bool = True):
+        if not ok:
+            raise HTTPException(status_code=400, detail="No recipients")
+        return 1
+
+    client = TestClient(app)
+    # Failed sends do not use up the quota
+    for _ in range(5):
+        assert client.post("/send?ok=false").status_code == 400
+    first = client.post("/send")
+    assert first.status_code == 200 and first.headers["X-RateLimit-Remaining"] == "1"
+    assert client.post("/send").status_code == 200
+    blocked = client.post("/send")
+    assert blocked.status_code == 429 and "Retry-After" in blocked.headers
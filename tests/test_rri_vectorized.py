@@ -0,0 +1,130 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from backend.rri import rri_calculator
+from backend.rri.behavioral_competencies import BehavioralAssessmentInput
+from backend.rri.achievements import AchievementInput, ACHIEVEMENT_LIMITS
+from backend.rri import vectorized
+
+REFERENCE_DATE = datetime(2026, 3, 15, 12, 0, 0)
+ACHIEVEMENT_TYPES = list(ACHIEVEMENT_LIMITS) + ["UNLISTED"]
+
+
+def random_soldier(rng, integer_scores=False):
+    def score(lo, hi):
+        return float(rng.randint(lo, hi)) if integer_scores else rng.uniform(lo, hi)
+
+    # Technical: one assessment, some categories missing, occasionally none / future-dated
+    tech_date = None
+    tech = [None, None, None, None]
+    if rng.random() < 0.9:
+        tech_date = REFERENCE_DATE - timedelta(days=rng.randint(-20, 900), seconds=rng.randint(0, 86399))
+        tech = [score(-10, 110) if rng.random() < 0.85 else None for _ in range(4)]
+
+    behavioral = []
+    for _ in range(rng.choice([0, 1, 2, 3, 4, 5, 8])):
+        d = REFERENCE_DATE - timedelta(days=rng.randint(0, 720), seconds=rng.randint(0, 86399))
+        values = [score(1, 10) for _ in range(6)]
+        if rng.random() < 0.1:
+            values[rng.randrange(6)] = score(1, 2)  # outlier candidate
+        behavioral.append((d, values))
+
+    achievements = []
+    for _ in range(rng.randint(0, 6)):
+        t = rng.choice(ACHIEVEMENT_TYPES)
+        d = REFERENCE_DATE - timedelta(days=rng.randint(0, 1200), seconds=rng.randint(0, 86399))
+        achievements.append((t, score(-8, 20), d))
+
+    return tech, tech_date, behavioral, achievements
+
+
+def scalar_result(tech, tech_date, behavioral, achievements):
+    behav_inputs = [
+        BehavioralAssessmentInput(
+            quarter="Q1 2026", assessment_date=d,
+            initiative=v[0], dedication=v[1], team_spirit=v[2],
+            courage=v[3], motivation=v[4], adaptability=v[5]
+        ) for d, v in behavioral
+    ]
+    ach_inputs = [
+        AchievementInput(title="t", type=t, points=p, date_earned=d, validity_months=24)
+        for t, p, d in achievements
+    ]
+    return rri_calculator.calculate_rri_score(
+        tech[0], tech_date, tech[1], tech_date, tech[2], tech_date, tech[3], tech_date,
+        behav_inputs, ach_inputs, reference_date=REFERENCE_DATE
+    )
+
+
+def vectorized_result(soldiers):
+    n = len(soldiers)
+    q = max([len(s[2]) for s in soldiers] + [1])
+
+    tech_scores = np.array([[np.nan if v is None else v for v in s[0]] for s in soldiers])
+    tech_dates = vectorized.to_datetime64([s[1] for s in soldiers])
+
+    behav_scores = np.full((n, q, 6), np.nan)
+    behav_dates = np.full((n, q), np.datetime64("NaT"), dtype="datetime64[us]")
+    owner, types, points, ach_dates = [], [], [], []
+    for i, (_, _, behavioral, achievements) in enumerate(soldiers):
+        for j, (d, values) in enumerate(behavioral):
+            behav_scores[i, j] = values
+            behav_dates[i, j] = np.datetime64(d, "us")
+        for t, p, d in achievements:
+            owner.append(i)
+            types.append(t)
+            points.append(p)
+            ach_dates.append(d)
+
+    return vectorized.calculate_rri_scores(
+        tech_scores, tech_dates, behav_scores, behav_dates,
+        np.array(owner, dtype=np.int64), np.array(types, dtype=object),
+        np.array(points, dtype=np.float64), vectorized.to_datetime64(ach_dates),
+        reference_date=REFERENCE_DATE
+    )
+
+
+@pytest.mark.parametrize("seed,integer_scores", [(1, False), (2, False), (3, True), (4, True)])
+def test_vectorized_matches_scalar(seed, integer_scores):
+    rng = random.Random(seed)
+    soldiers = [random_soldier(rng, integer_scores) for _ in range(400)]
+    vec = vectorized_result(soldiers)
+
+    for i, soldier in enumerate(soldiers):
+        expected = scalar_result(*soldier)
+        assert vec["technical"]["total_score"][i] == expected.technical.total_score
+        assert vec["technical"]["completeness"][i] == expected.technical.completeness
+        assert vec["technical"]["status"][i] == expected.technical.status
+        assert vec["behavioral"]["total_score"][i] == expected.behavioral.total_score
+        assert vec["behavioral"]["status"][i] == expected.behavioral.status
+        assert vec["behavioral"]["trend"][i] == expected.behavioral.trend
+        assert vec["behavioral"]["quarters_count"][i] == expected.behavioral.quarters_count
+        assert vec["achievement"]["total_score"][i] == expected.achievement.total_score
+        assert vec["achievement"]["raw_points_sum"][i] == expected.achievement.raw_points_sum
+        assert vec["achievement"]["achievements_count"][i] == expected.achievement.achievements_count
+        assert vec["rri_score"][i] == expected.rri_score
+        assert vec["retention_band"][i] == expected.retention_band
+        assert vec["overall_data_quality"][i] == expected.overall_data_quality
+        assert vec["quality_status"][i] == expected.quality_status
+
+
+def test_recency_weight_buckets():
+    dates = [REFERENCE_DATE - timedelta(days=d) for d in (0, 60, 61, 120, 180, 270, 365, 730, 731)]
+    dates += [REFERENCE_DATE + timedelta(days=1), None]
+    weights = vectorized.calculate_recency_weights(vectorized.to_datetime64(dates), REFERENCE_DATE)
+    assert weights.tolist() == [1.0, 1.0, 0.95, 0.95, 0.85, 0.70, 0.50, 0.25, 0.0, 0.0, 0.0]
+
+
+def test_empty_population():
+    vec = vectorized.calculate_rri_scores(
+        np.empty((0, 4)), vectorized.to_datetime64([]),
+        np.empty((0, 1, 6)), np.empty((0, 1), dtype="datetime64[us]"),
+        np.array([], dtype=np.int64), np.array([], dtype=object),
+        np.array([]), vectorized.to_datetime64([]),
+        reference_date=REFERENCE_DATE
+    )
+    assert vec["rri_score"].shape == (0,)
@@ -0,0 +1,120 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from backend import models, scheduled_tests, schemas
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def statements(engine):
+    executed = []
+    listener = lambda conn, cursor, statement, *args: executed.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    yield executed
+    event.remove(engine, "before_cursor_execute", listener)
+
+
+def seed(db, soldiers=600):
+    db.add_all(models.Agniveer(service_id=f"AGV{i:04d}", name=f"Soldier {i}", company="Alpha") for i in range(soldiers))
+    tests = [models.ScheduledTest(name=f"Range {i}", test_type="Firing", target_type="COMPANY", target_value="Alpha",
+                                  scheduled_date=datetime(2026, 3, i + 1)) for i in range(3)]
+    db.add_all(tests)
+    db.flush()
+    db.add_all(models.TestResult(test_id=tests[0].id, agniveer_id=i + 1, score=i % 50) for i in range(soldiers))
+    db.add_all(models.TestResult(test_id=tests[1].id, agniveer_id=i + 1, score=40) for i in range(5))
+    db.commit()
+    return [t.id for t in tests]
+
+
+def test_result_sheet_and_listing_use_constant_queries(db, statements):
+    ids = seed(db)
+    db.expire_all()
+
+    statements.clear()
+    results = scheduled_tests.list_results(db, ids[0])
+    assert len(statements) == 1 and len(results) == 600
+    assert results[7]["agniveer_name"] == "Soldier 7" and results[7]["agniveer_service_id"] == "AGV0007"
+
+    statements.clear()
+    listed = scheduled_tests.list_tests(db, target_type="COMPANY")
+    assert len(statements) == 1
+    assert [(t["name"], t["results_count"]) for t in listed] == [("Range 2", 0), ("Range 1", 5), ("Range 0", 600)]
+    assert [schemas.ScheduledTestResponse(**t).results_count for t in listed] == [0, 5, 600]
+    assert scheduled_tests.count_results(db, ids[1]) == 5
+
+
+def test_save_result_creates_then_updates(db, statements):
+    ids = seed(db, soldiers=3)
+    created = scheduled_tests.save_result(db, ids[2], schemas.TestResultCreate(agniveer_id=2, score=31), recorded_by=None)
+    assert created["agniveer_name"] == "Soldier 1" and created["score"] == 31
+
+    statements.clear()
+    updated = scheduled_tests.save_result(db, ids[2], schemas.TestResultCreate(agniveer_id=2, is_absent=True), recorded_by=None)
+    assert updated["id"] == created["id"] and updated["is_absent"] and updated["score"] is None
+    assert not any("FROM agniveers" in s and "test_results" not in s for s in statements)
+    assert scheduled_tests.count_results(db, ids[2]) == 1
+
+    # Unknown Agniveer: saved as before, without a name
+    orphan = scheduled_tests.save_result(db, ids[2], schemas.TestResultCreate(agniveer_id=999, score=1), recorded_by=None)
+    assert orphan["agniveer_name"] is None and scheduled_tests.count_results(db, ids[2]) == 2
+
+
+def test_bulk_sheet_validates_against_roster_and_upserts(db, statements):
+    ids = seed(db, soldiers=1000)
+    db.add(models.Agniveer(service_id="BRAVO1", name="Other company", company="Bravo"))
+    db.commit()
+    test = db.get(models.ScheduledTest, ids[1])  # 5 existing results (Agniveers 1-5)
+
+    rows = [(n + 2, {"service_id": f"AGV{n:04d}", "score": str(n % 100)}) for n in range(1000)]
+    rows += [
+        (1002, {"agniveer_id": 3, "is_absent": "yes"}),       # duplicate of AGV0002
+        (1003, {"service_id": "BRAVO1", "score": "10"}),      # not on the roster
+        (1004, {"service_id": "AGV9999"}),                    # unknown
+        (1005, {"score": "10"}),                              # no Agniveer
+        (1006, {"agniveer_id": 7, "score": "abc"}),           # bad score
+    ]
+    statements.clear()
+    result = scheduled_tests.save_results_bulk(db, test.id, rows, recorded_by=None)
+    # Test, roster, existing results, one upsert
+    assert len([s for s in statements if s.lstrip().upper().startswith(("SELECT", "INSERT", "UPDATE"))]) == 4
+    assert (result.total, result.created, result.updated, result.failed) == (1005, 995, 5, 5)
+    errors = {o.row: o.error for o in result.rows if o.status == "error"}
+    assert errors[1002] == "Duplicate row for this Agniveer"
+    assert "roster" in errors[1003] and "roster" in errors[1004]
+    assert errors[1005] == "Missing service_id or agniveer_id" and errors[1006].startswith("score:")
+
+    results = {r["agniveer_service_id"]: r for r in scheduled_tests.list_results(db, test.id)}
+    assert len(results) == 1000 and results["AGV0042"]["score"] == 42 and results["AGV0001"]["score"] == 1
+
+    # Re-submitting updates in place; scores above max_marks are rejected
+    again = scheduled_tests.save_results_bulk(db, test.id, [(1, {"agniveer_id": 1, "score": 99, "remarks": "Retest"}),
+                                                         (2, {"agniveer_id": 2, "score": 101})], recorded_by=None)
+    assert [o.status for o in again.rows] == ["updated", "error"]
+    assert scheduled_tests.count_results(db, test.id) == 1000
+    assert results["AGV0000"]["id"] == scheduled_tests.list_results(db, test.id)[0]["id"]
+    assert scheduled_tests.list_results(db, test.id)[0]["remarks"] == "Retest"
+    assert scheduled_tests.save_results_bulk(db, 999, rows, recorded_by=None) is None
+
+
+def test_parse_result_csv():
+    rows = scheduled_tests.parse_result_csv("Service No,Marks,Absent,Remarks,Unused\nAGV0001,45,,Good,x\n\nAGV0002,,yes,,\n")
+    assert rows == [(2, {"service_id": "AGV0001", "score": "45", "remarks": "Good"}),
+                    (4, {"service_id": "AGV0002", "is_absent": "yes"})]
+    with pytest.raises(ValueError):
+        scheduled_tests.parse_result_csv("name,score\nA,1\n")
@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+from backend.notifications import ConnectionManager, CLOSE_CODE_OVERFLOW
+
+
+class FakeSocket:
+    """Records sent messages; each send takes `delay` seconds (or never completes)."""
+    def __init__(self, delay=0.0, stuck=False):
+        self.delay = delay
+        self.stuck = stuck
+        self.messages = []
+        self.closed_with = None
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        if self.stuck:
+            await asyncio.Event().wait()
+        await asyncio.sleep(self.delay)
+        self.messages.append(message)
+
+    async def send_text(self, text):
+        await self.send_json(text)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_fan_out_does_not_wait_for_slow_sockets():
+    async def scenario():
+        manager = ConnectionManager(queue_size=8)
+        slow, fast = FakeSocket(delay=1.0), FakeSocket()
+        await manager.connect(1, slow)
+        await manager.connect(2, fast)
+
+        started = time.monotonic()
+        manager.publish([1, 2], {"type": "new_mail"})
+        publish_seconds = time.monotonic() - started
+
+        await asyncio.sleep(0.05)
+        return publish_seconds, slow.messages, fast.messages
+
+    publish_seconds, slow_messages, fast_messages = run(scenario())
+    assert publish_seconds < 0.01
+    # The fast client is served while the slow one is still sending
+    assert fast_messages == [{"type": "new_mail"}]
+    assert slow_messages == []
+
+
+def test_duplicate_new_mail_events_are_coalesced():
+    async def scenario():
+        manager = ConnectionManager(queue_size=8)
+        socket = FakeSocket(delay=0.05)
+        await manager.connect(1, socket)
+        for _ in range(20):
+            manager.publish([1], {"type": "new_mail"})
+        manager.publish([1], {"type": "leave_update"})
+        await asyncio.sleep(0.3)
+        return socket.messages, manager.stats()
+
+    messages, stats = run(scenario())
+    assert messages == [{"type": "new_mail"}, {"type": "leave_update"}]
+    assert stats["coalesced"] == 19
+
+
+def test_overflowing_connection_is_closed():
+    async def scenario():
+        manager = ConnectionManager(queue_size=2)
+        stuck, healthy = FakeSocket(stuck=True), FakeSocket()
+        await manager.connect(1, stuck)
+        await manager.connect(1, healthy)
+        for i in range(5):
+            manager.publish([1], {"type": "event", "n": i})
+            # Healthy sockets drain between events; the stuck one never does
+            await asyncio.sleep(0.01)
+        return stuck, healthy, manager.stats()
+
+    stuck, healthy, stats = run(scenario())
+    assert stuck.closed_with == CLOSE_CODE_OVERFLOW
+    assert len(healthy.messages) == 5
+    assert stats["connections"] == 1 and stats["dropped_connections"] == 1